@@ -0,0 +1,270 @@
+import os
+import time
+import shutil
+import asyncio
+import platform
+from collections import deque
+
+import numpy as np
+import discord
+
+from metrics import FFMPEG_STARTUP
+
+# discord 음성 전송 단위: 20ms, 48kHz, 16bit, 스테레오 PCM
+FRAME_BYTES = 3840
+SILENCE = b"\0" * FRAME_BYTES
+# 레인(TTS, 음악 등)마다 미리 쌓아 둘 수 있는 오디오 길이(초)
+MIXER_BUFFER_SECONDS = float(os.getenv("MIXER_BUFFER_SECONDS", "5"))
+# 이 시간(초) 동안 재생할 오디오가 없으면 믹서를 멈추고 정리합니다.
+MIXER_IDLE_TIMEOUT = float(os.getenv("MIXER_IDLE_TIMEOUT", "30"))
+# TTS가 나오는 동안 음악 레인에 곱할 음량 (ducking)
+MIXER_DUCK_GAIN = float(os.getenv("MIXER_DUCK_GAIN", "0.3"))
+
+
+def resolve_ffmpeg_executable():
+    """
+    FFmpeg 실행 파일 경로를 찾습니다.
+    FFMPEG_PATH 환경 변수 -> OS별 기본 설치 경로 -> PATH 순서로 찾고, 없으면 None을 반환합니다.
+    """
+    candidates = [os.getenv("FFMPEG_PATH")]
+    candidates += {
+        "Darwin": ["/opt/homebrew/bin/ffmpeg", "/usr/local/bin/ffmpeg"],
+        "Windows": [r"C:\ffmpeg\bin\ffmpeg.exe"],
+    }.get(platform.system(), [])
+    for candidate in candidates:
+        if candidate and os.path.exists(candidate):
+            return candidate
+    return shutil.which("ffmpeg")
+
+# FFmpeg 경로는 시작할 때 한 번만 찾습니다.
+FFMPEG_EXECUTABLE = resolve_ffmpeg_executable()
+if FFMPEG_EXECUTABLE is None:
+    print("FFmpeg 실행 파일을 찾을 수 없습니다. FFMPEG_PATH 환경 변수를 설정하거나 PATH에 FFmpeg를 추가해주세요.")
+
+
+async def decode_to_pcm(audio, executable=None):
+    """MP3/WAV 등의 오디오 바이트를 FFmpeg로 48kHz 스테레오 PCM 바이트로 디코딩합니다."""
+    executable = executable or FFMPEG_EXECUTABLE
+    if executable is None:
+        raise RuntimeError("FFmpeg 실행 파일을 찾을 수 없습니다.")
+    start = time.perf_counter()
+    process = await asyncio.create_subprocess_exec(
+        executable, "-loglevel", "warning", "-i", "pipe:0",
+        "-f", "s16le", "-ar", "48000", "-ac", "2", "pipe:1",
+        stdin=asyncio.subprocess.PIPE, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE,
+    )
+    FFMPEG_STARTUP.observe(time.perf_counter() - start, use="tts")
+    try:
+        pcm, error = await process.communicate(audio)
+    except asyncio.CancelledError:
+        process.kill()
+        raise
+    if process.returncode != 0:
+        raise RuntimeError(f"FFmpeg 디코딩 실패: {error.decode(errors='replace').strip()}")
+    return pcm
+
+
+def iter_frames(pcm):
+    """PCM 바이트를 20ms 프레임으로 나눕니다. 마지막 프레임은 무음으로 채웁니다."""
+    for start in range(0, len(pcm), FRAME_BYTES):
+        frame = pcm[start:start + FRAME_BYTES]
+        if len(frame) < FRAME_BYTES:
+            frame += SILENCE[len(frame):]
+        yield frame
+
+
+def mix_frames(frames):
+    """(프레임, 음량) 목록을 하나의 프레임으로 섞습니다."""
+    mixed = np.zeros(FRAME_BYTES // 2, dtype=np.float32)
+    for frame, gain in frames:
+        mixed += np.frombuffer(frame, dtype=np.int16) * gain
+    return np.clip(mixed, -32768, 32767).astype(np.int16).tobytes()
+
+
+class MixerLane:
+    """
+    믹서의 입력 하나(TTS, 음악 등). 20ms 프레임을 담는 크기 제한 링 버퍼입니다.
+    버퍼에는 프레임 사이에 콜백(재생 시작/끝 알림)도 넣을 수 있으며,
+    재생 스레드가 그 위치에 도달하면 이벤트 루프에서 호출됩니다.
+    """
+
+    def __init__(self, loop, capacity, gain=1.0):
+        self.loop = loop
+        self.capacity = capacity
+        self.gain = gain
+        # deque의 append/popleft는 스레드 안전하므로 이벤트 루프(넣기)와 재생 스레드(꺼내기)가 따로 락을 잡지 않습니다.
+        self.items = deque()
+        self.generation = 0  # clear()할 때마다 증가해 진행 중인 feed를 멈춥니다.
+        self._space = asyncio.Event()
+        self._waiting = False
+
+    @property
+    def busy(self):
+        return bool(self.items)
+
+    @property
+    def full(self):
+        return len(self.items) >= self.capacity
+
+    def pop(self):
+        """다음 프레임을 꺼냅니다. 없으면 None. (재생 스레드에서 호출)"""
+        while self.items:
+            item = self.items.popleft()
+            if callable(item):
+                self.loop.call_soon_threadsafe(item)
+                continue
+            if self._waiting and not self.full:
+                self._waiting = False
+                self.loop.call_soon_threadsafe(self._space.set)
+            return item
+        return None
+
+    async def wait_for_space(self):
+        self._space.clear()
+        self._waiting = True
+        if not self.full:
+            return
+        try:
+            # 재생이 멈춰 pop이 불리지 않아도 주기적으로 상태를 다시 확인합니다.
+            await asyncio.wait_for(self._space.wait(), 1.0)
+        except asyncio.TimeoutError:
+            pass
+
+    def clear(self):
+        self.generation += 1
+        self.items.clear()
+        self._space.set()
+
+
+class GuildMixer(discord.AudioSource):
+    """
+    길드마다 하나씩 계속 재생되는 오디오 소스.
+    발화/곡마다 플레이어를 새로 시작하지 않고, 레인별 링 버퍼에 미리 디코딩해 둔 프레임을
+    20ms마다 꺼내 섞어서 내보내므로 오디오가 끊김 없이 이어집니다.
+    재생할 것이 없으면 무음을 내보내다가 idle_timeout이 지나면 재생을 끝냅니다.
+    """
+
+    def __init__(self, loop, buffer_seconds=MIXER_BUFFER_SECONDS, idle_timeout=MIXER_IDLE_TIMEOUT):
+        self.loop = loop
+        self.capacity = max(1, int(buffer_seconds / 0.02))
+        self.lanes = {}
+        # 레인 이름 -> (이 레인이 재생 중이면, 곱할 음량): TTS가 나오는 동안 음악 소리를 줄입니다.
+        self.ducking = {"music": ("tts", MIXER_DUCK_GAIN)}
+        self.closed = False
+        self._idle_frames = 0
+        self._idle_limit = max(1, int(idle_timeout / 0.02))
+
+    def lane(self, name):
+        lane = self.lanes.get(name)
+        if lane is None:
+            lane = MixerLane(self.loop, self.capacity)
+            self.lanes[name] = lane
+        return lane
+
+    def busy(self, name):
+        lane = self.lanes.get(name)
+        return lane is not None and lane.busy
+
+    async def feed(self, name, pcm, on_start=None, on_end=None):
+        """
+        PCM을 레인에 프레임 단위로 넣습니다. 버퍼가 가득 차면 빈 자리가 생길 때까지 기다립니다.
+        on_start/on_end는 그 위치가 실제로 재생될 때 호출됩니다.
+        중간에 clear()되거나 믹서가 닫히면 False를 반환합니다.
+        """
+        lane = self.lane(name)
+        generation = lane.generation
+        if on_start is not None:
+            lane.items.append(on_start)
+        for frame in iter_frames(pcm):
+            while lane.full and lane.generation == generation and not self.closed:
+                await lane.wait_for_space()
+            if lane.generation != generation or self.closed:
+                return False
+            lane.items.append(frame)
+        if on_end is not None:
+            lane.items.append(on_end)
+        return True
+
+    def clear(self, name):
+        """레인에 쌓인 오디오를 버리고 진행 중인 feed를 멈춥니다. 버린 것이 있으면 True."""
+        lane = self.lanes.get(name)
+        if lane is None:
+            return False
+        had_audio = lane.busy
+        lane.clear()
+        return had_audio
+
+    def is_opus(self):
+        # 레인을 PCM으로 섞어야 하므로 FFmpeg의 Opus 출력을 그대로 보내지 않고 discord.py가 프레임마다 Opus로 인코딩합니다.
+        # (발화마다 플레이어를 새로 만들던 FFmpegOpusAudio 경로보다 CPU를 더 쓰는 대신 끊김 없이 섞을 수 있습니다.
+        #  비용은 benchmarks/bench_tts_pipeline.py의 pipe+opus와 mixer 비교로 확인합니다)
+        return False
+
+    def read(self):
+        if self.closed:
+            return b""
+        active = {}
+        for name, lane in list(self.lanes.items()):
+            frame = lane.pop()
+            if frame is not None:
+                active[name] = (frame, lane.gain)
+        for name, (trigger, gain) in self.ducking.items():
+            if name in active and trigger in active:
+                frame, lane_gain = active[name]
+                active[name] = (frame, lane_gain * gain)
+        frames = list(active.values())
+        if not frames:
+            self._idle_frames += 1
+            if self._idle_frames >= self._idle_limit:
+                self.closed = True
+                return b""  # 빈 바이트를 돌려주면 discord 플레이어가 재생을 끝냅니다.
+            return SILENCE
+        self._idle_frames = 0
+        if len(frames) == 1 and frames[0][1] == 1.0:
+            return frames[0][0]
+        return mix_frames(frames)
+
+    def cleanup(self):
+        self.closed = True
+        if self.loop.is_closed():
+            return  # 봇 종료 중
+        for lane in list(self.lanes.values()):
+            self.loop.call_soon_threadsafe(lane.clear)
+
+
+# 길드별로 재생 중인 믹서
+guild_mixers = {}
+
+
+def get_mixer(guild):
+    """
+    길드의 믹서를 반환합니다. 아직 없거나 재생이 끝났으면 새로 만들어 음성 클라이언트에서 재생을 시작합니다.
+    음성 채널에 연결되어 있지 않으면 None을 반환합니다.
+    """
+    voice_client = guild.voice_client
+    if voice_client is None:
+        return None
+    mixer = guild_mixers.get(guild.id)
+    if mixer is not None and not mixer.closed and voice_client.source is mixer and voice_client.is_playing():
+        return mixer
+
+    loop = asyncio.get_running_loop()
+    mixer = GuildMixer(loop)
+    guild_mixers[guild.id] = mixer
+
+    def after_playing(error):
+        # 재생 스레드에서 호출되므로 이벤트 루프 스레드로 넘겨서 정리합니다.
+        if error:
+            print(f"오디오 재생 중 오류 발생: {error}")
+        loop.call_soon_threadsafe(_forget_mixer, guild.id, mixer)
+
+    if voice_client.is_playing():
+        voice_client.stop()
+    voice_client.play(mixer, after=after_playing)
+    return mixer
+
+
+def _forget_mixer(guild_id, mixer):
+    mixer.cleanup()
+    if guild_mixers.get(guild_id) is mixer:
+        del guild_mixers[guild_id]
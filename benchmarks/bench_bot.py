@@ -0,0 +1,765 @@
+"""
+봇 전체를 디스코드/OpenAI/gTTS/YouTube/FFmpeg 없이 오프라인으로 돌려 처리량과 지연 시간을 측정합니다.
+
+- bot.py의 on_message와 명령어 처리기를 가짜 메시지/채널/음성 클라이언트로 그대로 실행합니다.
+- 외부 서비스는 지연 시간을 조절할 수 있는 로컬 가짜로 바꿉니다. (네트워크를 쓰지 않습니다)
+    OpenAI(봇의 비동기 클라이언트, Celery 워커의 동기 클라이언트), gTTS 합성, TTS용 FFmpeg 디코딩,
+    YouTube 검색과 yt-dlp 해석, 음악 스트리밍 FFmpeg(무음 PCM을 쓰는 파이썬 하위 프로세스)
+- /mtcl은 CELERY_EAGER=1로 봇 프로세스 안에서 실행합니다.
+- 시드를 고정한 같은 메시지 묶음을 매번 새 임시 디렉터리에서 돌리므로, 같은 옵션이면 버전끼리 결과를 비교할 수 있습니다.
+
+측정 항목
+- 전체 처리량(messages/sec)과 on_message 분기/명령어별 p50, p99 처리 시간
+- 단계별 메모리(RSS) 증가
+- 저장소가 커질 때의 비용: 사용자 대화 기록(SQLite)과 회의 로그(NDJSON)를 구간별로 늘려 가며 잰 한 건당 시간과 파일 크기
+  (예전 conversations.json / meeting_data.json은 이 두 저장소로 바뀌었습니다)
+
+사용법 (저장소 루트에서):
+    python -m benchmarks.bench_bot --messages 2000 --concurrency 32
+    python -m benchmarks.bench_bot --openai-latency 0.5 --tts-latency 0.3 --json result.json
+    python -m benchmarks.bench_bot --json new.json --compare result.json   (이전 결과와 비교, 나빠진 지표가 있으면 종료 코드 1)
+"""
+import os
+import gc
+import sys
+import json
+import time
+import zlib
+import random
+import shutil
+import asyncio
+import argparse
+import platform
+import tempfile
+import threading
+import itertools
+import subprocess
+from types import SimpleNamespace
+from collections import Counter, defaultdict
+from datetime import datetime, timezone
+
+import discord
+from discord.ext import commands
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# bot.py를 불러오기 전에 정해야 하는 설정 (지표 서버/멈춤 감지는 끄고, Celery는 프로세스 안에서 실행)
+BENCH_ENV = {
+    "CELERY_EAGER": "1",
+    "METRICS_PORT": "0",
+    "STALL_DETECTOR": "0",
+    "MEETING_JOB_POLL_INTERVAL": "0.05",
+    "TTS_BACKEND": "gtts",
+    "OPENAI_API_KEY": "bench",
+    "youtube_key": "bench",
+}
+
+FRAME_BYTES = 3840  # 20ms, 48kHz, 16bit, 스테레오
+
+# 무음 PCM을 쓰는 가짜 FFmpeg (인자: 곡 길이(초), 시작 지연(초))
+SILENCE_SCRIPT = (
+    "import sys, time; time.sleep(float(sys.argv[2])); "
+    f"sys.stdout.buffer.write(bytes({FRAME_BYTES} * int(float(sys.argv[1]) * 50)))"
+)
+
+WORDS = [
+    "회의", "일정", "배포", "서버", "디자인", "리뷰", "테스트", "오늘", "내일", "점심", "버그", "기능",
+    "정리", "공유", "확인", "문서", "데이터", "사용자", "요청", "결과", "다음", "주간", "목표", "발표",
+]
+QUESTIONS = [
+    "파이썬 비동기 코드 작성하는 방법", "도커 이미지 크기 줄이는 법", "리액트 상태 관리 추천해줘",
+    "깃 리베이스와 머지 차이", "SQL 인덱스가 느릴 때", "점심 메뉴 추천", "디스코드 봇 배포 방법",
+    "회의록 잘 쓰는 법", "주간 보고서 양식", "테스트 코드 작성 요령",
+]
+
+# 메시지 종류와 비율. 종류는 on_message 분기(기능 채널 일반 메시지) 또는 명령어입니다.
+WORKLOAD = [
+    ("meeting", 40), ("tts", 20), ("chatgpt", 6),
+    ("/gptcl", 12), ("/gpt", 6), ("/y", 5), ("/ylist", 3),
+    ("/play", 3), ("/queue", 2), ("/mtcl", 2), ("/jobs", 1),
+]
+
+
+def sentence(rng, words):
+    return " ".join(rng.choice(WORDS) for _ in range(words)) + rng.choice([".", "?", "!", ""])
+
+
+def percentile(values, q):
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * q))]
+
+
+def rss_kb():
+    """현재 프로세스의 RSS(KB). 알 수 없으면 None."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") // 1024
+    except (OSError, ValueError, AttributeError):
+        pass
+    try:
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss  # 최대값으로 대신합니다.
+    except ImportError:
+        return None
+
+
+def file_kb(*paths):
+    return sum(os.path.getsize(p) for p in paths if os.path.exists(p)) / 1024
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=REPO_ROOT, capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+# ---- 가짜 OpenAI ----
+
+def fake_answer(messages, words):
+    """질문이 같으면 항상 같은 답을 만듭니다."""
+    seed = zlib.crc32((messages[-1].get("content") or "").encode("utf-8"))
+    return " ".join(WORDS[(seed + i * 7) % len(WORDS)] for i in range(words)) + "."
+
+
+def _completion(text, usage):
+    return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=text))], usage=usage)
+
+
+class FakeStream:
+    """stream=True 응답. 단어마다 chunk_delay초 간격으로 조각을 보내고 마지막에 사용량 조각을 보냅니다."""
+
+    def __init__(self, text, usage, chunk_delay):
+        self.pieces = [word + " " for word in text.split(" ")]
+        self.usage = usage
+        self.chunk_delay = chunk_delay
+
+    def __aiter__(self):
+        return self._iterate()
+
+    async def _iterate(self):
+        for piece in self.pieces:
+            if self.chunk_delay:
+                await asyncio.sleep(self.chunk_delay)
+            yield SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=piece))], usage=None)
+        yield SimpleNamespace(choices=[], usage=self.usage)
+
+    async def close(self):
+        pass
+
+
+class FakeCompletions:
+    """chat.completions 흉내. 응답(스트림이면 첫 조각)까지 latency초 걸립니다."""
+
+    def __init__(self, latency, chunk_delay, answer_words):
+        self.latency = latency
+        self.chunk_delay = chunk_delay
+        self.answer_words = answer_words
+        self.calls = 0
+
+    def _respond(self, messages):
+        self.calls += 1
+        text = fake_answer(messages, self.answer_words)
+        prompt_tokens = sum(len(m.get("content") or "") for m in messages) // 2
+        return text, SimpleNamespace(prompt_tokens=prompt_tokens, completion_tokens=len(text) // 2)
+
+    async def create(self, model, messages, stream=False, **params):
+        await asyncio.sleep(self.latency)
+        text, usage = self._respond(messages)
+        if stream:
+            return FakeStream(text, usage, self.chunk_delay)
+        return _completion(text, usage)
+
+
+class FakeSyncCompletions(FakeCompletions):
+    """Celery 워커(gpt_batch)가 쓰는 동기 클라이언트용."""
+
+    def create(self, model, messages, **params):
+        time.sleep(self.latency)
+        return _completion(*self._respond(messages))
+
+
+class FakeOpenAI:
+    def __init__(self, completions):
+        self.chat = SimpleNamespace(completions=completions)
+
+    async def close(self):
+        pass
+
+
+# ---- 가짜 디스코드 ----
+
+_ids = itertools.count(10**17)
+
+
+class FakeUser:
+    def __init__(self, user_id, name, bot=False):
+        self.id = user_id
+        self.name = self.display_name = name
+        self.bot = bot
+        self.mention = f"<@{user_id}>"
+        self.voice = None
+
+    def __str__(self):
+        return self.name
+
+
+class FakeSentMessage:
+    """봇이 보낸 메시지. (StreamingReply가 수정합니다)"""
+
+    def __init__(self, channel, content):
+        self.id = next(_ids)
+        self.channel = channel
+        self.content = content
+
+    async def edit(self, content=None, **kwargs):
+        await self.channel.api_call("edit")
+        self.content = content
+        return self
+
+    async def delete(self, **kwargs):
+        await self.channel.api_call("delete")
+
+
+class FakeTextChannel:
+    type = discord.ChannelType.text
+
+    def __init__(self, guild, name, api_latency):
+        self.id = next(_ids)
+        self.guild = guild
+        self.name = name
+        self.mention = f"<#{self.id}>"
+        self.api_latency = api_latency
+        self.calls = Counter()
+
+    async def api_call(self, kind):
+        """디스코드 API 호출 한 번 (왕복 시간만큼 기다립니다)."""
+        self.calls[kind] += 1
+        if self.api_latency:
+            await asyncio.sleep(self.api_latency)
+
+    async def send(self, content=None, **kwargs):
+        await self.api_call("send")
+        return FakeSentMessage(self, content)
+
+    def permissions_for(self, member):
+        return discord.Permissions.all()
+
+
+class FakeVoiceClient:
+    """
+    discord.VoiceClient 대신 재생 스레드에서 오디오 소스를 20ms 프레임마다 읽습니다.
+    speed배 빠르게 읽어 긴 재생도 벤치마크 시간 안에 끝나게 합니다. (Opus 인코딩/전송은 하지 않습니다)
+    """
+
+    def __init__(self, guild, speed):
+        self.guild = guild
+        self.speed = speed
+        self.source = None
+        self.frames = 0
+        self._thread = None
+        self._stop = threading.Event()
+
+    def play(self, source, after=None):
+        self.source = source
+        self._stop = threading.Event()
+        self._thread = threading.Thread(
+            target=self._play, args=(source, after, self._stop), name=f"fake-voice-{self.guild.id}", daemon=True,
+        )
+        self._thread.start()
+
+    def _play(self, source, after, stop):
+        interval = 0.02 / self.speed
+        next_at = time.perf_counter()
+        while not stop.is_set():
+            if not source.read():
+                break
+            self.frames += 1
+            next_at += interval
+            delay = next_at - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+        if after is not None:
+            after(None)
+
+    def is_playing(self):
+        return self._thread is not None and self._thread.is_alive() and not self._stop.is_set()
+
+    def is_connected(self):
+        return True
+
+    def stop(self):
+        self._stop.set()
+
+    def close(self):
+        self.stop()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+
+
+class FakeGuild:
+    def __init__(self, name, api_latency, audio_speed):
+        self.id = next(_ids)
+        self.name = name
+        self.text_channels = [
+            FakeTextChannel(self, channel_name, api_latency) for channel_name in ("일반", "tts", "회의", "chatgpt")
+        ]
+        self.voice_client = FakeVoiceClient(self, audio_speed)
+
+    def get_channel(self, channel_id):
+        return next((c for c in self.text_channels if c.id == channel_id), None)
+
+    def channel(self, name):
+        return next(c for c in self.text_channels if c.name == name)
+
+
+class FakeMessage:
+    """사용자가 보낸 메시지."""
+    _state = None
+    type = discord.MessageType.default
+
+    def __init__(self, content, author, channel):
+        self.id = next(_ids)
+        self.content = content
+        self.author = author
+        self.channel = channel
+        self.guild = channel.guild
+        self.created_at = datetime.now(timezone.utc)
+        self.mentions = []
+        self.role_mentions = []
+        self.channel_mentions = []
+        self.attachments = []
+        self.reference = None
+        self.webhook_id = None
+
+
+class BenchContext(commands.Context):
+    """응답을 디스코드 API 대신 가짜 채널로 보내는 Context."""
+
+    async def send(self, content=None, **kwargs):
+        return await self.channel.send(content, **kwargs)
+
+    async def reply(self, content=None, **kwargs):
+        return await self.channel.send(content, **kwargs)
+
+
+# ---- 준비 ----
+
+def install_fakes(args, fake_async, fake_sync):
+    """외부 서비스를 부르는 지점을 가짜로 바꿉니다. (bot.py를 불러온 뒤 호출)"""
+    import youtube_module
+    import music_player
+    import tts_module
+    from tts_backends import TTS_BACKENDS
+    from gpt import gpt_client, gpt_batch, context_window
+
+    # 토크나이저 데이터를 내려받을 수 없으면(오프라인) 글자 수 기반 추정치로 셉니다.
+    try:
+        context_window.count_tokens("bench")
+    except Exception as e:
+        print(f"(tiktoken 인코딩을 불러오지 못해 토큰 수는 추정치로 셉니다: {type(e).__name__})")
+        context_window.tiktoken = None
+
+    gpt_client.AsyncOpenAI = lambda **kwargs: FakeOpenAI(fake_async)
+    gpt_batch.OpenAI = lambda **kwargs: FakeOpenAI(fake_sync)
+    gpt_batch._client = None
+
+    def synthesize(text, language):
+        time.sleep(args.tts_latency)
+        return b"FAKEMP3" + text.encode("utf-8")
+
+    TTS_BACKENDS["gtts"].synthesize = synthesize
+
+    async def decode_to_pcm(audio, executable=None):
+        await asyncio.sleep(args.ffmpeg_latency)
+        return bytes(FRAME_BYTES * 2 * len(audio))  # 한 글자(3바이트)에 약 120ms
+
+    tts_module.decode_to_pcm = decode_to_pcm
+    tts_module.FFMPEG_EXECUTABLE = sys.executable  # FFmpeg가 설치되지 않은 환경에서도 재생 경로를 타도록
+
+    def search(query, max_results):
+        time.sleep(args.youtube_latency)
+        seed = zlib.crc32(query.encode("utf-8"))
+        return [
+            {
+                "id": f"v{seed + i:x}", "title": f"{query} #{i + 1}", "channel": "bench",
+                "url": f"https://www.youtube.com/watch?v=v{seed + i:x}",
+            }
+            for i in range(max_results)
+        ]
+
+    youtube_module._search_blocking = search
+
+    def extract_info(target):
+        time.sleep(args.youtube_latency)
+        return {
+            "title": target, "stream_url": f"bench:{target}", "webpage_url": target,
+            "headers": {}, "duration": args.track_seconds, "local": False,
+        }
+
+    music_player._extract_info = extract_info
+    music_player.FFMPEG_EXECUTABLE = sys.executable
+    music_player.ffmpeg_stream_args = lambda info: [
+        sys.executable, "-c", SILENCE_SCRIPT, str(info["duration"]), str(args.ffmpeg_latency),
+    ]
+
+
+async def setup_bot(bot_module, guilds):
+    bot = bot_module.bot
+    await bot._async_setup_hook()  # 로그인 없이 이벤트 루프만 연결합니다.
+    bot._connection.user = FakeUser(next(_ids), "bench-bot", bot=True)
+    original_get_context = bot.get_context
+
+    async def get_context(origin, *, cls=BenchContext):
+        return await original_get_context(origin, cls=BenchContext)
+
+    bot.get_context = get_context
+    for guild in guilds:
+        await bot_module.on_guild_join(guild)  # 'tts', '회의', 'chatgpt' 채널을 기능 채널로 등록
+        bot_module.voice_connected_guilds.add(guild.id)
+
+
+def build_messages(args, guilds, users, rng):
+    """시드로 정해지는 메시지 목록 [(종류, 채널, 작성자, 내용)]."""
+    kinds, weights = zip(*WORKLOAD)
+    questions = [f"{rng.choice(QUESTIONS)} {i}" for i in range(args.distinct_questions)]
+    songs = [f"{rng.choice(WORDS)} 노래 {i}" for i in range(20)]
+    messages = []
+    for kind in rng.choices(kinds, weights, k=args.messages):
+        guild = rng.choice(guilds)
+        author = rng.choice(users)
+        channel = guild.channel("일반")
+        if kind == "meeting":
+            channel, content = guild.channel("회의"), sentence(rng, rng.randint(3, 30))
+        elif kind == "tts":
+            channel, content = guild.channel("tts"), sentence(rng, rng.randint(2, 12))
+        elif kind == "chatgpt":
+            channel, content = guild.channel("chatgpt"), rng.choice(questions)
+        elif kind in ("/gptcl", "/gpt"):
+            content = f"{kind} {rng.choice(questions)}"
+        elif kind in ("/y", "/play"):
+            content = f"{kind} {rng.choice(songs)}"
+        elif kind == "/ylist":
+            content = f"/ylist {rng.randint(1, 3)} {rng.choice(songs)}"
+        elif kind == "/mtcl":
+            content = "/mtcl last 50 messages"
+        else:
+            content = kind
+        messages.append((kind, channel, author, content))
+    return messages
+
+
+# ---- 측정 ----
+
+async def run_workload(bot_module, messages, concurrency):
+    """메시지를 최대 concurrency개까지 동시에 처리하고 ({종류: [처리 시간]}, 걸린 시간, {종류: 예외 수})를 반환합니다."""
+    samples = defaultdict(list)
+    errors = Counter()
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def handle(kind, channel, author, content):
+        async with semaphore:
+            message = FakeMessage(content, author, channel)
+            start = time.perf_counter()
+            try:
+                await bot_module.on_message(message)
+            except Exception as e:
+                errors[kind] += 1
+                print(f"{kind} 처리 중 예외: {e!r}")
+            samples[kind].append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(handle(*entry) for entry in messages))
+    return samples, time.perf_counter() - start, errors
+
+
+async def drain(timeout):
+    """TTS 재생, 음악 대기열, 회의 요약 작업이 모두 끝날 때까지 기다리고 걸린 시간을 반환합니다. (시간 초과면 None)"""
+    from tts_module import tts_workers
+    from music_player import music_players
+    from gpt.meeting_jobs import meeting_jobs
+    from save import meeting_log_writer
+
+    def idle():
+        return (
+            not meeting_jobs.active
+            and all(not worker.pending and worker.current is None for worker in tts_workers.values())
+            and all(player.current is None and not player.queue for player in music_players.values())
+        )
+
+    start = time.perf_counter()
+    while not idle():
+        if time.perf_counter() - start > timeout:
+            return None
+        await asyncio.sleep(0.01)
+    await meeting_log_writer.flush()
+    return time.perf_counter() - start
+
+
+async def bench_storage(args, fake_async, guild):
+    """
+    대화 기록과 회의 로그를 storage_step개씩 늘려 가며 구간별 비용을 잽니다.
+    - 대화: 한 사용자가 /gpt 한 턴을 보낼 때의 시간 (기록 불러오기, 토큰 예산 압축, SQLite 저장 포함)
+    - 회의: 메시지 한 건을 기록하는 시간과, 파일이 커진 뒤 최근 200개를 요약하는 시간
+    (가짜 OpenAI 지연은 0으로 두고 저장소 비용만 봅니다)
+    """
+    from gpt.gpt import send_to_chatGpt, summarize_meeting_content
+    from gpt.conversation_store import CONVERSATIONS_DB
+    from save import save_conversation_data_json, meeting_log_writer, meeting_log_path
+
+    latency, fake_async.latency = fake_async.latency, 0.0
+    rng = random.Random(args.seed + 1)
+    user = FakeUser(next(_ids), "storage-user")
+    channel = guild.channel("회의")
+    meeting_file = meeting_log_path(guild.id, channel.id)
+    rows = []
+    try:
+        for step in range(1, args.storage_steps + 1):
+            start = time.perf_counter()
+            for _ in range(args.storage_step):
+                await send_to_chatGpt(str(user.id), sentence(rng, 12), guild.id)
+            conversation_ms = (time.perf_counter() - start) * 1000 / args.storage_step
+
+            start = time.perf_counter()
+            for _ in range(args.storage_step):
+                await save_conversation_data_json(FakeMessage(sentence(rng, 15), user, channel))
+            await meeting_log_writer.flush()
+            meeting_ms = (time.perf_counter() - start) * 1000 / args.storage_step
+
+            start = time.perf_counter()
+            await summarize_meeting_content(str(user.id), meeting_file, guild_id=guild.id, last_n=200)
+            summary_ms = (time.perf_counter() - start) * 1000
+
+            rows.append({
+                "records": step * args.storage_step,
+                "conversation_ms_per_turn": conversation_ms,
+                "conversation_db_kb": file_kb(CONVERSATIONS_DB, CONVERSATIONS_DB + "-wal"),
+                "meeting_ms_per_message": meeting_ms,
+                "meeting_log_kb": file_kb(meeting_file),
+                "meeting_summary_ms": summary_ms,
+            })
+    finally:
+        fake_async.latency = latency
+    return rows
+
+
+async def teardown(bot_module, guilds):
+    from tts_module import stop_tts
+    from music_player import stop_music
+
+    for guild in guilds:
+        stop_tts(guild)
+        stop_music(guild)
+    await bot_module.bot.close()
+    for guild in guilds:
+        await asyncio.to_thread(guild.voice_client.close)
+
+
+async def run(args):
+    import bot as bot_module
+    from metrics import COMMAND_ERRORS, OPENAI_TOKENS
+    from tts_module import tts_latency, tts_workers
+
+    fake_async = FakeCompletions(args.openai_latency, args.chunk_delay, args.answer_words)
+    fake_sync = FakeSyncCompletions(args.openai_latency, 0, args.answer_words)
+    install_fakes(args, fake_async, fake_sync)
+
+    rng = random.Random(args.seed)
+    guilds = [FakeGuild(f"guild-{i}", args.discord_latency, args.audio_speed) for i in range(args.guilds)]
+    users = [FakeUser(next(_ids), f"user{i}") for i in range(args.users)]
+    messages = build_messages(args, guilds, users, rng)
+
+    memory = {"start_kb": rss_kb()}
+    await setup_bot(bot_module, guilds)
+
+    samples, elapsed, errors = await run_workload(bot_module, messages, args.concurrency)
+    drain_seconds = await drain(args.drain_timeout)
+    gc.collect()
+    memory["after_workload_kb"] = rss_kb()
+
+    storage = await bench_storage(args, fake_async, guilds[0]) if args.storage_steps else []
+    gc.collect()
+    memory["after_storage_kb"] = rss_kb()
+
+    await teardown(bot_module, guilds)
+
+    for (command,), count in COMMAND_ERRORS.values().items():
+        errors[f"/{command}"] += count
+    tts = tts_latency.stats()["all"]
+    return {
+        "meta": {
+            "commit": git_commit(),
+            "python": platform.python_version(),
+            "discord.py": discord.__version__,
+            # 결과 파일 경로 등 측정에 영향이 없는 옵션은 빼고 남깁니다.
+            "options": {k: v for k, v in vars(args).items() if k not in ("workdir", "json", "compare", "threshold")},
+        },
+        "throughput": {
+            "messages": len(messages),
+            "seconds": elapsed,
+            "messages_per_sec": len(messages) / elapsed,
+            "drain_seconds": drain_seconds,
+        },
+        "latency": {
+            kind: {
+                "count": len(values),
+                "p50_ms": percentile(values, 0.5) * 1000,
+                "p99_ms": percentile(values, 0.99) * 1000,
+                "errors": errors.get(kind, 0),
+            }
+            for kind, values in sorted(samples.items())
+        },
+        "tts": {
+            "ttfa_p50_ms": tts["p50"] * 1000 if tts else None,
+            "ttfa_p95_ms": tts["p95"] * 1000 if tts else None,
+            "dropped": sum(worker.dropped for worker in tts_workers.values()),
+            "frames_played": sum(guild.voice_client.frames for guild in guilds),
+        },
+        "openai": {
+            "calls": fake_async.calls + fake_sync.calls,
+            "tokens": sum(OPENAI_TOKENS.values().values()),
+        },
+        "discord_api_calls": dict(sum((c.calls for g in guilds for c in g.text_channels), Counter())),
+        "memory": {
+            **memory,
+            "workload_growth_kb": _delta(memory["after_workload_kb"], memory["start_kb"]),
+            "storage_growth_kb": _delta(memory["after_storage_kb"], memory["after_workload_kb"]),
+        },
+        "storage": storage,
+    }
+
+
+def _delta(a, b):
+    return None if a is None or b is None else a - b
+
+
+# ---- 출력 ----
+
+def _fmt(value, digits=1):
+    return "-" if value is None else f"{value:.{digits}f}"
+
+
+def print_report(result):
+    meta = result["meta"]
+    print(f"커밋 {meta['commit'] or '?'} / Python {meta['python']} / discord.py {meta['discord.py']} / 시드 {meta['options']['seed']}")
+    t = result["throughput"]
+    print(f"\n메시지 {t['messages']}개, {t['seconds']:.2f}s -> {t['messages_per_sec']:.1f} msgs/sec "
+          f"(백그라운드 작업 정리 {_fmt(t['drain_seconds'], 2)}s)")
+
+    print(f"\n{'종류':<10}{'건수':>8}{'p50(ms)':>10}{'p99(ms)':>10}{'오류':>6}")
+    for kind, row in result["latency"].items():
+        print(f"{kind:<10}{row['count']:>8}{row['p50_ms']:>10.1f}{row['p99_ms']:>10.1f}{row['errors']:>6}")
+
+    tts = result["tts"]
+    print(f"\nTTS 첫 소리까지 p50 {_fmt(tts['ttfa_p50_ms'])}ms, p95 {_fmt(tts['ttfa_p95_ms'])}ms, "
+          f"대기열에서 버림 {tts['dropped']}건, 재생 프레임 {tts['frames_played']}")
+    print(f"OpenAI 호출 {result['openai']['calls']}회, 토큰 {result['openai']['tokens']}")
+    print(f"디스코드 API 호출 {result['discord_api_calls']}")
+
+    m = result["memory"]
+    print(f"\nRSS 시작 {_fmt(m['start_kb'], 0)}KB, 부하 후 +{_fmt(m['workload_growth_kb'], 0)}KB, "
+          f"저장소 측정 후 +{_fmt(m['storage_growth_kb'], 0)}KB")
+
+    if result["storage"]:
+        print(f"\n{'누적 건수':>10}{'대화 ms/턴':>12}{'DB KB':>10}{'회의 ms/건':>12}{'로그 KB':>10}{'요약 ms':>10}")
+        for row in result["storage"]:
+            print(f"{row['records']:>10}{row['conversation_ms_per_turn']:>12.2f}{row['conversation_db_kb']:>10.0f}"
+                  f"{row['meeting_ms_per_message']:>12.3f}{row['meeting_log_kb']:>10.0f}{row['meeting_summary_ms']:>10.1f}")
+
+
+def comparable_metrics(result):
+    """
+    비교할 지표 {이름: (값, 클수록 나쁜지, 무시할 변화량)}.
+    1ms도 안 걸리는 처리처럼 값이 아주 작으면 비율 변화가 커도 잡음이므로 변화량이 일정 이상일 때만 회귀로 봅니다.
+    """
+    metrics = {"messages_per_sec": (result["throughput"]["messages_per_sec"], False, 0.0)}
+    for kind, row in result["latency"].items():
+        metrics[f"{kind} p50_ms"] = (row["p50_ms"], True, 1.0)
+        metrics[f"{kind} p99_ms"] = (row["p99_ms"], True, 1.0)
+    metrics["workload_growth_kb"] = (result["memory"]["workload_growth_kb"], True, 4096)
+    if result["storage"]:
+        last = result["storage"][-1]
+        for key in ("conversation_ms_per_turn", "meeting_ms_per_message", "meeting_summary_ms"):
+            metrics[f"storage {key}"] = (last[key], True, 0.5)
+    return metrics
+
+
+def compare(previous, current, threshold):
+    """이전 결과와 비교해 출력하고, threshold(비율) 넘게 나빠진 지표 이름 목록을 반환합니다."""
+    if previous["meta"]["options"] != current["meta"]["options"]:
+        print("\n(주의: 이전 결과와 옵션이 달라 비교가 정확하지 않을 수 있습니다)")
+    before = comparable_metrics(previous)
+    regressions = []
+    print(f"\n이전 결과({previous['meta']['commit'] or '?'})와 비교")
+    for name, (value, higher_is_worse, noise) in comparable_metrics(current).items():
+        if name not in before or value is None or not before[name][0]:
+            continue
+        change = (value - before[name][0]) / before[name][0]
+        worse = change > threshold if higher_is_worse else change < -threshold
+        worse = worse and abs(value - before[name][0]) > noise
+        if worse:
+            regressions.append(name)
+        print(f"  {name:<36}{before[name][0]:>12.2f} -> {value:>12.2f} ({change:+.1%}){'  <- 나빠짐' if worse else ''}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--messages", type=int, default=2000, help="보낼 메시지 수")
+    parser.add_argument("--concurrency", type=int, default=32, help="동시에 처리 중인 최대 메시지 수")
+    parser.add_argument("--guilds", type=int, default=2)
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--distinct-questions", type=int, default=200, help="GPT 질문 종류 수 (작을수록 캐시 적중이 늘어납니다)")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--openai-latency", type=float, default=0.3, help="가짜 OpenAI 응답(스트림이면 첫 조각)까지 시간(초)")
+    parser.add_argument("--chunk-delay", type=float, default=0.01, help="가짜 OpenAI 스트림 조각 간격(초)")
+    parser.add_argument("--answer-words", type=int, default=60, help="가짜 OpenAI 답변 단어 수")
+    parser.add_argument("--tts-latency", type=float, default=0.2, help="가짜 gTTS 합성 시간(초)")
+    parser.add_argument("--ffmpeg-latency", type=float, default=0.02, help="가짜 FFmpeg 시작/디코딩 시간(초)")
+    parser.add_argument("--youtube-latency", type=float, default=0.15, help="가짜 YouTube 검색/yt-dlp 해석 시간(초)")
+    parser.add_argument("--discord-latency", type=float, default=0.05, help="가짜 디스코드 API(메시지 보내기/수정) 왕복 시간(초)")
+    parser.add_argument("--track-seconds", type=float, default=3.0, help="가짜 곡 길이(초)")
+    parser.add_argument("--audio-speed", type=float, default=20.0, help="가짜 음성 클라이언트가 오디오를 실제보다 몇 배 빠르게 읽을지")
+    parser.add_argument("--drain-timeout", type=float, default=120.0, help="백그라운드 작업(TTS/음악/요약)이 끝나기를 기다리는 최대 시간(초)")
+    parser.add_argument("--storage-steps", type=int, default=5, help="저장소 증가 비용을 잴 구간 수 (0이면 생략)")
+    parser.add_argument("--storage-step", type=int, default=200, help="구간마다 늘릴 대화 턴/회의 메시지 수")
+    parser.add_argument("--workdir", help="json_data를 만들 작업 디렉터리 (기본: 새 임시 디렉터리, 끝나면 삭제)")
+    parser.add_argument("--json", help="결과를 저장할 JSON 파일")
+    parser.add_argument("--compare", help="비교할 이전 결과 JSON 파일")
+    parser.add_argument("--threshold", type=float, default=0.1, help="이 비율 넘게 나빠지면 회귀로 표시합니다.")
+    args = parser.parse_args()
+
+    json_path = os.path.abspath(args.json) if args.json else None
+    previous = None
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            previous = json.load(f)
+
+    # 봇 모듈은 json_data 등을 현재 디렉터리 기준으로 쓰므로, 빈 작업 디렉터리에서 불러옵니다.
+    os.environ.update(BENCH_ENV)
+    sys.path.insert(0, REPO_ROOT)
+    workdir = os.path.abspath(args.workdir) if args.workdir else tempfile.mkdtemp(prefix="bench_bot_")
+    os.makedirs(os.path.join(workdir, "json_data"), exist_ok=True)
+    os.chdir(workdir)
+    try:
+        result = asyncio.run(run(args))
+    finally:
+        os.chdir(REPO_ROOT)
+        if not args.workdir:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    print_report(result)
+    if json_path:
+        with open(json_path, "w", encoding="utf-8") as f:
+            json.dump(result, f, ensure_ascii=False, indent=2)
+        print(f"\n결과를 {json_path}에 저장했습니다.")
+    if previous is not None and compare(previous, result, args.threshold):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+"""
+/gptcl 유사 질문 인덱스의 검색 지연 시간과 정확도를 인덱스 크기별로 측정합니다.
+
+- 재사용해야 하는 질문: 조사/어순/띄어쓰기만 다른 실제 질문 쌍 (적중률, 맞는 답을 돌려준 비율)
+- 재사용하면 안 되는 질문: 한 단어(오름/내림차순, 연도, 부정어, 대상)만 다르거나, 같은 단어의 조사 역할이 뒤바뀐 질문 쌍 (잘못 적중한 비율)
+인덱스는 무작위 질문으로 size개까지 채운 뒤 위 쌍의 원래 질문을 더해 만듭니다.
+
+사용법 (저장소 루트에서):
+    python -m benchmarks.bench_query_index --sizes 1000 5000 10000 50000
+"""
+import time
+import random
+import argparse
+from collections import defaultdict
+import numpy as np
+
+from gpt.query_index import QueryIndex
+
+SUBJECTS = ["파이썬", "디스코드 봇", "회의 요약", "점심 메뉴", "리액트", "도커", "깃허브", "주식", "날씨", "게임"]
+PREDICATES = ["설치하는 방법", "추천해줘", "뭐야", "에러 해결법", "장단점 알려줘", "사용법", "비교해줘"]
+PARTICLES = ["", "은", "는", "이", "가", "을", "를"]
+
+# (저장된 질문, 같은 뜻의 다른 표현, 종류)
+PARAPHRASE_PAIRS = [
+    ("도커 설치 방법", "도커는 설치 방법", "조사"),
+    ("파이썬 뭐야", "파이썬이 뭐야", "조사"),
+    ("날씨 알려줘", "날씨를 알려줘", "조사"),
+    ("리액트 상태 관리 방법", "리액트에서 상태 관리 방법", "조사"),
+    ("깃허브 액션 사용법", "깃허브의 액션 사용법", "조사"),
+    ("고양이 사료 추천", "고양이가 사료 추천", "조사"),
+    ("회의록 작성 요령", "회의록을 작성 요령", "조사"),
+    ("서울에서 부산까지 가는 방법", "서울에서 부산 가는 방법", "조사"),
+    ("도커 설치 방법", "설치 방법 도커", "어순"),
+    ("점심 메뉴 추천해줘", "추천해줘 점심 메뉴", "어순"),
+    ("파이썬 리스트 정렬", "리스트 정렬 파이썬", "어순"),
+    ("주식 장단점 알려줘", "장단점 알려줘 주식", "어순"),
+    ("도커 설치 방법", "도커설치방법", "띄어쓰기"),
+    ("디스코드 봇 배포 방법", "디스코드봇 배포방법", "띄어쓰기"),
+    ("how do i sort a list in python", "How do I sort a list in Python?", "띄어쓰기"),
+    ("점심 메뉴 추천해줘", "점심 메뉴 좀 추천해줘!!", "띄어쓰기"),
+]
+
+# (저장된 질문, 한 단어만 다르거나 두 단어의 역할이 뒤바뀌어 다른 답이 필요한 질문)
+NEAR_MISS_PAIRS = [
+    ("how do i sort a list in python in ascending order", "how do i sort a list in python in descending order"),
+    ("파이썬 리스트 오름차순 정렬", "파이썬 리스트 내림차순 정렬"),
+    ("2023년 연말정산 방법", "2024년 연말정산 방법"),
+    ("python 3.11 설치 방법", "python 3.12 설치 방법"),
+    ("설치가 돼", "설치가 안 돼"),
+    ("what is a list in python", "what is not a list in python"),
+    ("도커 설치 방법", "도커 삭제 방법"),
+    ("파이썬 설치 방법", "자바 설치 방법"),
+    ("서울 날씨 알려줘", "부산 날씨 알려줘"),
+    ("리액트 장점 알려줘", "리액트 단점 알려줘"),
+    ("파이썬보다 자바가 좋은 이유", "자바보다 파이썬이 좋은 이유"),
+    ("철수가 영희에게 보낸 편지", "영희가 철수에게 보낸 편지"),
+    ("서울에서 부산까지 가는 법", "서울까지 부산에서 가는 법"),
+    ("부산에서 서울까지 가는 길", "서울에서 부산까지 가는 길"),
+    ("영희가 철수를 때린 이유", "영희를 철수가 때린 이유"),
+    ("엑셀을 파이썬으로 바꾸는 법", "파이썬을 엑셀로 바꾸는 법"),
+]
+
+
+def make_query(rng):
+    subject = rng.choice(SUBJECTS)
+    return f"{subject}{rng.choice(PARTICLES)} {rng.choice(PREDICATES)} {rng.randint(0, 10**6)}"
+
+
+def bench(size, lookups, rng):
+    index = QueryIndex(path=None, max_entries=size * 2, compact_every=size * 2)
+    queries = [(make_query(rng), "filler") for _ in range(size)]
+    queries += [(stored, f"answer:{stored}") for stored, _, _ in PARAPHRASE_PAIRS]
+    queries += [(stored, f"answer:{stored}") for stored, _ in NEAR_MISS_PAIRS]
+    start = time.perf_counter()
+    for query, answer in queries:
+        index.add(query, answer)
+    insert_ms = (time.perf_counter() - start) * 1000 / len(queries)
+
+    hits = defaultdict(int)
+    totals = defaultdict(int)
+    for stored, paraphrase, kind in PARAPHRASE_PAIRS:
+        totals[kind] += 1
+        if index.lookup(paraphrase) == f"answer:{stored}":
+            hits[kind] += 1
+    false_hits = sum(index.lookup(near_miss) is not None for _, near_miss in NEAR_MISS_PAIRS)
+
+    probes = [paraphrase for _, paraphrase, _ in PARAPHRASE_PAIRS] + [near_miss for _, near_miss in NEAR_MISS_PAIRS]
+    samples = []
+    for _ in range(lookups):
+        query = rng.choice(probes)
+        start = time.perf_counter()
+        index.lookup(query)
+        samples.append((time.perf_counter() - start) * 1000)
+    samples = np.array(samples)
+
+    return {
+        "size": size,
+        "insert_ms": insert_ms,
+        "p50_ms": float(np.percentile(samples, 50)),
+        "p99_ms": float(np.percentile(samples, 99)),
+        "hit_rates": {kind: hits[kind] / totals[kind] for kind in totals},
+        "false_hit_rate": false_hits / len(NEAR_MISS_PAIRS),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 5000, 10000, 50000])
+    parser.add_argument("--lookups", type=int, default=500)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    kinds = list(dict.fromkeys(kind for _, _, kind in PARAPHRASE_PAIRS))
+    print(f"{'size':>8} {'insert(ms)':>11} {'p50(ms)':>9} {'p99(ms)':>9} "
+          + " ".join(f"{kind + ' 적중':>10}" for kind in kinds) + f" {'오적중':>8}")
+    for size in args.sizes:
+        result = bench(size, args.lookups, rng)
+        print(
+            f"{result['size']:>8} {result['insert_ms']:>11.3f} {result['p50_ms']:>9.3f} {result['p99_ms']:>9.3f} "
+            + " ".join(f"{result['hit_rates'][kind]:>10.0%}" for kind in kinds)
+            + f" {result['false_hit_rate']:>8.0%}"
+        )
+
+
+if __name__ == "__main__":
+    main()
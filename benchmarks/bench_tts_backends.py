@@ -0,0 +1,81 @@
+"""
+TTS 엔진별 합성 지연 시간과 처리량을 고정된 한국어/영어 문장으로 비교합니다.
+
+- 지연 시간: 문장을 하나씩 순서대로 합성할 때 문장당 p50/p95 (ms)
+- 처리량: --concurrency개 스레드로 동시에 합성할 때 초당 문장 수
+
+캐시를 거치지 않고 엔진을 직접 호출합니다. 설치되지 않은 엔진(espeak-ng 등)은 건너뜁니다.
+
+사용법 (저장소 루트에서):
+    python -m benchmarks.bench_tts_backends --runs 3 --concurrency 4
+    python -m benchmarks.bench_tts_backends --backends espeak
+"""
+import time
+import argparse
+import statistics
+from concurrent.futures import ThreadPoolExecutor
+
+from tts_backends import TTS_BACKENDS
+
+CORPUS = [
+    ("ko", "안녕하세요."),
+    ("ko", "오늘 회의는 오후 세 시에 시작합니다."),
+    ("ko", "발표 자료는 회의 전에 공유 폴더에 올려 주세요."),
+    ("ko", "다음 주까지 배포 일정과 테스트 결과를 정리해서 알려 주시면 감사하겠습니다."),
+    ("en", "Hello there."),
+    ("en", "The meeting starts at three in the afternoon."),
+    ("en", "Please upload the slides to the shared folder before the meeting."),
+    ("en", "Let me know the release schedule and the test results by next week."),
+]
+
+
+def percentile(values, ratio):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * ratio))]
+
+
+def bench_latency(backend, corpus, runs):
+    latencies = []
+    for _ in range(runs):
+        for language, text in corpus:
+            start = time.perf_counter()
+            backend.synthesize(text, language)
+            latencies.append((time.perf_counter() - start) * 1000)
+    return latencies
+
+
+def bench_throughput(backend, corpus, runs, concurrency):
+    jobs = corpus * runs
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(lambda job: backend.synthesize(job[1], job[0]), jobs))
+    return len(jobs) / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--backends", nargs="*", default=list(TTS_BACKENDS), help="비교할 엔진 이름")
+    parser.add_argument("--runs", type=int, default=3, help="말뭉치를 반복할 횟수")
+    parser.add_argument("--concurrency", type=int, default=4, help="처리량 측정 시 동시 합성 수")
+    args = parser.parse_args()
+
+    for name in args.backends:
+        backend = TTS_BACKENDS[name]
+        if not backend.available():
+            print(f"{name:>8} 사용할 수 없음 (설치되어 있지 않습니다)")
+            continue
+        languages = backend.languages()
+        corpus = [(language, text) for language, text in CORPUS if language in languages]
+        language, text = corpus[0]
+        backend.synthesize(text, language)  # 첫 호출(연결, 음성 데이터 로드) 비용은 제외합니다.
+        latencies = bench_latency(backend, corpus, args.runs)
+        throughput = bench_throughput(backend, corpus, args.runs, args.concurrency)
+        print(
+            f"{name:>8} latency p50 {statistics.median(latencies):7.1f}ms | "
+            f"p95 {percentile(latencies, 0.95):7.1f}ms | "
+            f"throughput {throughput:6.1f} utterances/s (x{args.concurrency})"
+        )
+
+
+if __name__ == "__main__":
+    main()
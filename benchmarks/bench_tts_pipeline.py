@@ -0,0 +1,165 @@
+"""
+TTS 재생 경로별 발화 1건당 지연 시간과 CPU 사용량을 비교합니다.
+
+- file+pcm   : MP3를 임시 파일로 쓰고 FFmpeg로 PCM 디코딩 -> 봇 프로세스에서 Opus 인코딩
+- pipe+opus  : MP3를 파이프로 FFmpeg에 넘기고 FFmpeg가 바로 Opus로 인코딩
+- mixer      : 현재 봇이 쓰는 경로. 파이프로 PCM까지 디코딩(audio_mixer.decode_to_pcm) -> GuildMixer 레인에 넣고
+               20ms마다 read() -> 봇 프로세스에서 Opus 인코딩
+- mixer+music: mixer와 같되 음악 레인도 함께 재생 중이라 프레임마다 섞기(ducking)까지 하는 경우
+
+믹서는 여러 레인을 PCM으로 섞어야 하므로 FFmpeg의 Opus 출력을 그대로 보내지 못하고(is_opus() == False),
+Opus 인코딩을 다시 봇 프로세스에서 합니다. pipe+opus와 mixer의 차이가 그 비용입니다.
+
+FFmpeg 인자는 discord.FFmpegPCMAudio / discord.FFmpegOpusAudio가 쓰는 것과 같습니다.
+PCM -> Opus 인코딩 비용은 discord.py(libopus)가 설치되어 있을 때만 측정합니다.
+
+사용법 (저장소 루트에서):
+    python -m benchmarks.bench_tts_pipeline --input sample.mp3 --runs 20
+    python -m benchmarks.bench_tts_pipeline --text "안녕하세요 반갑습니다" --runs 20   (gTTS로 샘플 생성)
+"""
+import os
+import time
+import asyncio
+import argparse
+import resource
+import subprocess
+import statistics
+
+from tts_module import FFMPEG_EXECUTABLE
+from tts_backends import TTS_BACKENDS
+from audio_mixer import GuildMixer, SILENCE, decode_to_pcm
+
+PCM_FRAME_BYTES = 3840  # 20ms, 48kHz, 16bit, 스테레오
+
+
+def _children_cpu():
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return usage.ru_utime + usage.ru_stime
+
+
+def _self_cpu():
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    return usage.ru_utime + usage.ru_stime
+
+
+def _opus_encoder():
+    try:
+        import discord
+
+        if not discord.opus.is_loaded():
+            discord.opus._load_default()
+        return discord.opus.Encoder()
+    except Exception as e:
+        print(f"(Opus 인코더를 불러오지 못해 PCM -> Opus 인코딩 비용은 제외합니다: {e})")
+        return None
+
+
+def run_file_pcm(audio, encoder):
+    filename = "bench_tts_audio.mp3"
+    with open(filename, "wb") as f:
+        f.write(audio)
+    args = [FFMPEG_EXECUTABLE, "-i", filename, "-f", "s16le", "-ar", "48000", "-ac", "2", "-loglevel", "warning", "pipe:1"]
+    start = time.perf_counter()
+    process = subprocess.Popen(args, stdout=subprocess.PIPE, stdin=subprocess.DEVNULL)
+    first = None
+    while True:
+        frame = process.stdout.read(PCM_FRAME_BYTES)
+        if first is None:
+            first = time.perf_counter() - start
+        if len(frame) < PCM_FRAME_BYTES:
+            break
+        if encoder is not None:
+            encoder.encode(frame, encoder.SAMPLES_PER_FRAME)
+    process.wait()
+    total = time.perf_counter() - start
+    os.remove(filename)
+    return first, total
+
+
+def run_pipe_opus(audio, encoder):
+    args = [
+        FFMPEG_EXECUTABLE, "-i", "-", "-map_metadata", "-1", "-f", "opus", "-c:a", "libopus",
+        "-ar", "48000", "-ac", "2", "-b:a", "128k", "-loglevel", "warning", "pipe:1",
+    ]
+    start = time.perf_counter()
+    process = subprocess.Popen(args, stdout=subprocess.PIPE, stdin=subprocess.PIPE)
+    process.stdin.write(audio)
+    process.stdin.close()
+    first = None
+    while True:
+        chunk = process.stdout.read(4096)
+        if first is None:
+            first = time.perf_counter() - start
+        if not chunk:
+            break
+    process.wait()
+    return first, time.perf_counter() - start
+
+
+async def _play_through_mixer(audio, encoder, with_music):
+    start = time.perf_counter()
+    pcm = await decode_to_pcm(audio)
+    # 발화 전체가 버퍼에 들어가도록 넉넉히 잡고, 재생 스레드 대신 여기서 read()를 부릅니다.
+    mixer = GuildMixer(asyncio.get_running_loop(), buffer_seconds=len(pcm) / 192000 + 1)
+    if with_music:
+        await mixer.feed("music", pcm)
+    await mixer.feed("tts", pcm)
+    first = None
+    while True:
+        frame = mixer.read()
+        if first is None:
+            first = time.perf_counter() - start
+        if frame == SILENCE:
+            break
+        if encoder is not None:
+            encoder.encode(frame, encoder.SAMPLES_PER_FRAME)
+    return first, time.perf_counter() - start
+
+
+def run_mixer(audio, encoder):
+    return asyncio.run(_play_through_mixer(audio, encoder, with_music=False))
+
+
+def run_mixer_music(audio, encoder):
+    return asyncio.run(_play_through_mixer(audio, encoder, with_music=True))
+
+
+def bench(name, runner, audio, runs, encoder):
+    firsts, totals = [], []
+    children_before, self_before = _children_cpu(), _self_cpu()
+    for _ in range(runs):
+        first, total = runner(audio, encoder)
+        firsts.append(first * 1000)
+        totals.append(total * 1000)
+    cpu_ms = ((_children_cpu() - children_before) + (_self_cpu() - self_before)) * 1000 / runs
+    print(
+        f"{name:>11} first byte p50 {statistics.median(firsts):7.1f}ms | "
+        f"total p50 {statistics.median(totals):7.1f}ms | cpu/utterance {cpu_ms:7.1f}ms"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--input", help="측정에 사용할 MP3 파일")
+    parser.add_argument("--text", default="안녕하세요. 오늘 회의는 세 시에 시작합니다.", help="--input이 없을 때 gTTS로 합성할 문장")
+    parser.add_argument("--lang", default="ko")
+    parser.add_argument("--runs", type=int, default=20)
+    args = parser.parse_args()
+
+    if FFMPEG_EXECUTABLE is None:
+        raise SystemExit("FFmpeg를 찾을 수 없습니다. FFMPEG_PATH를 설정하세요.")
+    if args.input:
+        with open(args.input, "rb") as f:
+            audio = f.read()
+    else:
+        audio = TTS_BACKENDS["gtts"].synthesize(args.text, args.lang)
+
+    encoder = _opus_encoder()
+    bench("file+pcm", run_file_pcm, audio, args.runs, encoder)
+    bench("pipe+opus", run_pipe_opus, audio, args.runs, encoder)
+    bench("mixer", run_mixer, audio, args.runs, encoder)
+    bench("mixer+music", run_mixer_music, audio, args.runs, encoder)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,15 +1,29 @@
 import os
+import time
+import asyncio
 import platform
 import discord
 from discord.ext import commands
 from dotenv import load_dotenv
 
 # 모듈 임포트
-from gpt.gpt import summarize_meeting_content, send_independent_query
-from save import save_conversation_data_json
-from youtube_module import search_youtube
-from gpt.gpt_module import handle_gpt_request, clear_conversations, get_conversation_history
-from tts_module import handle_tts, set_tts_language
+from gpt.gpt import summarize_meeting_content, send_independent_query, independent_query_cache, independent_query_index
+from meeting_index import parse_range
+from save import save_conversation_data_json, meeting_log_writer, meeting_log_path, clear_meeting_log
+from youtube_module import search_youtube, search_youtube_list
+from music_player import play_music, skip_music, show_music_queue, stop_music
+from settings import guild_settings, FEATURE_CHANNEL_NAMES, LIMITS
+from gpt.stream_reply import send_long_message
+from gpt.gpt_client import close_gpt_service
+from gpt.meeting_jobs import meeting_jobs, STATE_LABELS
+from gpt.gpt_module import handle_gpt_request, clear_conversations, get_conversation_history, cancel_gpt_requests
+from tts_module import handle_tts, set_tts_language, tts_cache, stop_tts, tts_latency, TTS_QUEUE_DEPTH
+from youtube_module import YOUTUBE_QUOTA_USED, quota_tracker
+from stall_detector import stall_detector, STALL_DETECTOR, dump_cprofile, dump_sampling_profile
+from metrics import (
+    COMMAND_LATENCY, COMMAND_ERRORS, MESSAGE_LATENCY, OPENAI_TOKENS, TTS_SYNTH_LATENCY, FFMPEG_STARTUP,
+    MEETING_LOG_MESSAGES, MEETING_LOG_BYTES, start_metrics_server, stop_metrics_server,
+)
 
 # Opus 라이브러리 로드 (OS별 경로 설정)
 OPUS_LIBRARY_PATH = {
@@ -37,49 +51,179 @@ intents.message_content = True
 intents.voice_states = True
 intents.members = True
 
-bot = commands.Bot(command_prefix='/', intents=intents)
+class DiscordBot(commands.Bot):
+    async def setup_hook(self):
+        # Prometheus 형식 지표 엔드포인트 (METRICS_PORT=0이면 열지 않습니다)
+        await start_metrics_server()
+        # 이벤트 루프 멈춤 감지 (STALL_DETECTOR=1일 때만)
+        if STALL_DETECTOR:
+            stall_detector.install(asyncio.get_running_loop())
+
+    async def close(self):
+        # 종료 전에 대기 중인 회의 로그, YouTube 할당량, /gptcl 질문 인덱스를 모두 기록하고 GPT 커넥션 풀을 정리합니다.
+        await meeting_log_writer.close()
+        await guild_settings.flush()
+        await quota_tracker.flush()
+        await asyncio.to_thread(independent_query_index.save)
+        await meeting_jobs.close()
+        await close_gpt_service()
+        await stop_metrics_server()
+        await stall_detector.uninstall()
+        await super().close()
+
+bot = DiscordBot(command_prefix='/', intents=intents)
 
 # 음성 채널 연결 상태 저장 (전역 변수, on_message보다 앞에 선언)
 voice_connected_guilds = set()
 
 @bot.event
 async def on_ready():
+    # 기능 채널이 지정되지 않은 서버는 예전 이름('tts', '회의', 'chatgpt')의 채널을 찾아 등록합니다.
+    for guild in bot.guilds:
+        guild_settings.discover_channels(guild)
     print(f'Logged in as {bot.user.name}')
 
+@bot.event
+async def on_guild_join(guild):
+    guild_settings.discover_channels(guild)
+
+# TTS 처리: 음성 연결 상태인 경우에만 읽어줍니다.
+async def handle_tts_message(message):
+    if message.guild.id in voice_connected_guilds:
+        await handle_tts(message)
+
+# chatgpt 채널 메시지는 GPT 대화로 처리합니다.
+async def handle_chatgpt_message(message):
+    ctx = await bot.get_context(message)
+    await handle_gpt_request(ctx, message.content)
+
+# 기능 이름 -> 그 기능 채널에 올라온 일반 메시지(명령어 제외)를 처리할 함수
+CHANNEL_HANDLERS = {
+    "tts": handle_tts_message,
+    "meeting": save_conversation_data_json,  # 회의 채널 대화 내용 저장
+    "chatgpt": handle_chatgpt_message,
+}
+
 @bot.event
 async def on_message(message):
     if message.author == bot.user:
         return
 
-    # 명령어를 먼저 처리합니다.
-    await bot.process_commands(message)
+    # 명령어는 접두사로 시작하는 메시지만 처리합니다.
+    if message.content.startswith(bot.command_prefix):
+        with MESSAGE_LATENCY.time(branch="command"):
+            await bot.process_commands(message)
+        return
 
-    # TTS 처리: tts 채널에서, 명령어가 아닌 메시지, 그리고 음성 연결 상태인 경우
-    if (message.channel.name == 'tts' and
-        not message.content.startswith('/') and
-        message.guild.id in voice_connected_guilds):
-        await handle_tts(message)
+    # 채널 ID로 기능을 바로 찾습니다. 기능 채널이 아니면 아무것도 하지 않습니다.
+    feature = guild_settings.route(message.channel.id)
+    if feature is not None:
+        stall_detector.label_task(f"on_message:{feature}")
+        with MESSAGE_LATENCY.time(branch=feature):
+            await CHANNEL_HANDLERS[feature](message)
 
-    # 회의 채널에서 대화 내용 저장 (명령어 제외)
-    if message.channel.name == "회의" and not message.content.startswith('/'):
-        await save_conversation_data_json(message)
+# 명령어별 처리 시간을 기록합니다. (검사에 실패해 실행되지 않은 명령어는 제외)
+@bot.before_invoke
+async def start_command_timer(ctx):
+    ctx.started_at = time.perf_counter()
+    # 이벤트 루프 멈춤이 어느 명령어에서 일어났는지 알 수 있게 현재 태스크에 이름을 붙입니다.
+    stall_detector.label_task(f"/{ctx.command.qualified_name}")
 
-    # chatgpt 채널에서 메시지 처리 (명령어 제외)
-    if message.channel.name == "chatgpt" and not message.content.startswith('/'):
-        ctx = await bot.get_context(message)
-        await handle_gpt_request(ctx, message.content)
+@bot.after_invoke
+async def record_command_latency(ctx):
+    started_at = getattr(ctx, "started_at", None)
+    if started_at is None:
+        return
+    COMMAND_LATENCY.observe(time.perf_counter() - started_at, command=ctx.command.qualified_name)
+    if ctx.command_failed:
+        COMMAND_ERRORS.inc(command=ctx.command.qualified_name)
 
 # 유튜브 검색 명령어: 사용자가 입력한 쿼리를 기반으로 유튜브 영상을 검색합니다.
 @bot.command()
 async def y(ctx, *, query=None):
     await search_youtube(ctx, query)
 
+# 유튜브 검색 목록 명령어: 검색 결과 상위 목록을 페이지로 나눠 보여줍니다. 예) /ylist 검색어, /ylist 2 검색어
+@bot.command()
+async def ylist(ctx, *, query=None):
+    await search_youtube_list(ctx, query)
+
+# 음악 재생 명령어: 유튜브 검색어나 URL의 오디오를 /vc로 들어온 음성 채널에서 재생합니다.
+# (MUSIC_LOCAL_DIR을 설정하면 `/play local:파일명`으로 로컬 파일도 재생할 수 있습니다)
+@bot.command()
+async def play(ctx, *, query=None):
+    await play_music(ctx, query)
+
+# 음악 건너뛰기 명령어: 지금 재생 중인 곡을 건너뜁니다.
+@bot.command()
+async def skip(ctx):
+    await skip_music(ctx)
+
+# 음악 대기열 명령어: 재생 중인 곡과 대기 중인 곡 목록을 보여줍니다.
+@bot.command(name='queue')
+async def show_queue(ctx):
+    await show_music_queue(ctx)
+
 # 회의 요약 명령어: 회의 채널에 저장된 대화 내용을 요약하여 출력합니다.
+# (회의 채널에서 실행하면 그 채널을, 다른 채널에서 실행하면 서버의 회의 채널을 요약합니다)
+# 범위 예시: /mtcl last 2h, /mtcl since 14:00, /mtcl last 200 messages
 @bot.command()
-async def mtcl(ctx):
+async def mtcl(ctx, *, time_range=None):
+    selected_range = {}
+    if time_range:
+        try:
+            selected_range = parse_range(time_range)
+        except ValueError:
+            await ctx.send("범위를 이해하지 못했습니다. 예: `/mtcl last 2h`, `/mtcl since 14:00`, `/mtcl last 200 messages`")
+            return
+
+    meeting_channel = ctx.channel
+    if guild_settings.route(meeting_channel.id) != "meeting":
+        channel_id = guild_settings.channel_id(ctx.guild.id, "meeting")
+        meeting_channel = ctx.guild.get_channel(channel_id) if channel_id else None
+        if meeting_channel is None:
+            await ctx.send("이 서버에 회의 채널이 지정되어 있지 않습니다. `/setchannel meeting`으로 지정해주세요.")
+            return
+
+    # 방금 보낸 메시지까지 요약에 포함되도록 대기 중인 로그를 먼저 기록합니다.
+    await meeting_log_writer.flush()
     user_id = str(ctx.author.id)
-    summary = summarize_meeting_content(user_id)
-    await ctx.send(summary)
+    meeting_file = meeting_log_path(ctx.guild.id, meeting_channel.id)
+
+    # 요약은 Celery 워커에 맡기고 바로 답합니다. 결과는 끝나는 대로 이 채널에 올립니다.
+    try:
+        job, created = await meeting_jobs.submit(ctx.channel, user_id, meeting_file, **selected_range)
+    except Exception as e:
+        # 브로커에 연결할 수 없으면 예전처럼 봇에서 바로 요약합니다.
+        print(f"회의 요약 작업을 보내지 못해 직접 요약합니다: {e}")
+        summary = await summarize_meeting_content(user_id, meeting_file, guild_id=ctx.guild.id, **selected_range)
+        await send_long_message(ctx, summary)
+        return
+    if created:
+        await ctx.send(f"회의 요약을 시작했습니다. (작업 `{job.id}`) 끝나면 이 채널에 올려 드릴게요. 진행 상황은 `/jobs`로 볼 수 있습니다.")
+    else:
+        await ctx.send(f"같은 범위의 회의 요약(작업 `{job.id}`)이 이미 진행 중입니다. 끝나면 이 채널에 올려 드릴게요.")
+
+# 작업 상태 명령어: 회의 요약 작업 대기열과 진행 중인 작업을 보여줍니다.
+@bot.command()
+async def jobs(ctx):
+    stats = await meeting_jobs.stats()
+    depth = "알 수 없음" if stats["queue_depth"] is None else f"{stats['queue_depth']}개"
+    if stats["workers"] is None:
+        workers = "알 수 없음"
+    else:
+        workers = ", ".join(f"{name} {count}개" for name, count in stats["workers"].items()) or "응답한 워커 없음"
+    lines = [f"**회의 요약 작업**", f"브로커 대기열 {depth} / 워커별 실행 중: {workers}"]
+    now = time.time()
+    for job in stats["active"]:
+        lines.append(f"`{job.id}` {STATE_LABELS.get(job.state, job.state)} - {now - job.created_at:.0f}초 경과, <@{job.user_id}>")
+    for job in reversed(stats["finished"][-5:]):
+        lines.append(
+            f"`{job.id}` {STATE_LABELS.get(job.state, job.state)} - {job.finished_at - job.created_at:.0f}초 걸림, <@{job.user_id}>"
+        )
+    if not stats["active"] and not stats["finished"]:
+        lines.append("아직 요청된 작업이 없습니다.")
+    await ctx.send("\n".join(lines), allowed_mentions=discord.AllowedMentions.none())
 
 # GPT 대화 명령어: 기존 대화 기록을 활용하여 GPT에게 질문을 전달합니다.
 @bot.command()
@@ -92,34 +236,180 @@ async def gptcl(ctx, *, query=None):
     if query is None:
         await ctx.send("질문을 입력해 주세요.")
         return
-    answer = send_independent_query(query)
-    await ctx.send(answer)
+    answer = await send_independent_query(query, ctx)
+    await send_long_message(ctx, answer)
+
+# GPT 응답 캐시 상태 명령어: /gptcl 캐시 적중률과 크기를 출력합니다.
+@bot.command()
+async def gptcache(ctx):
+    stats = independent_query_cache.stats()
+    await ctx.send(
+        f"**/gptcl 캐시**\n"
+        f"적중 {stats['hits']}회 (디스크 {stats['disk_hits']}회) / 미적중 {stats['misses']}회 "
+        f"/ 중복 요청 합침 {stats['coalesced']}회\n"
+        f"적중률 {stats['hit_rate']:.1%}, 항목 {stats['entries']}/{stats['max_entries']}"
+    )
+    index_stats = independent_query_index.stats()
+    await ctx.send(
+        f"**/gptcl 유사 질문 인덱스**\n"
+        f"적중 {index_stats['hits']}회 / 미적중 {index_stats['misses']}회 "
+        f"(적중률 {index_stats['hit_rate']:.1%}), 항목 {index_stats['entries']}개"
+    )
+
+# GPT 요청 취소 명령어: 내가 보낸 진행 중인 GPT 요청을 취소합니다.
+@bot.command()
+async def cancel(ctx):
+    await cancel_gpt_requests(ctx)
 
 # 전체 채팅방 초기화 명령어: 채널을 클론하고 기존 채팅방을 삭제하여 초기화합니다.
 @bot.command()
 async def clearChatAll(ctx):
     new_channel = await ctx.channel.clone()
+    # 기능 채널이었다면 새 채널로 연결을 옮깁니다.
+    guild_settings.replace_channel(ctx.channel.id, new_channel.id)
     await ctx.channel.delete()
     await new_channel.send("채팅방이 초기화되었습니다!")
 
-# 회의 채팅방 및 회의 내용 초기화 명령어: '회의' 채널에서 채팅 내용과 회의 로그 파일을 초기화합니다.
+# 회의 채팅방 및 회의 내용 초기화 명령어: 회의 채널에서 채팅 내용과 회의 로그 파일을 초기화합니다.
 @bot.command()
 async def clearChat(ctx):
-    if ctx.channel.name != "회의":
-        await ctx.send("이 채널은 '회의' 채널이 아니어서 초기화할 수 없습니다.", delete_after=5)
+    if guild_settings.route(ctx.channel.id) != "meeting":
+        await ctx.send("이 채널은 회의 채널이 아니어서 초기화할 수 없습니다.", delete_after=5)
         return
 
-    # 채널 클론
+    # 채널 클론 후 회의 채널 지정을 새 채널로 옮깁니다.
     new_channel = await ctx.channel.clone()
+    guild_settings.replace_channel(ctx.channel.id, new_channel.id)
 
-    # 회의 대화내용 파일 초기화 (파일 내용을 비웁니다)
-    with open("json_data/meeting_data.json", "w", encoding="utf-8") as f:
-        f.write("")
+    # 이 채널의 회의 대화내용 파일 초기화 (다른 서버/채널의 회의 로그는 그대로 둡니다)
+    await clear_meeting_log(ctx.guild.id, ctx.channel.id)
 
     # 기존 채널 삭제 후 새 채널에 메시지 전송
     await ctx.channel.delete()
     await new_channel.send("채팅방과 회의 대화 내용이 초기화되었습니다!")
 
+# 기능 채널 지정 명령어: 현재(또는 멘션한) 채널을 tts / meeting / chatgpt 기능 채널로 지정합니다.
+# 예) /setchannel tts, /setchannel meeting #회의, /setchannel chatgpt off
+@bot.command()
+@commands.has_permissions(manage_guild=True)
+async def setchannel(ctx, feature: str, target: str = None):
+    if feature not in FEATURE_CHANNEL_NAMES:
+        await ctx.send(f"알 수 없는 기능입니다. 사용 가능한 기능: {', '.join(FEATURE_CHANNEL_NAMES)}")
+        return
+    if target == "off":
+        guild_settings.set_channel(ctx.guild.id, feature, None)
+        await ctx.send(f"{feature} 기능 채널 지정을 해제했습니다.")
+        return
+    channel = ctx.message.channel_mentions[0] if ctx.message.channel_mentions else ctx.channel
+    guild_settings.set_channel(ctx.guild.id, feature, channel.id)
+    await ctx.send(f"{channel.mention} 채널을 {feature} 기능 채널로 지정했습니다.")
+
+# 기능 채널 목록 명령어: 이 서버에 지정된 기능 채널을 보여줍니다.
+@bot.command()
+async def channels(ctx):
+    configured = guild_settings.channels(ctx.guild.id)
+    lines = []
+    for feature in FEATURE_CHANNEL_NAMES:
+        channel = ctx.guild.get_channel(configured[feature]) if feature in configured else None
+        lines.append(f"{feature}: {channel.mention if channel else '(지정 안 됨)'}")
+    await ctx.send("**기능 채널**\n" + "\n".join(lines))
+
+# 서버별 제한 설정 명령어: 예) /setlimit tts_queue 30, /setlimit music_queue 100
+@bot.command()
+@commands.has_permissions(manage_guild=True)
+async def setlimit(ctx, name: str, value: int):
+    if name not in LIMITS:
+        await ctx.send(f"알 수 없는 설정입니다. 사용 가능한 설정: {', '.join(LIMITS)}")
+        return
+    low, high = LIMITS[name]
+    if not low <= value <= high:
+        await ctx.send(f"{name} 값은 {low}~{high} 사이여야 합니다.")
+        return
+    guild_settings.set_limit(ctx.guild.id, name, value)
+    await ctx.send(f"{name} 값을 {value}(으)로 설정했습니다.")
+
+def format_latency_summary(histogram, prefix="", limit=10):
+    """히스토그램 요약을 많이 쓰인 순서대로 '이름 N회 평균 Xms (p95 ≤ Yms)' 줄로 만듭니다."""
+    rows = sorted(histogram.summary().items(), key=lambda item: item[1][0], reverse=True)[:limit]
+    lines = []
+    for key, (count, average, p95) in rows:
+        p95_text = "∞" if p95 == float("inf") else f"{p95 * 1000:.0f}ms"
+        lines.append(f"{prefix}{'/'.join(key) or '-'} {count}회 평균 {average * 1000:.0f}ms (p95 ≤ {p95_text})")
+    return lines or ["(기록 없음)"]
+
+# 봇 상태 명령어(관리자용): 명령어 지연 시간, 토큰 사용량, TTS/FFmpeg 시간, 대기열과 할당량을 보여줍니다.
+# 같은 지표를 Prometheus 형식으로 http://127.0.0.1:9108/metrics 에서도 볼 수 있습니다.
+@bot.command()
+@commands.has_permissions(manage_guild=True)
+async def stats(ctx):
+    lines = ["**명령어 처리 시간**"]
+    lines += format_latency_summary(COMMAND_LATENCY, prefix="/")
+    errors = COMMAND_ERRORS.values()
+    if errors:
+        lines.append("오류: " + ", ".join(f"/{key[0]} {count}회" for key, count in errors.items()))
+    lines.append("**메시지 처리 시간**")
+    lines += format_latency_summary(MESSAGE_LATENCY)
+
+    lines.append("**OpenAI 토큰**")
+    tokens = {}
+    for (model, kind), count in OPENAI_TOKENS.values().items():
+        tokens.setdefault(model, {})[kind] = count
+    lines += [
+        f"{model}: 입력 {usage.get('prompt', 0):,} / 출력 {usage.get('completion', 0):,}"
+        for model, usage in tokens.items()
+    ] or ["(기록 없음)"]
+
+    lines.append("**TTS 합성 / FFmpeg 시작**")
+    lines += format_latency_summary(TTS_SYNTH_LATENCY, prefix="TTS ")
+    lines += format_latency_summary(FFMPEG_STARTUP, prefix="FFmpeg ")
+
+    queues = TTS_QUEUE_DEPTH.values()
+    messages = MEETING_LOG_MESSAGES.values().get((), 0)
+    written = MEETING_LOG_BYTES.values().get((), 0)
+    lines.append("**대기열 / 기록 / 할당량**")
+    lines.append(f"TTS 대기열: 이 서버 {queues.get((str(ctx.guild.id),), 0)}개, 전체 {sum(queues.values())}개")
+    lines.append(f"회의 로그 기록: 메시지 {messages:,}개 ({written / 1024:.1f}KB)")
+    used = YOUTUBE_QUOTA_USED.values().get((), 0)
+    lines.append(f"YouTube 할당량: {used:,} / {quota_tracker.daily_limit:,}")
+    await send_long_message(ctx, "\n".join(lines))
+
+# 프로파일 명령어(관리자용): 실행 중인 봇을 측정합니다.
+# /profile stalls : 이벤트 루프 멈춤 보고서 (STALL_DETECTOR=1일 때)
+# /profile cprofile 10 : 10초 동안 cProfile로 측정해 json_data/profiles/에 .prof 파일로 저장
+# /profile sample 10 : 10초 동안 루프 스레드 스택을 채집해 flamegraph용 .folded 파일로 저장
+@bot.command()
+@commands.has_permissions(manage_guild=True)
+async def profile(ctx, mode: str = "stalls", seconds: float = 10.0):
+    if mode == "stalls":
+        if not stall_detector.installed:
+            await ctx.send("멈춤 감지가 꺼져 있습니다. STALL_DETECTOR=1로 봇을 실행해주세요.")
+            return
+        await send_long_message(ctx, stall_detector.format_report())
+        return
+    if mode not in ("cprofile", "sample"):
+        await ctx.send("사용법: `/profile stalls`, `/profile cprofile 10`, `/profile sample 10`")
+        return
+    seconds = min(max(seconds, 1.0), 120.0)
+    await ctx.send(f"{seconds:.0f}초 동안 측정합니다...")
+    if mode == "cprofile":
+        path, summary = await dump_cprofile(seconds)
+    else:
+        path, summary = await dump_sampling_profile(seconds)
+    await ctx.send(f"측정 결과를 `{path}`에 저장했습니다.")
+    await send_long_message(ctx, f"```\n{summary[-1800:]}\n```")
+
+@setchannel.error
+@setlimit.error
+@stats.error
+@profile.error
+async def admin_command_error(ctx, error):
+    if isinstance(error, commands.MissingPermissions):
+        await ctx.send("서버 관리 권한이 필요합니다.")
+    elif isinstance(error, commands.UserInputError):
+        await ctx.send(f"명령어 사용법이 올바르지 않습니다: `{ctx.prefix}{ctx.command.name} {ctx.command.signature}`")
+    else:
+        print(f"관리 명령어 오류: {error}")
+
 # 대화 기록 초기화 명령어: GPT 모듈에 저장된 대화 기록을 초기화합니다.
 @bot.command()
 async def clear(ctx):
@@ -130,10 +420,33 @@ async def clear(ctx):
 async def history(ctx, limit: int = 5):
     await get_conversation_history(ctx, limit)
 
-# TTS 언어 설정 명령어: TTS의 언어를 설정합니다.
+# TTS 언어 설정 명령어: TTS의 언어(와 엔진)를 설정합니다. 예) /lang ko, /lang ko espeak
 @bot.command(name='lang')
-async def set_language(ctx, lang_code: str):
-    await set_tts_language(ctx, lang_code)
+async def set_language(ctx, lang_code: str, backend: str = None):
+    await set_tts_language(ctx, lang_code, backend)
+
+# TTS 캐시 상태 명령어: TTS 캐시 적중률과 사용 중인 용량을 출력합니다.
+@bot.command()
+async def ttscache(ctx):
+    stats = tts_cache.stats()
+    await ctx.send(
+        f"**TTS 캐시**\n"
+        f"적중률 {stats['hit_rate']:.1%} (메모리 {stats['memory_hits']}회, 디스크 {stats['disk_hits']}회, "
+        f"미적중 {stats['misses']}회)\n"
+        f"메모리 {stats['memory_bytes'] / 1024:.0f}KB ({stats['memory_entries']}개), "
+        f"디스크 {stats['disk_bytes'] / 1024 / 1024:.1f}MB ({stats['disk_entries']}개)"
+        + format_ttfa(tts_latency.stats())
+    )
+
+def format_ttfa(stats):
+    lines = []
+    for key, label in (("all", "전체"), ("short", "짧은 메시지"), ("long", "긴 메시지")):
+        summary = stats[key]
+        if summary:
+            lines.append(f"{label}: p50 {summary['p50'] * 1000:.0f}ms, p95 {summary['p95'] * 1000:.0f}ms ({summary['count']}건)")
+    if not lines:
+        return ""
+    return "\n**첫 소리까지 걸린 시간 (TTFA)**\n" + "\n".join(lines)
 
 # 음성 채널 접속 명령어: 사용자가 있는 음성 채널로 봇이 접속합니다.
 @bot.command()
@@ -155,17 +468,17 @@ async def vc(ctx):
 @bot.command(name='vc_del')
 async def leave_voice_channel(ctx):
     if ctx.voice_client:
+        stop_music(ctx.guild)
         await ctx.voice_client.disconnect()
         voice_connected_guilds.discard(ctx.guild.id)
         await ctx.send("음성 채널에서 나왔습니다.")
     else:
         await ctx.send("봇이 현재 음성 채널에 연결되어 있지 않습니다.")
 
-# TTS 재생 중지 명령어: 현재 재생 중인 TTS를 중지합니다.
+# TTS 재생 중지 명령어: 현재 재생 중인 TTS와 대기 중인 TTS를 모두 중지합니다.
 @bot.command()
 async def stop(ctx):
-    if ctx.voice_client and ctx.voice_client.is_playing():
-        ctx.voice_client.stop()
+    if ctx.voice_client and stop_tts(ctx.guild):
         await ctx.send("TTS 재생을 중지했습니다.")
     else:
         await ctx.send("현재 재생 중인 TTS가 없습니다.")
@@ -182,8 +495,11 @@ async def on_voice_state_update(member, before, after):
         voice_channel = before.channel
         connected_bot = voice_channel.guild.voice_client
         if connected_bot and len(voice_channel.members) == 1:
+            stop_music(voice_channel.guild)
             await connected_bot.disconnect()
             voice_connected_guilds.discard(voice_channel.guild.id)
             print(f"Disconnected from {voice_channel.name} in {voice_channel.guild.name} due to being alone.")
 
-bot.run(DISCORD_TOKEN)
+# 벤치마크(benchmarks/bench_bot.py)에서 모듈로 불러올 때는 실행하지 않습니다.
+if __name__ == "__main__":
+    bot.run(DISCORD_TOKEN)
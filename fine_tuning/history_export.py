@@ -0,0 +1,163 @@
+"""
+여러 채널의 메시지 기록을 이어받기 가능하게 내보냅니다.
+
+- 채널마다 {출력 디렉터리}/{채널 ID}.jsonl 파일에 오래된 메시지부터 NDJSON으로 바로바로 씁니다.
+- 채널별로 마지막으로 받은 메시지 ID를 checkpoint.json에 기록해, 다시 실행하면 그 이후(after=) 메시지만 받습니다.
+- 여러 채널을 동시에 받되 동시에 받는 채널 수는 EXPORT_CONCURRENCY로 제한합니다. (요청 속도 제한은 discord.py가 기다려 줍니다)
+- 메시지 공급자(provider)를 바꿔 끼울 수 있어서 FakeHistoryProvider로 디스코드 없이 시험할 수 있습니다.
+
+출력 파일은 pipeline.py로 바로 병합/필터링할 수 있습니다.
+"""
+import os
+import json
+import asyncio
+
+EXPORT_DIR = 'json_data/history'
+EXPORT_CONCURRENCY = int(os.getenv("EXPORT_CONCURRENCY", "2"))
+# 이만큼 메시지를 받을 때마다 파일에 쓰고 체크포인트를 저장합니다.
+EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", "100"))
+
+
+def message_record(message):
+    return {
+        "message_id": message.id,
+        "channel_id": message.channel.id,
+        "author_id": message.author.id,
+        "author_name": str(message.author),
+        "content": message.content,
+        "created_at": message.created_at.isoformat()  # ISO 포맷으로 날짜 저장
+    }
+
+
+class DiscordHistoryProvider:
+    """디스코드 채널 기록을 오래된 메시지부터 돌려줍니다."""
+
+    def __init__(self, client):
+        self.client = client
+
+    async def history(self, channel_id, after=None):
+        import discord  # FakeHistoryProvider만 쓰는 경우 discord.py 없이도 이 모듈을 불러올 수 있게 여기서 불러옵니다.
+
+        channel = self.client.get_channel(channel_id) or await self.client.fetch_channel(channel_id)
+        after = discord.Object(id=after) if after else None
+        async for message in channel.history(limit=None, after=after, oldest_first=True):
+            yield message_record(message)
+
+
+class FakeHistoryProvider:
+    """시험용 공급자. {채널 ID: [메시지 레코드(오래된 순)]}에서 after 이후 메시지를 돌려줍니다."""
+
+    def __init__(self, channels, delay=0.0, fail_after=None):
+        self.channels = channels
+        self.delay = delay
+        self.fail_after = fail_after  # 이만큼 돌려준 뒤 예외를 던집니다. (중단 후 이어받기 시험용)
+        self.fetched = 0
+
+    async def history(self, channel_id, after=None):
+        if channel_id not in self.channels:
+            raise LookupError(f"채널을 찾을 수 없습니다: {channel_id}")
+        for record in self.channels[channel_id]:
+            if after is not None and record["message_id"] <= after:
+                continue
+            if self.fail_after is not None and self.fetched >= self.fail_after:
+                raise ConnectionError("연결이 끊어졌습니다.")
+            if self.delay:
+                await asyncio.sleep(self.delay)
+            self.fetched += 1
+            yield record
+
+
+class Checkpoint:
+    """채널별 마지막으로 받은 메시지 ID. 임시 파일에 쓴 뒤 교체하는 방식으로 저장합니다."""
+
+    def __init__(self, path):
+        self.path = path
+        self.last_ids = {}
+        if os.path.exists(path):
+            with open(path, 'r', encoding='utf-8') as f:
+                self.last_ids = {int(k): v for k, v in json.load(f).items()}
+
+    def get(self, channel_id):
+        return self.last_ids.get(channel_id)
+
+    def update(self, channel_id, message_id):
+        self.last_ids[channel_id] = message_id
+        with open(self.path + ".tmp", 'w', encoding='utf-8') as f:
+            json.dump({str(k): v for k, v in self.last_ids.items()}, f, indent=4)
+        os.replace(self.path + ".tmp", self.path)
+
+
+def _last_written_id(path):
+    """출력 파일 마지막 줄의 메시지 ID. (체크포인트 저장 직전에 멈춘 경우 중복을 막기 위해 씁니다)"""
+    if not os.path.exists(path):
+        return None
+    with open(path, 'rb') as f:
+        f.seek(0, os.SEEK_END)
+        position = f.tell()
+        tail = b""
+        while position > 0 and tail.count(b"\n") < 2:
+            step = min(4096, position)
+            position -= step
+            f.seek(position)
+            tail = f.read(step) + tail
+    for line in reversed(tail.splitlines()):
+        try:
+            return json.loads(line)["message_id"]
+        except (ValueError, KeyError):
+            continue  # 쓰다 만 줄
+    return None
+
+
+async def export_channel(provider, channel_id, checkpoint, output_dir=EXPORT_DIR,
+                         target_user_id=None, batch_size=EXPORT_BATCH_SIZE):
+    """
+    한 채널의 새 메시지를 받아 파일 끝에 덧붙이고, 이번에 쓴 메시지 수를 반환합니다.
+    target_user_id가 있으면 그 사용자의 메시지만 씁니다.
+    """
+    path = os.path.join(output_dir, f"{channel_id}.jsonl")
+    after = max(checkpoint.get(channel_id) or 0, _last_written_id(path) or 0) or None
+    written = 0
+    seen = 0
+    last_id = after
+    lines = []
+
+    with open(path, 'a', encoding='utf-8') as f:
+        def commit():
+            f.writelines(lines)
+            f.flush()
+            lines.clear()
+            if last_id is not None:
+                checkpoint.update(channel_id, last_id)
+
+        async for record in provider.history(channel_id, after):
+            last_id = record["message_id"]
+            seen += 1
+            if target_user_id is None or record["author_id"] == target_user_id:
+                lines.append(json.dumps(record, ensure_ascii=False) + "\n")
+                written += 1
+            if seen % batch_size == 0:
+                commit()
+        commit()
+    return written
+
+
+async def export_history(provider, channel_ids, output_dir=EXPORT_DIR, target_user_id=None,
+                         concurrency=EXPORT_CONCURRENCY, batch_size=EXPORT_BATCH_SIZE):
+    """
+    여러 채널을 동시에 내보내고 {채널 ID: 이번에 쓴 메시지 수}를 반환합니다.
+    실패한 채널은 메시지를 출력하고 None으로 표시합니다. (받은 만큼은 체크포인트에 남아 다음 실행 때 이어받습니다)
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    checkpoint = Checkpoint(os.path.join(output_dir, "checkpoint.json"))
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def run(channel_id):
+        async with semaphore:
+            try:
+                return await export_channel(provider, channel_id, checkpoint, output_dir, target_user_id, batch_size)
+            except Exception as e:
+                print(f"채널 {channel_id} 내보내기 실패: {e}")
+                return None
+
+    counts = await asyncio.gather(*(run(channel_id) for channel_id in channel_ids))
+    return dict(zip(channel_ids, counts))
@@ -0,0 +1,224 @@
+"""
+파인튜닝 데이터 파이프라인.
+
+각 단계는 레코드(dict)를 하나씩 주고받는 제너레이터라서 파일 전체를 메모리에 올리지 않습니다.
+수 GB짜리 메시지 내보내기 파일도 일정한 메모리로 처리할 수 있습니다.
+
+    읽기(JSON 배열 / NDJSON) -> 병합 -> 문장 필터(프로세스 풀) -> prompt/completion 짝짓기 -> JSONL 쓰기
+
+사용법 (저장소 루트에서):
+    # 메시지 내보내기 두 개를 합치고 필터링만 해서 저장
+    python -m fine_tuning.pipeline json_data/messages1.json json_data/messages2.json --filter -o merged.jsonl
+    # 필터링 후 대화 형식(messages) 학습 데이터로 변환
+    python -m fine_tuning.pipeline json_data/messages.json --filter --pair --assistant-id 1234 -o train.jsonl
+    # prompt/completion JSONL을 대화 형식으로 변환
+    python -m fine_tuning.pipeline fine_tuning_data.json --pair -o json_data/fine_tuning_data.jsonl
+"""
+import os
+import re
+import json
+import argparse
+import itertools
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+READ_CHUNK_SIZE = 1 << 16
+FILTER_BATCH_SIZE = 512
+
+_SENTENCE_SPLIT = re.compile(r'(?<=[.!?])\s+')
+_SEPARATORS = re.compile(r'[\s,]*')
+
+
+# ---- 읽기 ----
+
+def _iter_json_array(f, chunk_size=READ_CHUNK_SIZE):
+    """JSON 배열 파일을 조금씩 읽으면서 원소를 하나씩 돌려줍니다."""
+    decoder = json.JSONDecoder()
+    buffer = ""
+    while not buffer:
+        chunk = f.read(chunk_size)
+        if not chunk:
+            break
+        buffer = chunk.lstrip()
+    if not buffer.startswith("["):
+        raise ValueError("JSON 배열 형식이 아닙니다.")
+    pos = 1
+    eof = False
+    while True:
+        pos = _SEPARATORS.match(buffer, pos).end()
+        if pos < len(buffer) and buffer[pos] == "]":
+            return
+        try:
+            value, end = decoder.raw_decode(buffer, pos)
+        except json.JSONDecodeError:
+            end = None
+        # 버퍼 끝에서 끝난 값(숫자 등)은 뒤에 더 이어질 수 있으므로 더 읽은 뒤 다시 해석합니다.
+        if end is None or (end == len(buffer) and not eof):
+            if eof:
+                raise ValueError("JSON 배열이 완전하지 않습니다.")
+            chunk = f.read(chunk_size)
+            eof = not chunk
+            buffer = buffer[pos:] + chunk
+            pos = 0
+            continue
+        yield value
+        pos = end
+
+
+def read_records(path, chunk_size=READ_CHUNK_SIZE):
+    """JSON 배열 또는 NDJSON(한 줄에 JSON 하나) 파일의 레코드를 하나씩 돌려줍니다. 형식은 첫 글자로 판단합니다."""
+    with open(path, "r", encoding="utf-8") as f:
+        head = f.read(1)
+        while head and head.isspace():
+            head = f.read(1)
+        f.seek(0)
+        if head == "[":
+            yield from _iter_json_array(f, chunk_size)
+            return
+        for line in f:
+            line = line.strip()
+            if line:  # 빈 줄 무시
+                yield json.loads(line)
+
+
+def merge(*streams):
+    """여러 입력을 순서대로 이어 붙입니다."""
+    return itertools.chain.from_iterable(streams)
+
+
+# ---- 문장 필터 ----
+
+def filter_content(content):
+    # 정규표현식을 사용하여 문장 단위로 분리 (문장 구분자: . ! ?)
+    sentences = _SENTENCE_SPLIT.split(content)
+    filtered_sentences = []
+    for sentence in sentences:
+        stripped = sentence.strip()
+        # "@"가 포함된 문장, "/" 또는 "http"로 시작하는 문장은 건너뜁니다.
+        if "@" in stripped or stripped.startswith("/") or stripped.startswith("http"):
+            continue
+        filtered_sentences.append(sentence)
+    # 필터링된 문장들을 다시 하나의 문자열로 합칩니다.
+    return " ".join(filtered_sentences)
+
+
+def _filter_batch(batch):
+    for record in batch:
+        record["content"] = filter_content(record.get("content", ""))
+    return batch
+
+
+def filter_messages(records, workers=None, batch_size=FILTER_BATCH_SIZE):
+    """
+    각 레코드의 content에 filter_content를 적용합니다. 순서는 유지됩니다.
+    레코드를 batch_size개씩 묶어 프로세스 풀에서 처리하고, 메모리가 늘지 않도록
+    동시에 처리 중인 묶음은 워커 수의 두 배까지만 둡니다. workers가 1이면 현재 프로세스에서 처리합니다.
+    """
+    workers = workers or os.cpu_count() or 1
+    records = iter(records)
+    batches = iter(lambda: list(itertools.islice(records, batch_size)), [])
+    if workers == 1:
+        for batch in batches:
+            yield from _filter_batch(batch)
+        return
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = deque()
+        for batch in batches:
+            pending.append(pool.submit(_filter_batch, batch))
+            if len(pending) >= workers * 2:
+                yield from pending.popleft().result()
+        while pending:
+            yield from pending.popleft().result()
+
+
+# ---- 짝짓기 ----
+
+def pair_messages(records, assistant_id=None):
+    """
+    prompt/completion 쌍을 돌려줍니다.
+    - prompt/completion 필드가 있는 레코드는 그대로 한 쌍입니다.
+    - 메시지 내보내기 레코드(content)는 바로 앞 메시지를 prompt, 그 다음 메시지를 completion으로 묶습니다.
+      assistant_id가 있으면 그 사용자의 메시지만 completion이 됩니다. 내용이 빈 메시지는 건너뜁니다.
+      (메시지는 시간 순서로 들어온다고 가정합니다)
+    """
+    previous = None
+    for record in records:
+        if "prompt" in record or "completion" in record:
+            yield record.get("prompt", ""), record.get("completion", "")
+            continue
+        content = record.get("content", "").strip()
+        if not content:
+            continue
+        is_assistant = assistant_id is None or str(record.get("author_id")) == str(assistant_id)
+        if previous is not None and is_assistant and previous.get("author_id") != record.get("author_id"):
+            yield previous["content"].strip(), content
+            previous = None
+            continue
+        previous = record
+
+
+def to_chat(pairs):
+    """prompt/completion 쌍을 대화 형식(messages) 학습 레코드로 바꿉니다."""
+    for prompt, completion in pairs:
+        yield {
+            "messages": [
+                {"role": "user", "content": prompt},
+                {"role": "assistant", "content": completion}
+            ]
+        }
+
+
+# ---- 쓰기 ----
+
+def write_records(records, path):
+    """
+    레코드를 파일에 하나씩 씁니다. 확장자가 .json이면 JSON 배열로, 그 밖에는 JSONL로 씁니다.
+    다른 이름의 임시 파일에 다 쓴 뒤 교체하므로 중간에 멈춰도 기존 결과 파일이 깨지지 않습니다. 쓴 레코드 수를 반환합니다.
+    """
+    as_array = path.endswith(".json")
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    count = 0
+    with open(path + ".tmp", "w", encoding="utf-8") as f:
+        if as_array:
+            f.write("[")
+        for record in records:
+            line = json.dumps(record, ensure_ascii=False)
+            if as_array:
+                f.write(("," if count else "") + "\n    " + line)
+            else:
+                f.write(line + "\n")
+            count += 1
+        if as_array:
+            f.write("\n]\n")
+    os.replace(path + ".tmp", path)
+    return count
+
+
+def run(inputs, output, filter_=False, pair=False, assistant_id=None, workers=None):
+    """입력 파일들을 선택한 단계로 처리해 output에 쓰고, 쓴 레코드 수를 반환합니다."""
+    records = merge(*(read_records(path) for path in inputs))
+    if filter_:
+        records = filter_messages(records, workers)
+    if pair:
+        records = to_chat(pair_messages(records, assistant_id))
+    return write_records(records, output)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("inputs", nargs="+", help="입력 파일 (JSON 배열 또는 NDJSON). 여러 개면 순서대로 병합합니다.")
+    parser.add_argument("-o", "--output", required=True, help="출력 파일 (.json이면 JSON 배열, 그 밖에는 JSONL)")
+    parser.add_argument("--filter", action="store_true", help="content에서 멘션/명령어/링크 문장을 제거합니다.")
+    parser.add_argument("--pair", action="store_true", help="prompt/completion 쌍을 대화 형식 학습 데이터로 변환합니다.")
+    parser.add_argument("--assistant-id", help="--pair 시 이 사용자 ID의 메시지만 completion으로 사용합니다.")
+    parser.add_argument("--workers", type=int, default=None, help="필터 단계 프로세스 수 (기본: CPU 수)")
+    args = parser.parse_args()
+
+    count = run(args.inputs, args.output, args.filter, args.pair, args.assistant_id, args.workers)
+    print(f"{count}개의 레코드를 '{args.output}' 파일에 저장했습니다.")
+
+
+if __name__ == "__main__":
+    main()
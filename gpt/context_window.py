@@ -0,0 +1,122 @@
+import os
+import asyncio
+import weakref
+
+try:
+    import tiktoken
+except ImportError:  # tiktoken이 없으면 대략적인 추정치를 사용합니다.
+    tiktoken = None
+
+# 대화 기록을 GPT에 보낼 때 허용할 최대 토큰 수
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "3000"))
+# 압축하지 않고 항상 그대로 보낼 최근 대화 턴 수 (질문+응답 = 1턴)
+CONTEXT_KEEP_TURNS = int(os.getenv("CONTEXT_KEEP_TURNS", "4"))
+# 메시지 한 개마다 붙는 역할/구분자 토큰 (OpenAI chat 포맷 기준 근사치)
+MESSAGE_OVERHEAD_TOKENS = 4
+# 요약 메시지 앞에 붙는 머리말 (다음 압축 때 이전 요약도 함께 다시 요약됩니다)
+SUMMARY_PREFIX = "이전 대화 요약:\n"
+
+_encodings = {}
+
+
+def count_tokens(text, model="gpt-4o-mini"):
+    """텍스트의 토큰 수를 로컬 토크나이저로 셉니다."""
+    if tiktoken is None:
+        # 한글은 대략 글자당 1토큰, 영문은 4글자당 1토큰 정도로 추정합니다.
+        ascii_chars = sum(1 for ch in text if ord(ch) < 128)
+        return (len(text) - ascii_chars) + ascii_chars // 4 + 1
+    encoding = _encodings.get(model)
+    if encoding is None:
+        try:
+            encoding = tiktoken.encoding_for_model(model)
+        except KeyError:
+            encoding = tiktoken.get_encoding("o200k_base")
+        _encodings[model] = encoding
+    return len(encoding.encode(text))
+
+
+def count_message_tokens(message, model="gpt-4o-mini"):
+    return count_tokens(message["content"], model) + MESSAGE_OVERHEAD_TOKENS
+
+
+class ContextWindow:
+    """
+    사용자별 대화 기록을 토큰 예산 안으로 유지합니다.
+    - 메시지별 토큰 수는 한 번만 세고 저장소에 함께 저장합니다.
+    - 예산을 넘으면 시스템 프롬프트와 최근 keep_turns 턴을 제외한 오래된 메시지를
+      하나의 요약 메시지로 압축합니다. 이전 요약도 압축 대상에 포함되어 누적 요약이 됩니다.
+    """
+
+    def __init__(self, store, summarize, budget=CONTEXT_TOKEN_BUDGET, keep_turns=CONTEXT_KEEP_TURNS, model="gpt-4o-mini"):
+        """
+        - store: ConversationStore
+        - summarize: async (messages) -> str, 오래된 메시지를 요약하는 함수
+        """
+        self.store = store
+        self.summarize = summarize
+        self.budget = budget
+        self.keep_turns = keep_turns
+        self.model = model
+        # 같은 사용자에 대한 압축이 동시에 두 번 실행되지 않도록 합니다.
+        self._locks = weakref.WeakValueDictionary()
+
+    def _lock(self, user_id):
+        lock = self._locks.get(user_id)
+        if lock is None:
+            lock = asyncio.Lock()
+            self._locks[user_id] = lock
+        return lock
+
+    async def _records_with_tokens(self, user_id):
+        records = await asyncio.to_thread(self.store.get_records, user_id)
+        if records is None:
+            return None
+        missing = {}
+        for record in records:
+            if record["tokens"] is None:
+                record["tokens"] = count_message_tokens(record, self.model)
+                missing[record["id"]] = record["tokens"]
+        if missing:
+            await asyncio.to_thread(self.store.set_token_counts, user_id, missing)
+        return records
+
+    async def build(self, user_id, query_message):
+        """
+        query_message를 덧붙여 보낼 메시지 목록을 만듭니다. 필요하면 먼저 기록을 압축합니다.
+        기록이 없는 사용자라면 None을 반환합니다.
+        """
+        query_tokens = count_message_tokens(query_message, self.model)
+        async with self._lock(user_id):
+            records = await self._records_with_tokens(user_id)
+            if records is None:
+                return None
+            total = sum(r["tokens"] for r in records) + query_tokens
+            if total > self.budget:
+                records = await self._compact(user_id, records)
+
+        return [{"role": r["role"], "content": r["content"]} for r in records] + [query_message]
+
+    async def _compact(self, user_id, records):
+        # 첫 번째 시스템 프롬프트와 최근 keep_turns 턴은 항상 남깁니다.
+        head = 1 if records and records[0]["role"] == "system" else 0
+        keep = self.keep_turns * 2
+        old = records[head:len(records) - keep] if keep else records[head:]
+        # 이미 요약 한 개뿐이면 더 줄일 것이 없습니다.
+        if len(old) < 2:
+            return records
+
+        try:
+            summary = await self.summarize([{"role": r["role"], "content": r["content"]} for r in old])
+        except Exception as e:
+            print(f"대화 기록 요약 중 오류 발생: {e}")
+            return records
+
+        summary_message = {"role": "system", "content": SUMMARY_PREFIX + summary}
+        tokens = count_message_tokens(summary_message, self.model)
+        compacted = await asyncio.to_thread(
+            self.store.compact, user_id, old[0]["id"], old[-1]["id"], summary_message, tokens
+        )
+        if not compacted:
+            return records
+        print(f"대화 기록 압축: user={user_id}, {len(old)}개 메시지 -> 요약 1개")
+        return records[:head] + [dict(summary_message, id=old[-1]["id"], tokens=tokens)] + records[len(records) - keep:]
@@ -0,0 +1,287 @@
+import os
+import abc
+import json
+import sqlite3
+import threading
+from collections import OrderedDict
+
+# 대화 기록 저장소 기본 경로 (SQLite WAL 모드)
+CONVERSATIONS_DB = os.getenv("CONVERSATIONS_DB", "json_data/conversations.db")
+# 메모리에 올려둘 최근 사용자 수 (LRU)
+CONVERSATION_CACHE_SIZE = int(os.getenv("CONVERSATION_CACHE_SIZE", "256"))
+
+
+class ConversationStore(abc.ABC):
+    """
+    사용자별 대화 기록 저장소 인터페이스.
+    다른 저장 방식(세그먼트 로그 등)을 붙이려면 이 클래스를 상속해 구현합니다. (추상 메서드를 빠뜨리면 만들 때 TypeError)
+    """
+
+    @abc.abstractmethod
+    def get_messages(self, user_id):
+        """사용자의 대화 기록을 [{"role", "content"}, ...] 형태로 반환합니다. 없으면 None."""
+
+    def has_user(self, user_id):
+        return self.get_messages(user_id) is not None
+
+    @abc.abstractmethod
+    def append_messages(self, user_id, messages, initial=None):
+        """
+        사용자의 대화 기록 끝에 메시지를 추가합니다.
+        기록이 없는 사용자라면 initial 메시지들을 먼저 기록합니다.
+        """
+
+    @abc.abstractmethod
+    def reset(self, user_id, initial):
+        """사용자의 대화 기록을 지우고 initial 메시지들로 새로 시작합니다."""
+
+    @abc.abstractmethod
+    def get_records(self, user_id):
+        """
+        사용자의 대화 기록을 레코드({"id", "role", "content", "tokens"}) 목록으로 반환합니다. 없으면 None.
+        tokens는 아직 계산되지 않았으면 None입니다.
+        """
+
+    @abc.abstractmethod
+    def set_token_counts(self, user_id, counts):
+        """{레코드 id: 토큰 수}를 저장해 다음 요청부터 다시 세지 않도록 합니다."""
+
+    @abc.abstractmethod
+    def compact(self, user_id, first_id, last_id, summary_message, tokens=None):
+        """
+        first_id ~ last_id 범위의 레코드를 summary_message 한 개로 바꿉니다.
+        범위가 이미 바뀌었으면(다른 요청이 먼저 압축한 경우) False를 반환합니다.
+        """
+
+    def close(self):
+        pass
+
+
+class SQLiteConversationStore(ConversationStore):
+    """
+    SQLite(WAL) 기반 대화 기록 저장소.
+    - 메시지는 사용자별로 한 행씩 추가(append-only)만 하므로 전체 파일을 다시 쓰지 않습니다.
+    - 각 추가/초기화는 하나의 트랜잭션으로 원자적으로 기록됩니다.
+    - 최근 사용한 사용자의 기록은 메모리 LRU 캐시에 보관합니다.
+    """
+
+    def __init__(self, path=CONVERSATIONS_DB, cache_size=CONVERSATION_CACHE_SIZE):
+        self.path = path
+        self.cache_size = cache_size
+        self._cache = OrderedDict()
+        # asyncio.to_thread 등 여러 스레드에서 호출되므로 하나의 락으로 직렬화합니다.
+        self._lock = threading.RLock()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS messages ("
+            " id INTEGER PRIMARY KEY AUTOINCREMENT,"
+            " user_id TEXT NOT NULL,"
+            " role TEXT NOT NULL,"
+            " content TEXT NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_messages_user ON messages (user_id, id)")
+        # 메시지별 토큰 수 캐시 컬럼 (이전 버전 DB에는 없으므로 추가)
+        columns = [row[1] for row in self._conn.execute("PRAGMA table_info(messages)")]
+        if "tokens" not in columns:
+            self._conn.execute("ALTER TABLE messages ADD COLUMN tokens INTEGER")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+
+    # ---- 내부 헬퍼 ----
+
+    def _load_records(self, user_id):
+        """캐시 또는 DB에서 사용자의 레코드 목록을 가져옵니다. 없으면 None."""
+        records = self._cache.get(user_id)
+        if records is not None:
+            self._cache.move_to_end(user_id)
+            return records
+
+        rows = self._conn.execute(
+            "SELECT id, role, content, tokens FROM messages WHERE user_id = ? ORDER BY id",
+            (user_id,),
+        ).fetchall()
+        if not rows:
+            return None
+        records = [{"id": row[0], "role": row[1], "content": row[2], "tokens": row[3]} for row in rows]
+        self._remember(user_id, records)
+        return records
+
+    def _remember(self, user_id, records):
+        self._cache[user_id] = records
+        self._cache.move_to_end(user_id)
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+
+    def _insert(self, user_id, messages):
+        records = []
+        for message in messages:
+            tokens = message.get("tokens")
+            cursor = self._conn.execute(
+                "INSERT INTO messages (user_id, role, content, tokens) VALUES (?, ?, ?, ?)",
+                (user_id, message["role"], message["content"], tokens),
+            )
+            records.append(
+                {"id": cursor.lastrowid, "role": message["role"], "content": message["content"], "tokens": tokens}
+            )
+        return records
+
+    # ---- 공개 API ----
+
+    def get_messages(self, user_id):
+        with self._lock:
+            records = self._load_records(user_id)
+            if records is None:
+                return None
+            return [{"role": r["role"], "content": r["content"]} for r in records]
+
+    def get_records(self, user_id):
+        with self._lock:
+            records = self._load_records(user_id)
+            if records is None:
+                return None
+            return [dict(r) for r in records]
+
+    def set_token_counts(self, user_id, counts):
+        if not counts:
+            return
+        with self._lock:
+            self._conn.executemany(
+                "UPDATE messages SET tokens = ? WHERE id = ? AND user_id = ?",
+                [(tokens, record_id, user_id) for record_id, tokens in counts.items()],
+            )
+            for record in self._cache.get(user_id, []):
+                if record["id"] in counts:
+                    record["tokens"] = counts[record["id"]]
+
+    def compact(self, user_id, first_id, last_id, summary_message, tokens=None):
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                ids = [
+                    row[0]
+                    for row in self._conn.execute(
+                        "SELECT id FROM messages WHERE user_id = ? AND id IN (?, ?)",
+                        (user_id, first_id, last_id),
+                    )
+                ]
+                if len(set(ids)) != len({first_id, last_id}):
+                    self._conn.execute("ROLLBACK")
+                    return False
+                # 마지막 레코드 자리에 요약을 덮어써 대화 순서(id 순)를 그대로 유지합니다.
+                self._conn.execute(
+                    "UPDATE messages SET role = ?, content = ?, tokens = ? WHERE id = ?",
+                    (summary_message["role"], summary_message["content"], tokens, last_id),
+                )
+                self._conn.execute(
+                    "DELETE FROM messages WHERE user_id = ? AND id >= ? AND id < ?",
+                    (user_id, first_id, last_id),
+                )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._cache.pop(user_id, None)
+            return True
+
+    def append_messages(self, user_id, messages, initial=None):
+        with self._lock:
+            records = self._load_records(user_id)
+            to_insert = list(messages)
+            if records is None:
+                records = []
+                to_insert = list(initial or []) + to_insert
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                new_records = self._insert(user_id, to_insert)
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+            # 커밋이 끝난 뒤에만 캐시를 갱신해 DB와 어긋나지 않게 합니다.
+            self._remember(user_id, records + new_records)
+
+    def reset(self, user_id, initial):
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._conn.execute("DELETE FROM messages WHERE user_id = ?", (user_id,))
+                new_records = self._insert(user_id, initial)
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._remember(user_id, new_records)
+
+    def migrate_from_json(self, json_file):
+        """
+        기존 conversations.json({user_id: [messages]}) 파일을 저장소로 옮깁니다.
+        한 번 옮긴 파일은 meta 테이블에 기록되어 다시 옮기지 않으며,
+        원본 파일은 '.migrated' 확장자를 붙여 보관합니다.
+        반환값: 옮긴 사용자 수
+        """
+        if not os.path.exists(json_file):
+            return 0
+        key = f"migrated:{os.path.abspath(json_file)}"
+        with self._lock:
+            if self._conn.execute("SELECT 1 FROM meta WHERE key = ?", (key,)).fetchone():
+                return 0
+            with open(json_file, "r", encoding="utf-8") as f:
+                conversations = json.load(f)
+
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                for user_id, messages in conversations.items():
+                    # 이미 저장소에 기록이 있는 사용자는 새 기록을 우선합니다.
+                    exists = self._conn.execute(
+                        "SELECT 1 FROM messages WHERE user_id = ? LIMIT 1", (user_id,)
+                    ).fetchone()
+                    if not exists:
+                        # 예전 시스템 메시지는 content가 빈 배열로 저장되어 있어 문자열로 맞춥니다.
+                        messages = [
+                            {"role": m["role"], "content": m["content"] if isinstance(m["content"], str) else ""}
+                            for m in messages
+                        ]
+                        self._insert(str(user_id), messages)
+                self._conn.execute("INSERT INTO meta (key, value) VALUES (?, ?)", (key, "1"))
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._cache.clear()
+
+        os.replace(json_file, json_file + ".migrated")
+        print(f"대화 기록 마이그레이션 완료: {json_file} -> {self.path} ({len(conversations)}명)")
+        return len(conversations)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_conversation_store():
+    """프로세스 전체에서 공유하는 대화 기록 저장소를 반환합니다."""
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = SQLiteConversationStore()
+        return _store
+
+
+if __name__ == "__main__":
+    # 사용법: python -m gpt.conversation_store <conversations.json>
+    import sys
+
+    if len(sys.argv) != 2:
+        print("사용법: python -m gpt.conversation_store <conversations.json>")
+        sys.exit(1)
+    count = get_conversation_store().migrate_from_json(sys.argv[1])
+    print(f"{count}명의 대화 기록을 옮겼습니다.")
@@ -1,31 +1,20 @@
 import os
-import json
-from dotenv import load_dotenv
-from openai import OpenAI, OpenAIError
+import asyncio
+from openai import OpenAIError
 
-# 환경 변수 로드
-load_dotenv()
+from .conversation_store import get_conversation_store
+from .gpt_client import get_gpt_service
+from .context_window import ContextWindow
+from .response_cache import ResponseCache, make_cache_key
+from .query_index import QueryIndex
+from .meeting_summary import summarize_meeting_file, summarize_meeting_range
 
-# OpenAI API 키 가져오기
-openai_api_key = os.getenv("OPENAI_API_KEY")
-
-# OpenAI 클라이언트 초기화
-client = OpenAI(api_key=openai_api_key)
-
-# 대화 기록을 저장할 파일 경로
+# 이전 버전에서 대화 기록을 저장하던 파일 경로 (저장소로 한 번만 옮겨집니다)
 CONVERSATIONS_FILE = "../Json_data/conversations.json"
 
-def load_conversations():
-    """대화 기록을 파일에서 불러옵니다."""
-    if os.path.exists(CONVERSATIONS_FILE):
-        with open(CONVERSATIONS_FILE, "r", encoding="utf-8") as f:
-            return json.load(f)
-    return {}
-
-def save_conversations(conversations):
-    """대화 기록을 파일에 저장합니다."""
-    with open(CONVERSATIONS_FILE, "w", encoding="utf-8") as f:
-        json.dump(conversations, f, ensure_ascii=False, indent=4)
+# 사용자별 대화 기록 저장소
+conversation_store = get_conversation_store()
+conversation_store.migrate_from_json(CONVERSATIONS_FILE)
 
 def initialize_conversation():
     """
@@ -34,11 +23,49 @@ def initialize_conversation():
     """
     system_message = {
         "role": "system",
-        "content": ()
+        "content": ""
     }
     return [system_message]
+
+
+async def summarize_history(messages):
+    """토큰 예산을 넘은 오래된 대화를 하나의 요약문으로 압축합니다."""
+    transcript = "\n".join(f"{m['role']}: {m['content']}" for m in messages)
+    return await get_gpt_service().chat(
+        [
+            {
+                "role": "system",
+                "content": "다음 대화에서 이후 대화에 필요한 사실, 사용자의 요청과 선호, 결론만 간결하게 요약해 주세요.",
+            },
+            {"role": "user", "content": transcript},
+        ],
+        model="gpt-4o-mini",
+        max_tokens=500,
+        temperature=0.2,
+    )
+
+
+# 대화 기록을 토큰 예산 안으로 유지하는 컨텍스트 관리자
+context_window = ContextWindow(conversation_store, summarize_history)
+
+# /gptcl 설정 (대화 기록 없이 항상 같은 시스템 프롬프트/모델/파라미터를 사용)
+INDEPENDENT_QUERY_MODEL = "ft:gpt-4o-mini-2024-07-18:personal::BJbo7ZWN"  # 실제 사용 모델명으로 조정
+INDEPENDENT_QUERY_SYSTEM_PROMPT = "너의 이름은 도형이야"
+# INDEPENDENT_QUERY_SYSTEM_PROMPT = "정확한 정보를 나에게줘 틀린정보를 주면안되 모르면 모른다고해"
+INDEPENDENT_QUERY_PARAMS = {"max_tokens": 1000, "temperature": 0.5}
+
+# /gptcl 응답 캐시 (GPTCL_CACHE_DB를 빈 값으로 두면 디스크 계층을 사용하지 않습니다)
+independent_query_cache = ResponseCache(
+    max_entries=int(os.getenv("GPTCL_CACHE_SIZE", "1024")),
+    ttl=float(os.getenv("GPTCL_CACHE_TTL", str(24 * 3600))),
+    disk_path=os.getenv("GPTCL_CACHE_DB", "json_data/gptcl_cache.db") or None,
+)
+
+# /gptcl 유사 질문 인덱스 (띄어쓰기/조사/문장부호만 다른 질문은 저장된 답을 재사용)
+independent_query_index = QueryIndex(path=os.getenv("GPTCL_INDEX_PATH", "json_data/gptcl_index") or None)
+
 # 요약을 위한 gpt
-def send_to_chatGpt(user_id, query):
+async def send_to_chatGpt(user_id, query, guild_id=None):
     """
     GPT에게 메시지를 전송하고 응답을 반환합니다.
     사용자별로 대화 기록을 관리합니다.
@@ -46,107 +73,167 @@ def send_to_chatGpt(user_id, query):
     Parameters:
     - user_id (str): Discord 사용자 ID
     - query (str): 사용자의 질문
+    - guild_id (int | None): 길드별 동시 요청 제한에 사용할 길드 ID
 
     Returns:
     - str: GPT의 응답 내용
     """
-    # 대화 기록 불러오기
-    conversations = load_conversations()
-
-    # 사용자별 대화 기록 초기화
-    if user_id not in conversations:
-        conversations[user_id] = initialize_conversation()
-
-    messages = conversations[user_id]
-
-    # 사용자 메시지 추가
+    # 사용자 메시지 추가 (대화 기록이 예산을 넘으면 오래된 턴을 요약으로 압축)
     user_message = {"role": "user", "content": query}
-    messages.append(user_message)
+    messages = await context_window.build(user_id, user_message)
+
+    # 대화 기록이 없으면 시스템 메시지로 시작
+    initial = None
+    if messages is None:
+        initial = initialize_conversation()
+        messages = initial + [user_message]
 
     try:
-        response = client.chat.completions.create(
+        message_content = await get_gpt_service().chat(
+            messages,
             model="gpt-4o-mini",
-            messages=messages,
+            guild_id=guild_id,
+            owner=(guild_id, user_id),
             max_tokens=1000,
             temperature=0.5,
         )
-        message_content = response.choices[0].message.content.strip()
 
-        # GPT의 응답을 메시지 목록에 추가
+        # 질문과 GPT의 응답을 한 번에 대화 기록 끝에 추가
         gpt_message = {"role": "assistant", "content": message_content}
-        messages.append(gpt_message)
-
-        # 대화 기록 저장
-        conversations[user_id] = messages
-        save_conversations(conversations)
+        await asyncio.to_thread(
+            conversation_store.append_messages, user_id, [user_message, gpt_message], initial
+        )
 
         return message_content
+    except asyncio.TimeoutError:
+        print("OpenAI API 응답 시간 초과")
+        return "죄송합니다. 응답 시간이 초과되었습니다."
     except OpenAIError as e:
         print(f"OpenAI API 호출 중 오류 발생: {e}")
         return "죄송합니다. 현재 서버에 문제가 발생했습니다."
 
 
-def send_independent_query(query, ctx=None):
+async def send_independent_query(query, ctx=None):
     """
     대화 기록 없이 독립적으로 GPT 응답을 받아옵니다.
-    (ctx는 호출 환경 정보를 위해 optional로 받지만 사용되지는 않습니다.)
+    (ctx가 주어지면 길드별 동시 요청 제한과 요청 취소에 사용합니다.)
     """
+    guild_id = ctx.guild.id if ctx is not None and ctx.guild is not None else None
+    owner = (guild_id, str(ctx.author.id)) if ctx is not None else None
     system_message = {
         "role": "system",
-        "content": "너의 이름은 도형이야"
-        # "content": "정확한 정보를 나에게줘 틀린정보를 주면안되 모르면 모른다고해"
+        "content": INDEPENDENT_QUERY_SYSTEM_PROMPT
     }
     messages = [
         system_message,
         {"role": "user", "content": query}
     ]
-    try:
-        response = client.chat.completions.create(
-            model="ft:gpt-4o-mini-2024-07-18:personal::BJbo7ZWN",  # 실제 사용 모델명으로 조정
-            messages=messages,
-            max_tokens=1000,
-            temperature=0.5,
+
+    async def ask():
+        # 정확히 같은 질문이 없으면 비슷한 과거 질문의 답을 먼저 찾습니다.
+        similar = await asyncio.to_thread(independent_query_index.lookup, query)
+        if similar is not None:
+            return similar
+        answer = await get_gpt_service().chat(
+            messages,
+            model=INDEPENDENT_QUERY_MODEL,
+            guild_id=guild_id,
+            owner=owner,
+            **INDEPENDENT_QUERY_PARAMS,
         )
-        answer = response.choices[0].message.content.strip()
+        await asyncio.to_thread(independent_query_index.add, query, answer)
+        return answer
+
+    # 같은(정규화된) 질문은 캐시에서 답하고, 동시에 들어온 같은 질문은 한 번만 호출합니다.
+    key = make_cache_key(
+        query, INDEPENDENT_QUERY_MODEL, system=INDEPENDENT_QUERY_SYSTEM_PROMPT, **INDEPENDENT_QUERY_PARAMS
+    )
+    try:
+        answer = await independent_query_cache.get_or_compute(key, ask)
         return answer
+    except asyncio.TimeoutError:
+        print("OpenAI API 응답 시간 초과")
+        return "죄송합니다. 응답 시간이 초과되었습니다."
     except OpenAIError as e:
         print(f"OpenAI API 호출 중 오류 발생: {e}")
         return "죄송합니다. 현재 서버에 문제가 발생했습니다."
 
 
-def summarize_meeting_content(user_id, meeting_file="json_data/meeting_data.json"):
+async def stream_to_chatGpt(user_id, query, guild_id=None):
     """
-    NDJSON 형식으로 저장된 회의 대화 내용을 읽어 하나의 텍스트로 결합하고,
-    ChatGPT에게 요약 요청을 보낸 후 요약 결과를 반환합니다.
+    send_to_chatGpt의 스트리밍 버전입니다.
+    응답 조각을 받는 대로 yield하고, 스트림이 끝나면 질문과 전체 응답을 대화 기록에 추가합니다.
+    """
+    user_message = {"role": "user", "content": query}
+    messages = await context_window.build(user_id, user_message)
+
+    initial = None
+    if messages is None:
+        initial = initialize_conversation()
+        messages = initial + [user_message]
+
+    parts = []
+    try:
+        async for delta in get_gpt_service().stream_chat(
+            messages,
+            model="gpt-4o-mini",
+            guild_id=guild_id,
+            owner=(guild_id, user_id),
+            max_tokens=1000,
+            temperature=0.5,
+        ):
+            parts.append(delta)
+            yield delta
+    except asyncio.TimeoutError:
+        print("OpenAI API 응답 시간 초과")
+        yield "\n\n(응답 시간이 초과되어 답변이 중단되었습니다.)"
+        return
+    except OpenAIError as e:
+        print(f"OpenAI API 호출 중 오류 발생: {e}")
+        yield "죄송합니다. 현재 서버에 문제가 발생했습니다."
+        return
+
+    # 끝까지 받은 응답만 대화 기록에 추가
+    gpt_message = {"role": "assistant", "content": "".join(parts).strip()}
+    await asyncio.to_thread(
+        conversation_store.append_messages, user_id, [user_message, gpt_message], initial
+    )
+
+
+async def summarize_meeting_content(user_id, meeting_file="json_data/meeting_data.json", guild_id=None, since=None, last_n=None):
+    """
+    NDJSON 형식으로 저장된 회의 대화 내용을 구간별로 나눠 동시에 요약한 뒤 하나로 합쳐 반환합니다.
+    이전 /mtcl 이후에 추가된 대화만 새로 요약하며, 요약 요청은 사용자 대화 기록에 남기지 않습니다.
+    since(epoch 초) 또는 last_n(메시지 수)을 주면 그 범위만 요약합니다.
     """
     if not os.path.exists(meeting_file):
         return "회의 내용 파일이 존재하지 않습니다."
 
-    meeting_logs = []
+    async def summarize(prompt):
+        return await get_gpt_service().chat(
+            [{"role": "user", "content": prompt}],
+            model="gpt-4o-mini",
+            guild_id=guild_id,
+            owner=(guild_id, user_id),
+            max_tokens=1000,
+            temperature=0.5,
+        )
+
     try:
-        with open(meeting_file, "r", encoding="utf-8") as f:
-            for line in f:
-                if line.strip():
-                    meeting_logs.append(json.loads(line))
+        if since is None and last_n is None:
+            summary = await summarize_meeting_file(meeting_file, summarize)
+        else:
+            summary = await summarize_meeting_range(meeting_file, summarize, since, last_n)
+    except asyncio.TimeoutError:
+        print("OpenAI API 응답 시간 초과")
+        return "죄송합니다. 응답 시간이 초과되었습니다."
+    except OpenAIError as e:
+        print(f"OpenAI API 호출 중 오류 발생: {e}")
+        return "죄송합니다. 현재 서버에 문제가 발생했습니다."
     except Exception as e:
         print(f"파일 로드 에러: {e}")
         return "회의 내용을 불러오는 데 실패했습니다."
 
-    # 각 메시지를 "타임스탬프 - 작성자: 내용" 형태로 결합
-    conversation_text = "\n".join(
-        [f"{msg['timestamp']} - {msg['author']}: {msg['content']}" for msg in meeting_logs]
-    )
-
-    # 요약 요청 프롬프트 구성
-    # summarization_prompt = f"당신은 회의 내용을 요약하는 전문가야 다음 회의 내용을 요약해줘:\n\n{conversation_text}"
-    # 보다 구체적인 프롬프트 구성
-    summarization_prompt = (
-        "당신은 회의 내용을 요약하는 전문가입니다.\n"
-        "다음 회의 대화 내용을 분석하여, 주요 논의 사항, 결정된 사항, 그리고 추후 진행해야 할 작업이나 질문을 "
-        "불릿 포인트 형식으로 명확하게 정리해 주세요.\n"
-        "가능하면 각 항목에 대해 간단한 설명도 덧붙여 주세요.\n\n"
-        f"{conversation_text}"
-    )
-    # 요약 요청
-    summary = send_to_chatGpt(user_id, summarization_prompt)
+    if summary is None:
+        return "요약할 회의 내용이 없습니다."
     return summary
@@ -1,35 +1,54 @@
 import os
 import json
+import time
+import asyncio
+import argparse
 from dotenv import load_dotenv
 from openai import OpenAI, OpenAIError
 from celery import Celery
 
+from .conversation_store import get_conversation_store
+from .meeting_summary import (
+    summarize_meeting_file, summarize_meeting_range, load_checkpoint, save_checkpoint, checkpoint_lock,
+    read_new_lines, chunk_lines, reduce_summaries, MAP_PROMPT, SINGLE_PROMPT,
+)
+from save import MEETING_LOG_DIR
+
 # 환경 변수 로드
 load_dotenv()
 
 # OpenAI API 키 가져오기
 openai_api_key = os.getenv("OPENAI_API_KEY")
 
-# OpenAI 클라이언트 초기화
-client = OpenAI(api_key=openai_api_key)
+# OpenAI 클라이언트 (워커에서 처음 사용할 때 생성합니다)
+_client = None
 
-# Celery 앱 설정 (예: Redis 브로커 사용)
-celery_app = Celery('gpt_batch', broker='redis://localhost:6379/0')
+def get_client():
+    """Celery 워커용 동기 OpenAI 클라이언트를 반환합니다."""
+    global _client
+    if _client is None:
+        _client = OpenAI(api_key=openai_api_key, base_url=os.getenv("OPENAI_BASE_URL"))
+    return _client
 
-# 대화 기록을 저장할 파일 경로
-CONVERSATIONS_FILE = "json_data/conversations.json"
+# Celery 앱 설정 (예: Redis 브로커 사용). 워커는 봇과 따로 띄웁니다:
+#   celery -A gpt.gpt_batch worker --concurrency 4
+# CELERY_EAGER=1이면 Redis 없이 호출한 프로세스에서 바로 실행합니다. (테스트, 로컬 실행용)
+CELERY_EAGER = os.getenv("CELERY_EAGER", "0") == "1"
+CELERY_BROKER_URL = os.getenv("CELERY_BROKER_URL", "memory://" if CELERY_EAGER else "redis://localhost:6379/0")
+CELERY_RESULT_BACKEND = os.getenv("CELERY_RESULT_BACKEND", "cache+memory://" if CELERY_EAGER else CELERY_BROKER_URL)
+celery_app = Celery('gpt_batch', broker=CELERY_BROKER_URL, backend=CELERY_RESULT_BACKEND)
+celery_app.conf.update(
+    task_always_eager=CELERY_EAGER,
+    task_track_started=True,  # /jobs에서 대기 중과 실행 중을 구분합니다.
+    result_expires=3600,
+)
 
-def load_conversations():
-    """대화 기록을 파일에서 불러옵니다."""
-    if os.path.exists(CONVERSATIONS_FILE):
-        with open(CONVERSATIONS_FILE, "r", encoding="utf-8") as f:
-            return json.load(f)
-    return {}
+# 이전 버전에서 대화 기록을 저장하던 파일 경로 (저장소로 한 번만 옮겨집니다)
+CONVERSATIONS_FILE = "json_data/conversations.json"
 
-def save_conversations(conversations):
-    """대화 기록을 파일에 저장합니다."""
-    with open(CONVERSATIONS_FILE, "w", encoding="utf-8") as f:
-        json.dump(conversations, f, ensure_ascii=False, indent=4)
+# 사용자별 대화 기록 저장소 (봇과 같은 SQLite 파일을 WAL 모드로 공유합니다)
+conversation_store = get_conversation_store()
+conversation_store.migrate_from_json(CONVERSATIONS_FILE)
 
 def initialize_conversation():
     """
@@ -47,17 +66,17 @@ def send_to_chatGpt(user_id, query):
     GPT에게 메시지를 전송하고 응답을 반환합니다.
     사용자별로 대화 기록을 관리합니다.
     """
-    conversations = load_conversations()
-
-    if user_id not in conversations:
-        conversations[user_id] = initialize_conversation()
+    history = conversation_store.get_messages(user_id)
+    initial = None
+    if history is None:
+        initial = initialize_conversation()
+        history = initial
 
-    messages = conversations[user_id]
     user_message = {"role": "user", "content": query}
-    messages.append(user_message)
+    messages = history + [user_message]
 
     try:
-        response = client.chat.completions.create(
+        response = get_client().chat.completions.create(
             model="gpt-4o-mini",  # 실제 사용 모델에 맞게 조정
             messages=messages,
             max_tokens=1000,
@@ -65,44 +84,310 @@ def send_to_chatGpt(user_id, query):
         )
         message_content = response.choices[0].message.content.strip()
         gpt_message = {"role": "assistant", "content": message_content}
-        messages.append(gpt_message)
-        conversations[user_id] = messages
-        save_conversations(conversations)
+        conversation_store.append_messages(user_id, [user_message, gpt_message], initial=initial)
         return message_content
     except OpenAIError as e:
         print(f"OpenAI API 호출 중 오류 발생: {e}")
         return "죄송합니다. 현재 서버에 문제가 발생했습니다."
 
+def complete_prompt(prompt):
+    """대화 기록 없이 프롬프트 하나를 보내고 응답 텍스트를 반환합니다. (워커 스레드에서 실행)"""
+    response = get_client().chat.completions.create(
+        model="gpt-4o-mini",  # 실제 사용 모델에 맞게 조정
+        messages=[{"role": "user", "content": prompt}],
+        max_tokens=1000,
+        temperature=0.5,
+    )
+    return response.choices[0].message.content.strip()
+
 @celery_app.task
-def batch_summarize_meeting(user_id, meeting_file="json_data/meeting_data.json"):
+def batch_summarize_meeting(user_id, meeting_file="json_data/meeting_data.json", since=None, last_n=None):
     """
-    NDJSON 형식의 회의 대화 내용을 읽어 하나의 텍스트로 결합한 후,
-    ChatGPT에게 요약 요청을 보내고 그 결과를 반환하는 배치 작업입니다.
+    NDJSON 형식의 회의 대화 내용을 구간별로 나눠 동시에 요약한 뒤 하나로 합치는 배치 작업입니다.
+    봇의 /mtcl과 같은 체크포인트를 사용하므로 지난 요약 이후에 추가된 대화만 새로 요약합니다.
+    since(epoch 초) 또는 last_n(메시지 수)을 주면 그 범위만 요약합니다.
+    (워커는 봇과 같은 json_data 디렉터리를 볼 수 있어야 합니다)
     """
     if not os.path.exists(meeting_file):
         return "회의 내용 파일이 존재하지 않습니다."
 
-    meeting_logs = []
+    async def summarize(prompt):
+        return await asyncio.to_thread(complete_prompt, prompt)
+
     try:
-        with open(meeting_file, "r", encoding="utf-8") as f:
-            for line in f:
-                if line.strip():
-                    meeting_logs.append(json.loads(line))
+        if since is None and last_n is None:
+            summary = asyncio.run(summarize_meeting_file(meeting_file, summarize))
+        else:
+            summary = asyncio.run(summarize_meeting_range(meeting_file, summarize, since, last_n))
+    except OpenAIError as e:
+        print(f"OpenAI API 호출 중 오류 발생: {e}")
+        return "죄송합니다. 현재 서버에 문제가 발생했습니다."
     except Exception as e:
         print(f"파일 로드 에러: {e}")
         return "회의 내용을 불러오는 데 실패했습니다."
 
-    conversation_text = "\n".join(
-        [f"{msg['timestamp']} - {msg['author']}: {msg['content']}" for msg in meeting_logs]
-    )
+    if summary is None:
+        return "요약할 회의 내용이 없습니다."
+    return summary
 
-    summarization_prompt = (
-        "당신은 회의 내용을 요약하는 전문가입니다.\n"
-        "다음 회의 대화 내용을 분석하여, 주요 논의 사항, 결정된 사항, 그리고 추후 진행해야 할 작업이나 질문을 "
-        "불릿 포인트 형식으로 명확하게 정리해 주세요.\n"
-        "각 항목에 대해 간단한 설명도 덧붙여 주세요.\n\n"
-        f"{conversation_text}"
-    )
 
-    summary = send_to_chatGpt(user_id, summarization_prompt)
-    return summary
+# ---- 대량 요약 (Batch API) ----
+# 모든 회의 채널의 새 대화를 구간별 요청으로 묶어 Batch API로 한 번에 보냅니다. (야간 요약용, 일반 호출보다 저렴)
+#   python -m gpt.gpt_batch            # Batch API로 보내고 끝날 때까지 기다립니다.
+#   python -m gpt.gpt_batch --local    # Batch API 대신 요청을 하나씩 바로 처리합니다. (시험용)
+# 진행 상태를 json_data/batch/state.json에 남기므로 도중에 멈춰도 다시 실행하면 같은 배치를 이어서 기다립니다.
+
+BATCH_DIR = "json_data/batch"
+BATCH_STATE_FILE = os.path.join(BATCH_DIR, "state.json")
+BATCH_POLL_INTERVAL = float(os.getenv("BATCH_POLL_INTERVAL", "60"))
+BATCH_MODEL = "gpt-4o-mini"  # 실제 사용 모델에 맞게 조정
+BATCH_TERMINAL_STATUSES = {"completed", "failed", "expired", "cancelled"}
+
+
+def scan_meeting_logs(root=MEETING_LOG_DIR):
+    """회의 로그 파일 목록 [(길드 ID, 채널 ID, 파일 경로)]을 반환합니다."""
+    logs = []
+    if not os.path.isdir(root):
+        return logs
+    for guild_id in sorted(os.listdir(root)):
+        guild_dir = os.path.join(root, guild_id)
+        if not os.path.isdir(guild_dir):
+            continue
+        for name in sorted(os.listdir(guild_dir)):
+            if name.endswith(".ndjson"):
+                logs.append((guild_id, name[:-len(".ndjson")], os.path.join(guild_dir, name)))
+    return logs
+
+
+def build_batch_requests(path, logs, model=BATCH_MODEL):
+    """
+    각 회의 로그의 체크포인트 이후 대화를 구간별 요청으로 나눠 Batch API 입력 JSONL을 씁니다.
+    custom_id는 "길드:채널:시작-끝:구간 번호"라서 같은 로그 범위는 항상 같은 ID가 됩니다.
+    {"길드:채널:시작-끝": 로그 정보}를 반환합니다.
+    """
+    requests = {}
+    with open(path + ".tmp", "w", encoding="utf-8") as f:
+        for guild_id, channel_id, meeting_file in logs:
+            checkpoint = load_checkpoint(meeting_file)
+            lines, end = read_new_lines(meeting_file, checkpoint["offset"])
+            chunks = chunk_lines(lines)
+            if not chunks:
+                continue
+            key = f"{guild_id}:{channel_id}:{checkpoint['offset']}-{end}"
+            # 구간이 하나뿐이고 이전 요약도 없으면 합치는 단계 없이 바로 최종 요약을 받습니다.
+            single = len(chunks) == 1 and checkpoint["summary"] is None
+            for index, chunk in enumerate(chunks):
+                prompt = (SINGLE_PROMPT if single else MAP_PROMPT) + chunk
+                f.write(json.dumps({
+                    "custom_id": f"{key}:{index}",
+                    "method": "POST",
+                    "url": "/v1/chat/completions",
+                    "body": {
+                        "model": model,
+                        "messages": [{"role": "user", "content": prompt}],
+                        "max_tokens": 1000,
+                        "temperature": 0.5,
+                    },
+                }, ensure_ascii=False) + "\n")
+            requests[key] = {
+                "guild_id": guild_id,
+                "channel_id": channel_id,
+                "meeting_file": meeting_file,
+                "start": checkpoint["offset"],
+                "end": end,
+                "chunks": len(chunks),
+                "single": single,
+            }
+    os.replace(path + ".tmp", path)
+    return requests
+
+
+class OpenAIBatchClient:
+    """OpenAI Batch API. (OPENAI_BASE_URL을 지정하면 로컬 가짜 서버로도 보낼 수 있습니다)"""
+
+    def __init__(self, client=None):
+        self.client = client or get_client()
+
+    def submit(self, input_path, run_id):
+        # 배치를 만든 뒤 상태를 저장하기 전에 멈췄다면 그 배치를 그대로 씁니다.
+        for batch in self.client.batches.list(limit=100).data:
+            if (batch.metadata or {}).get("run_id") == run_id:
+                return batch.id
+        with open(input_path, "rb") as f:
+            input_file = self.client.files.create(file=f, purpose="batch")
+        batch = self.client.batches.create(
+            input_file_id=input_file.id,
+            endpoint="/v1/chat/completions",
+            completion_window="24h",
+            metadata={"run_id": run_id},
+        )
+        return batch.id
+
+    def status(self, batch_id):
+        """(상태, 결과 파일 ID)"""
+        batch = self.client.batches.retrieve(batch_id)
+        return batch.status, batch.output_file_id
+
+    def iter_results(self, file_id):
+        """결과 파일을 내려받으면서 한 줄씩 돌려줍니다."""
+        with self.client.files.with_streaming_response.content(file_id) as response:
+            for line in response.iter_lines():
+                if line.strip():
+                    yield json.loads(line)
+
+
+class LocalBatchClient:
+    """
+    시험용 가짜 Batch 엔드포인트. 입력 JSONL의 요청을 complete(prompt)로 하나씩 처리해
+    Batch API와 같은 형식의 결과 파일을 만듭니다. 결과 파일이 이미 있으면 다시 처리하지 않습니다.
+    """
+
+    def __init__(self, complete, directory=BATCH_DIR):
+        self.complete = complete
+        self.directory = directory
+
+    def _output_path(self, batch_id):
+        return os.path.join(self.directory, f"{batch_id}.output.jsonl")
+
+    def submit(self, input_path, run_id):
+        output_path = self._output_path(run_id)
+        if os.path.exists(output_path):
+            return run_id
+        with open(input_path, "r", encoding="utf-8") as infile, \
+                open(output_path + ".tmp", "w", encoding="utf-8") as outfile:
+            for line in infile:
+                request = json.loads(line)
+                result = {"custom_id": request["custom_id"], "response": None, "error": None}
+                try:
+                    content = self.complete(request["body"]["messages"][-1]["content"])
+                    result["response"] = {
+                        "status_code": 200,
+                        "body": {"choices": [{"message": {"role": "assistant", "content": content}}]},
+                    }
+                except Exception as e:
+                    result["error"] = {"message": str(e)}
+                outfile.write(json.dumps(result, ensure_ascii=False) + "\n")
+        os.replace(output_path + ".tmp", output_path)
+        return run_id
+
+    def status(self, batch_id):
+        output_path = self._output_path(batch_id)
+        if os.path.exists(output_path):
+            return "completed", output_path
+        return "failed", None
+
+    def iter_results(self, file_id):
+        with open(file_id, "r", encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+
+
+def apply_batch_results(results, logs, complete=None):
+    """
+    결과를 로그별로 모아 요약을 완성하고 /mtcl과 같은 체크포인트에 저장합니다.
+    구간이 여러 개면 이전 요약과 함께 합치는 단계(reduce)만 일반 호출로 실행합니다.
+    일부 구간이 실패한 로그와, 그 사이 체크포인트가 이미 움직인 로그(이미 반영했거나 /mtcl이 요약함)는 건너뜁니다.
+    {(길드 ID, 채널 ID): 요약}을 반환합니다.
+    """
+    complete = complete or complete_prompt
+    partials = {key: {} for key in logs}
+    for result in results:
+        key, index = result["custom_id"].rsplit(":", 1)
+        response = result.get("response")
+        if result.get("error") or not response or response.get("status_code") != 200:
+            print(f"배치 요청 {result['custom_id']} 실패: {result.get('error') or response}")
+            continue
+        if key in partials:
+            partials[key][int(index)] = response["body"]["choices"][0]["message"]["content"].strip()
+
+    async def summarize(prompt):
+        return await asyncio.to_thread(complete, prompt)
+
+    summaries = {}
+    for key, log in logs.items():
+        parts = partials[key]
+        if len(parts) != log["chunks"]:
+            print(f"{key}: {log['chunks']}개 구간 중 {len(parts)}개만 성공해 다음 실행 때 다시 요약합니다.")
+            continue
+        with checkpoint_lock(log["meeting_file"]):
+            checkpoint = load_checkpoint(log["meeting_file"])
+            if checkpoint["offset"] != log["start"]:
+                continue
+            ordered = [parts[i] for i in range(log["chunks"])]
+            if log["single"]:
+                summary = ordered[0]
+            else:
+                if checkpoint["summary"] is not None:
+                    ordered = [checkpoint["summary"]] + ordered
+                summary = asyncio.run(reduce_summaries(ordered, summarize))
+            save_checkpoint(log["meeting_file"], log["end"], summary)
+        summaries[(log["guild_id"], log["channel_id"])] = summary
+    return summaries
+
+
+def _save_state(state, path):
+    with open(path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(state, f, ensure_ascii=False, indent=4)
+    os.replace(path + ".tmp", path)
+
+
+def run_bulk_summaries(batch_client, complete=None, state_file=BATCH_STATE_FILE,
+                       poll_interval=BATCH_POLL_INTERVAL, log_root=MEETING_LOG_DIR):
+    """
+    모든 회의 로그의 새 대화를 배치로 요약하고 {(길드 ID, 채널 ID): 요약}을 반환합니다.
+    상태 파일이 남아 있으면 새로 만들지 않고 그 배치를 이어서 기다린 뒤 결과를 반영합니다.
+    """
+    directory = os.path.dirname(state_file)
+    os.makedirs(directory, exist_ok=True)
+    state = None
+    if os.path.exists(state_file):
+        with open(state_file, "r", encoding="utf-8") as f:
+            state = json.load(f)
+
+    if state is None:
+        run_id = time.strftime("%Y%m%d-%H%M%S")
+        input_file = os.path.join(directory, f"{run_id}.input.jsonl")
+        logs = build_batch_requests(input_file, scan_meeting_logs(log_root))
+        if not logs:
+            os.remove(input_file)
+            print("요약할 새 회의 내용이 없습니다.")
+            return {}
+        state = {"run_id": run_id, "input_file": input_file, "batch_id": None, "logs": logs}
+        _save_state(state, state_file)
+
+    if state["batch_id"] is None:
+        state["batch_id"] = batch_client.submit(state["input_file"], state["run_id"])
+        _save_state(state, state_file)
+
+    while True:
+        status, output_file_id = batch_client.status(state["batch_id"])
+        if status in BATCH_TERMINAL_STATUSES:
+            break
+        print(f"배치 {state['batch_id']} 상태: {status}")
+        time.sleep(poll_interval)
+
+    summaries = {}
+    if output_file_id is not None:
+        summaries = apply_batch_results(batch_client.iter_results(output_file_id), state["logs"], complete)
+    if status != "completed":
+        print(f"배치 {state['batch_id']}가 {status} 상태로 끝났습니다. 반영하지 못한 로그는 다음 실행 때 다시 요약합니다.")
+    os.remove(state_file)
+    return summaries
+
+
+def main():
+    parser = argparse.ArgumentParser(description="모든 회의 채널의 새 대화를 한 번에 요약합니다.")
+    parser.add_argument("--local", action="store_true", help="Batch API 대신 요청을 하나씩 바로 처리합니다. (시험용)")
+    parser.add_argument("--poll-interval", type=float, default=BATCH_POLL_INTERVAL, help="배치 상태 확인 간격(초)")
+    args = parser.parse_args()
+
+    batch_client = LocalBatchClient(complete_prompt) if args.local else OpenAIBatchClient()
+    summaries = run_bulk_summaries(batch_client, poll_interval=args.poll_interval)
+    for (guild_id, channel_id), summary in summaries.items():
+        print(f"=== 길드 {guild_id} / 채널 {channel_id}\n{summary}\n")
+    print(f"{len(summaries)}개 회의 채널을 요약했습니다.")
+
+
+if __name__ == "__main__":
+    main()
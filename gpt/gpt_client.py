@@ -0,0 +1,189 @@
+import os
+import asyncio
+import weakref
+import httpx
+from dotenv import load_dotenv
+from openai import AsyncOpenAI, DefaultAsyncHttpxClient
+
+from metrics import record_token_usage
+
+# 환경 변수 로드
+load_dotenv()
+
+# OpenAI API 설정 (OPENAI_BASE_URL을 지정하면 로컬 가짜 서버로도 요청을 보낼 수 있습니다)
+OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
+OPENAI_BASE_URL = os.getenv("OPENAI_BASE_URL")
+# 요청 한 건의 최대 대기 시간(초)
+OPENAI_TIMEOUT = float(os.getenv("OPENAI_TIMEOUT", "60"))
+# 봇 전체와 길드별 동시 요청 수 제한
+OPENAI_MAX_CONCURRENCY = int(os.getenv("OPENAI_MAX_CONCURRENCY", "8"))
+OPENAI_GUILD_CONCURRENCY = int(os.getenv("OPENAI_GUILD_CONCURRENCY", "2"))
+# 공유 HTTP 커넥션 풀 크기
+OPENAI_MAX_CONNECTIONS = int(os.getenv("OPENAI_MAX_CONNECTIONS", "16"))
+
+
+class GPTService:
+    """
+    AsyncOpenAI 기반 GPT 호출 계층.
+    - 하나의 HTTP 커넥션 풀을 모든 명령어가 공유합니다.
+    - 전역/길드별 세마포어로 동시 요청 수를 제한해 한 서버가 전체를 독점하지 못하게 합니다.
+    - 요청 주체(owner)별로 진행 중인 요청을 추적해 명령어가 중단되면 함께 취소합니다.
+    """
+
+    def __init__(
+        self,
+        api_key=OPENAI_API_KEY,
+        base_url=OPENAI_BASE_URL,
+        timeout=OPENAI_TIMEOUT,
+        max_concurrency=OPENAI_MAX_CONCURRENCY,
+        guild_concurrency=OPENAI_GUILD_CONCURRENCY,
+        max_connections=OPENAI_MAX_CONNECTIONS,
+    ):
+        self.timeout = timeout
+        self.guild_concurrency = guild_concurrency
+        http_client = DefaultAsyncHttpxClient(
+            limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections),
+            timeout=timeout,
+        )
+        self.client = AsyncOpenAI(api_key=api_key, base_url=base_url, timeout=timeout, http_client=http_client)
+        self._global_semaphore = asyncio.Semaphore(max_concurrency)
+        # 사용 중인 길드의 세마포어만 남도록 약한 참조로 보관합니다.
+        self._guild_semaphores = weakref.WeakValueDictionary()
+        self._inflight = {}
+
+    def _guild_semaphore(self, guild_id):
+        semaphore = self._guild_semaphores.get(guild_id)
+        if semaphore is None:
+            semaphore = asyncio.Semaphore(self.guild_concurrency)
+            self._guild_semaphores[guild_id] = semaphore
+        return semaphore
+
+    def _track(self, owner):
+        """현재 태스크를 owner의 진행 중인 요청으로 등록합니다."""
+        task = asyncio.current_task()
+        if owner is not None and task is not None:
+            self._inflight.setdefault(owner, set()).add(task)
+        return task
+
+    def _untrack(self, owner, task):
+        if owner is None or task is None:
+            return
+        tasks = self._inflight.get(owner)
+        if tasks is not None:
+            tasks.discard(task)
+            if not tasks:
+                del self._inflight[owner]
+
+    async def _limited(self, guild_id, coro_factory):
+        """길드별 -> 전역 순서로 세마포어를 잡은 뒤 요청을 실행합니다."""
+        if guild_id is None:
+            async with self._global_semaphore:
+                return await coro_factory()
+        async with self._guild_semaphore(guild_id):
+            async with self._global_semaphore:
+                return await coro_factory()
+
+    async def create_completion(self, messages, model="gpt-4o-mini", guild_id=None, owner=None, timeout=None, **params):
+        """
+        chat.completions.create를 동시성 제한 안에서 호출하고 응답 객체를 그대로 반환합니다.
+        - guild_id: 길드별 동시성 제한에 사용할 키
+        - owner: cancel()로 요청을 취소할 때 사용할 키 (예: (guild_id, user_id))
+        - timeout: 세마포어 대기 시간을 포함한 전체 제한 시간(초)
+        """
+        task = self._track(owner)
+        try:
+            response = await asyncio.wait_for(
+                self._limited(
+                    guild_id,
+                    lambda: self.client.chat.completions.create(model=model, messages=messages, **params),
+                ),
+                timeout or self.timeout,
+            )
+            record_token_usage(model, response.usage)
+            return response
+        finally:
+            self._untrack(owner, task)
+
+    async def chat(self, messages, model="gpt-4o-mini", guild_id=None, owner=None, timeout=None, **params):
+        """create_completion을 호출하고 첫 번째 응답의 텍스트만 반환합니다."""
+        response = await self.create_completion(messages, model=model, guild_id=guild_id, owner=owner, timeout=timeout, **params)
+        return response.choices[0].message.content.strip()
+
+    async def stream_chat(self, messages, model="gpt-4o-mini", guild_id=None, owner=None, timeout=None, **params):
+        """
+        stream=True로 응답을 받아 텍스트 조각(delta)을 차례로 yield합니다.
+        스트림이 끝날 때까지 세마포어를 잡고 있으며, timeout은 조각 사이의 최대 대기 시간입니다.
+        """
+        timeout = timeout or self.timeout
+        task = self._track(owner)
+        guild_semaphore = self._guild_semaphore(guild_id) if guild_id is not None else None
+        try:
+            if guild_semaphore is not None:
+                await asyncio.wait_for(guild_semaphore.acquire(), timeout)
+            try:
+                await asyncio.wait_for(self._global_semaphore.acquire(), timeout)
+                try:
+                    # 마지막 조각으로 토큰 사용량을 함께 받습니다.
+                    stream = await asyncio.wait_for(
+                        self.client.chat.completions.create(
+                            model=model, messages=messages, stream=True,
+                            stream_options={"include_usage": True}, **params
+                        ),
+                        timeout,
+                    )
+                    iterator = stream.__aiter__()
+                    try:
+                        while True:
+                            try:
+                                chunk = await asyncio.wait_for(iterator.__anext__(), timeout)
+                            except StopAsyncIteration:
+                                break
+                            if getattr(chunk, "usage", None) is not None:
+                                record_token_usage(model, chunk.usage)
+                            if chunk.choices and chunk.choices[0].delta.content:
+                                yield chunk.choices[0].delta.content
+                    finally:
+                        await stream.close()
+                finally:
+                    self._global_semaphore.release()
+            finally:
+                if guild_semaphore is not None:
+                    guild_semaphore.release()
+        finally:
+            self._untrack(owner, task)
+
+    def cancel(self, owner):
+        """owner가 진행 중인 모든 요청을 취소하고 취소한 개수를 반환합니다."""
+        tasks = self._inflight.pop(owner, set())
+        for task in tasks:
+            task.cancel()
+        return len(tasks)
+
+    async def close(self):
+        await self.client.close()
+
+
+_service = None
+_service_loop = None
+
+
+def get_gpt_service():
+    """
+    현재 이벤트 루프에서 공유하는 GPTService를 반환합니다.
+    세마포어와 커넥션 풀은 루프에 묶이므로 루프가 바뀌면(예: 워커의 asyncio.run) 새로 만듭니다.
+    """
+    global _service, _service_loop
+    loop = asyncio.get_running_loop()
+    if _service is None or _service_loop is not loop:
+        _service = GPTService()
+        _service_loop = loop
+    return _service
+
+
+async def close_gpt_service():
+    """봇 종료 시 커넥션 풀을 정리합니다."""
+    global _service, _service_loop
+    if _service is not None:
+        await _service.close()
+    _service = None
+    _service_loop = None
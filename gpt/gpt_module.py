@@ -1,5 +1,11 @@
+import os
 import asyncio
-from .gpt import send_to_chatGpt, load_conversations, save_conversations, initialize_conversation
+from .gpt import send_to_chatGpt, stream_to_chatGpt, conversation_store, initialize_conversation
+from .gpt_client import get_gpt_service
+from .stream_reply import StreamingReply, send_long_message
+
+# GPT 응답을 토큰이 도착하는 대로 메시지를 수정하며 보여줄지 여부
+GPT_STREAM = os.getenv("GPT_STREAM", "1") == "1"
 
 async def handle_gpt_request(ctx, query):
     if not query:
@@ -7,33 +13,53 @@ async def handle_gpt_request(ctx, query):
         return
 
     user_id = str(ctx.author.id)
+    guild_id = ctx.guild.id if ctx.guild else None
+    reply = None
     try:
-        response = await asyncio.to_thread(send_to_chatGpt, user_id, query)
-        await ctx.send(response)
+        if GPT_STREAM:
+            reply = StreamingReply(ctx)
+            await reply.start()
+            async for delta in stream_to_chatGpt(user_id, query, guild_id):
+                await reply.feed(delta)
+            await reply.finish()
+        else:
+            response = await send_to_chatGpt(user_id, query, guild_id)
+            await send_long_message(ctx, response)
+    except asyncio.CancelledError:
+        await _report_failure(ctx, reply, "GPT 요청이 취소되었습니다.")
+        raise
     except Exception as e:
-        await ctx.send("GPT 요청 중 오류가 발생했습니다.")
+        await _report_failure(ctx, reply, "GPT 요청 중 오류가 발생했습니다.")
         print(f"GPT 요청 중 오류 발생: {e}")
 
+async def _report_failure(ctx, reply, text):
+    """스트리밍 중이었다면 자리표시 메시지를 안내 문구로 바꾸고, 아니면 새 메시지로 알립니다."""
+    if reply is None:
+        await ctx.send(text)
+        return
+    try:
+        await reply.fail(text)
+    except Exception as e:
+        print(f"GPT 응답 메시지를 수정하지 못했습니다: {e}")
+        await ctx.send(text)
+
 async def clear_conversations(ctx):
     user_id = str(ctx.author.id)
-    conversations = load_conversations()
 
-    if user_id in conversations:
-        conversations[user_id] = initialize_conversation()
-        save_conversations(conversations)
+    if await asyncio.to_thread(conversation_store.has_user, user_id):
+        await asyncio.to_thread(conversation_store.reset, user_id, initialize_conversation())
         await ctx.send("대화 기록이 초기화되었습니다.")
     else:
         await ctx.send("대화 기록이 존재하지 않습니다.")
 
 async def get_conversation_history(ctx, limit: int):
     user_id = str(ctx.author.id)
-    conversations = load_conversations()
+    messages = await asyncio.to_thread(conversation_store.get_messages, user_id)
 
-    if user_id not in conversations:
+    if messages is None:
         await ctx.send("대화 기록이 존재하지 않습니다.")
         return
 
-    messages = conversations[user_id]
     recent_messages = messages[-(limit * 2):]
 
     history = ""
@@ -43,4 +69,13 @@ async def get_conversation_history(ctx, limit: int):
         elif message['role'] == 'assistant':
             history += f"**GPT:** {message['content']}\n"
 
-    await ctx.send(f"**최근 {limit}개의 대화 기록:**\n{history}")
+    await send_long_message(ctx, f"**최근 {limit}개의 대화 기록:**\n{history}")
+
+async def cancel_gpt_requests(ctx):
+    """명령어를 실행한 사용자가 보낸 진행 중인 GPT 요청을 모두 취소합니다."""
+    guild_id = ctx.guild.id if ctx.guild else None
+    cancelled = get_gpt_service().cancel((guild_id, str(ctx.author.id)))
+    if cancelled:
+        await ctx.send(f"진행 중인 GPT 요청 {cancelled}개를 취소했습니다.")
+    else:
+        await ctx.send("진행 중인 GPT 요청이 없습니다.")
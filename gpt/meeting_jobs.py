@@ -0,0 +1,152 @@
+import os
+import time
+import uuid
+import asyncio
+import hashlib
+from collections import deque
+
+from celery import states
+
+from .gpt_batch import celery_app, batch_summarize_meeting
+from .stream_reply import send_long_message
+
+# 작업 상태를 확인하는 간격(초)과, 이 시간(초)이 지나도 끝나지 않으면 기다리기를 그만두는 기준
+MEETING_JOB_POLL_INTERVAL = float(os.getenv("MEETING_JOB_POLL_INTERVAL", "2"))
+MEETING_JOB_TIMEOUT = float(os.getenv("MEETING_JOB_TIMEOUT", "600"))
+
+STATE_LABELS = {
+    states.PENDING: "대기 중",
+    states.RECEIVED: "대기 중",
+    states.STARTED: "요약 중",
+    states.RETRY: "재시도 대기",
+    states.SUCCESS: "완료",
+    states.FAILURE: "실패",
+    "TIMEOUT": "시간 초과",
+}
+
+
+def job_key(meeting_file, since=None, last_n=None):
+    """
+    같은 회의 범위면 같은 키를 만듭니다. 진행 중인 작업을 찾는 데만 쓰고 Celery 작업 ID로는 쓰지 않습니다.
+    (작업 ID로 쓰면 결과 저장소에 남은 예전 작업의 상태/결과를 새 요청이 그대로 받게 됩니다)
+    범위의 끝은 요청 시점의 로그 크기로 고정하고, since는 분 단위로 맞춰 'last 2h'를 연달아 보내도 같은 작업이 됩니다.
+    """
+    size = os.path.getsize(meeting_file) if os.path.exists(meeting_file) else 0
+    if since is not None:
+        since = int(since // 60 * 60)
+    raw = f"{meeting_file}|{size}|{since}|{last_n}"
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()[:12]
+
+
+class MeetingJob:
+    def __init__(self, key, destination, user_id):
+        self.id = f"mtcl-{uuid.uuid4().hex}"  # 요청마다 새로 만드는 Celery 작업 ID
+        self.key = key
+        self.destination = destination  # 결과를 올릴 채널
+        self.user_id = user_id
+        self.state = states.PENDING
+        self.created_at = time.time()
+        self.finished_at = None
+        self.result = None  # celery AsyncResult
+        self.watcher = None
+
+
+class MeetingJobQueue:
+    """
+    /mtcl 요약을 Celery 워커에 맡기고 끝나면 결과를 채널에 올립니다.
+    - 같은 범위의 작업이 아직 끝나지 않았으면 새로 보내지 않고 그 작업을 돌려줍니다.
+    - 작업 상태는 결과 저장소(result backend)를 주기적으로 확인해 갱신합니다. (블로킹 호출은 스레드에서 실행)
+    """
+
+    def __init__(self, task=batch_summarize_meeting, poll_interval=MEETING_JOB_POLL_INTERVAL,
+                 timeout=MEETING_JOB_TIMEOUT, history=10):
+        self.task = task
+        self.poll_interval = poll_interval
+        self.timeout = timeout
+        self.active = {}  # 범위 키(job_key) -> 끝나지 않은 MeetingJob
+        self.finished = deque(maxlen=history)
+
+    async def submit(self, destination, user_id, meeting_file, since=None, last_n=None):
+        """작업을 보내고 (작업, 새로 보냈는지)를 반환합니다. 브로커에 보내지 못하면 예외를 그대로 던집니다."""
+        key = job_key(meeting_file, since, last_n)
+        job = self.active.get(key)
+        if job is not None:
+            return job, False
+
+        job = MeetingJob(key, destination, user_id)
+        self.active[key] = job
+        try:
+            job.result = await asyncio.to_thread(
+                self.task.apply_async, (user_id, meeting_file, since, last_n), task_id=job.id
+            )
+        except Exception:
+            del self.active[key]
+            raise
+        job.watcher = asyncio.create_task(self._watch(job))
+        return job, True
+
+    async def _watch(self, job):
+        try:
+            while True:
+                job.state = await asyncio.to_thread(lambda: job.result.state)
+                if job.state in states.READY_STATES:
+                    break
+                if time.time() - job.created_at > self.timeout:
+                    job.state = "TIMEOUT"
+                    break
+                await asyncio.sleep(self.poll_interval)
+
+            if job.state == states.SUCCESS:
+                text = job.result.result
+            elif job.state == "TIMEOUT":
+                text = "요약 작업이 너무 오래 걸려 기다리기를 그만두었습니다. 잠시 후 다시 시도해주세요."
+            else:
+                print(f"회의 요약 작업 {job.id} 실패: {job.result.result}")
+                text = "회의 요약 작업이 실패했습니다."
+            await send_long_message(job.destination, f"<@{job.user_id}> 회의 요약 (`{job.id}`)\n{text}")
+        except Exception as e:
+            print(f"회의 요약 작업 {job.id} 결과를 올리지 못했습니다: {e}")
+        finally:
+            job.finished_at = time.time()
+            self.active.pop(job.key, None)
+            self.finished.append(job)
+
+    def _broker_stats(self):
+        """(브로커 대기열 길이, {워커: 실행 중 작업 수}). 알 수 없으면 None. (블로킹, 스레드에서 호출)"""
+        if celery_app.conf.task_always_eager:
+            return 0, {}
+        depth = workers = None
+        try:
+            with celery_app.connection_for_read() as connection:
+                queue = connection.default_channel.queue_declare(
+                    queue=celery_app.conf.task_default_queue, passive=True
+                )
+                depth = queue.message_count
+        except Exception as e:
+            print(f"Celery 대기열 길이를 확인하지 못했습니다: {e}")
+        try:
+            active = celery_app.control.inspect(timeout=1.0).active() or {}
+            workers = {name: len(tasks) for name, tasks in active.items()}
+        except Exception as e:
+            print(f"Celery 워커 상태를 확인하지 못했습니다: {e}")
+        return depth, workers
+
+    async def stats(self):
+        depth, workers = await asyncio.to_thread(self._broker_stats)
+        return {
+            "queue_depth": depth,
+            "workers": workers,
+            "active": list(self.active.values()),
+            "finished": list(self.finished),
+        }
+
+    async def close(self):
+        """결과를 기다리는 작업을 멈춥니다. (작업 자체는 워커에서 계속 실행됩니다)"""
+        watchers = [job.watcher for job in self.active.values() if job.watcher is not None]
+        for watcher in watchers:
+            watcher.cancel()
+        await asyncio.gather(*watchers, return_exceptions=True)
+
+
+# 봇 전체에서 공유하는 회의 요약 작업 목록
+meeting_jobs = MeetingJobQueue()
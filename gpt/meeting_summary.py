@@ -0,0 +1,240 @@
+import os
+import json
+import asyncio
+import weakref
+import contextlib
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+from meeting_index import read_range
+from .context_window import count_tokens
+
+# 구간(chunk) 하나에 담을 회의 대화의 최대 토큰 수
+MEETING_CHUNK_TOKENS = int(os.getenv("MEETING_CHUNK_TOKENS", "3000"))
+# 구간 요약을 동시에 요청할 최대 개수
+MEETING_MAP_CONCURRENCY = int(os.getenv("MEETING_MAP_CONCURRENCY", "4"))
+
+MAP_PROMPT = (
+    "당신은 회의 내용을 요약하는 전문가입니다.\n"
+    "다음은 회의 대화의 일부입니다. 주요 논의 사항, 결정된 사항, 그리고 추후 진행해야 할 작업이나 질문을 "
+    "불릿 포인트 형식으로 빠짐없이 정리해 주세요.\n\n"
+)
+REDUCE_PROMPT = (
+    "당신은 회의 내용을 요약하는 전문가입니다.\n"
+    "다음은 하나의 회의를 시간 순서대로 나눠 요약한 내용입니다. 이를 하나의 요약으로 합쳐, "
+    "주요 논의 사항, 결정된 사항, 그리고 추후 진행해야 할 작업이나 질문을 "
+    "불릿 포인트 형식으로 명확하게 정리해 주세요.\n"
+    "가능하면 각 항목에 대해 간단한 설명도 덧붙여 주세요.\n\n"
+)
+SINGLE_PROMPT = (
+    "당신은 회의 내용을 요약하는 전문가입니다.\n"
+    "다음 회의 대화 내용을 분석하여, 주요 논의 사항, 결정된 사항, 그리고 추후 진행해야 할 작업이나 질문을 "
+    "불릿 포인트 형식으로 명확하게 정리해 주세요.\n"
+    "가능하면 각 항목에 대해 간단한 설명도 덧붙여 주세요.\n\n"
+)
+
+# 같은 회의 파일을 동시에 두 번 요약하지 않도록 파일별 락을 둡니다.
+# (프로세스 안에서는 asyncio.Lock, 봇과 Celery 워커 사이에서는 체크포인트 옆 .lock 파일 잠금)
+_file_locks = weakref.WeakValueDictionary()
+
+
+def checkpoint_path(meeting_file):
+    return meeting_file + ".summary.json"
+
+
+def _lock_file(meeting_file):
+    """체크포인트 잠금 파일을 열고 배타 잠금을 얻을 때까지 기다립니다. (블로킹)"""
+    f = open(checkpoint_path(meeting_file) + ".lock", "a+b")
+    try:
+        if fcntl is not None:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        else:
+            f.seek(0)
+            while True:
+                try:
+                    msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+                    break
+                except OSError:
+                    continue  # LK_LOCK은 10초 동안 얻지 못하면 OSError를 던집니다.
+    except BaseException:
+        f.close()
+        raise
+    return f
+
+
+def _unlock_file(f):
+    try:
+        if fcntl is not None:
+            fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+        else:
+            f.seek(0)
+            msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+    finally:
+        f.close()
+
+
+@contextlib.contextmanager
+def checkpoint_lock(meeting_file):
+    """
+    체크포인트를 읽고 고쳐 쓰는 동안 다른 프로세스(봇, Celery 워커, 배치 요약)가 같은 체크포인트를 건드리지 못하게 합니다.
+    Celery 재시도나 두 워커가 같은 작업을 받은 경우에도 한쪽의 요약이 다른 쪽 결과를 덮어쓰지 않습니다.
+    """
+    f = _lock_file(meeting_file)
+    try:
+        yield
+    finally:
+        _unlock_file(f)
+
+
+@contextlib.asynccontextmanager
+async def checkpoint_lock_async(meeting_file):
+    """checkpoint_lock의 비동기 버전. 잠금은 스레드에서 기다립니다."""
+    acquiring = asyncio.ensure_future(asyncio.to_thread(_lock_file, meeting_file))
+    try:
+        f = await asyncio.shield(acquiring)
+    except asyncio.CancelledError:
+        # 기다리던 스레드가 나중에 잠금을 얻으면 바로 풀어 줍니다.
+        acquiring.add_done_callback(
+            lambda task: task.cancelled() or task.exception() is not None or _unlock_file(task.result())
+        )
+        raise
+    try:
+        yield
+    finally:
+        _unlock_file(f)
+
+
+def load_checkpoint(meeting_file):
+    """이전 요약 체크포인트({"offset", "summary"})를 불러옵니다. 없거나 로그가 초기화됐으면 처음부터 시작합니다."""
+    path = checkpoint_path(meeting_file)
+    if not os.path.exists(path):
+        return {"offset": 0, "summary": None}
+    with open(path, "r", encoding="utf-8") as f:
+        checkpoint = json.load(f)
+    if checkpoint.get("offset", 0) > os.path.getsize(meeting_file):
+        return {"offset": 0, "summary": None}
+    return checkpoint
+
+
+def save_checkpoint(meeting_file, offset, summary):
+    path = checkpoint_path(meeting_file)
+    with open(path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump({"offset": offset, "summary": summary}, f, ensure_ascii=False)
+    os.replace(path + ".tmp", path)
+
+
+def format_log(msg):
+    return f"{msg['timestamp']} - {msg['author']}: {msg['content']}"
+
+
+def read_new_lines(meeting_file, offset):
+    """
+    offset 바이트 이후의 완전한(줄바꿈으로 끝나는) NDJSON 줄만 읽어
+    ("타임스탬프 - 작성자: 내용" 목록, 마지막으로 읽은 위치)를 반환합니다.
+    """
+    lines = []
+    with open(meeting_file, "rb") as f:
+        f.seek(offset)
+        for raw in f:
+            if not raw.endswith(b"\n"):
+                break  # 아직 쓰는 중인 마지막 줄은 다음 번에 읽습니다.
+            offset += len(raw)
+            if not raw.strip():
+                continue
+            try:
+                lines.append(format_log(json.loads(raw)))
+            except (ValueError, KeyError) as e:
+                print(f"회의 로그 줄을 건너뜁니다: {e}")
+    return lines, offset
+
+
+def chunk_lines(lines, max_tokens=MEETING_CHUNK_TOKENS):
+    """대화 줄들을 max_tokens 이하의 구간 텍스트로 묶습니다. (한 줄이 너무 길면 그 줄만 따로 둡니다)"""
+    chunks = []
+    current, current_tokens = [], 0
+    for line in lines:
+        tokens = count_tokens(line) + 1
+        if current and current_tokens + tokens > max_tokens:
+            chunks.append("\n".join(current))
+            current, current_tokens = [], 0
+        current.append(line)
+        current_tokens += tokens
+    if current:
+        chunks.append("\n".join(current))
+    return chunks
+
+
+async def map_reduce_summarize(lines, summarize, previous_summary=None, max_tokens=MEETING_CHUNK_TOKENS, concurrency=MEETING_MAP_CONCURRENCY):
+    """
+    대화 줄들을 구간별로 동시에 요약(map)한 뒤 하나로 합칩니다(reduce).
+    - summarize: async (prompt) -> str
+    - previous_summary: 이전 실행의 요약. 새 구간 요약들 앞에 붙여 함께 합칩니다.
+    """
+    chunks = chunk_lines(lines, max_tokens)
+    if not chunks:
+        return previous_summary
+    if len(chunks) == 1 and previous_summary is None:
+        return await summarize(SINGLE_PROMPT + chunks[0])
+
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def summarize_chunk(chunk):
+        async with semaphore:
+            return await summarize(MAP_PROMPT + chunk)
+
+    partials = await asyncio.gather(*(summarize_chunk(chunk) for chunk in chunks))
+    if previous_summary is not None:
+        partials = [previous_summary] + list(partials)
+    return await reduce_summaries(partials, summarize, max_tokens, semaphore)
+
+
+async def reduce_summaries(partials, summarize, max_tokens=MEETING_CHUNK_TOKENS, semaphore=None):
+    """부분 요약들을 합칩니다. 한 번에 담기지 않으면 여러 단계로 나눠 합칩니다."""
+    semaphore = semaphore or asyncio.Semaphore(MEETING_MAP_CONCURRENCY)
+    while True:
+        groups = chunk_lines(partials, max_tokens)
+        if len(groups) == 1:
+            return await summarize(REDUCE_PROMPT + groups[0])
+        if len(groups) == len(partials):
+            # 요약 하나하나가 이미 예산보다 커서 더 묶을 수 없으면 앞에서부터 두 개씩 합칩니다.
+            groups = ["\n".join(partials[i:i + 2]) for i in range(0, len(partials), 2)]
+
+        async def reduce_group(group):
+            async with semaphore:
+                return await summarize(REDUCE_PROMPT + group)
+
+        partials = list(await asyncio.gather(*(reduce_group(group) for group in groups)))
+
+
+async def summarize_meeting_file(meeting_file, summarize):
+    """
+    회의 로그 파일을 증분 요약합니다.
+    체크포인트 이후에 추가된 줄만 요약해 이전 요약과 합치고, 새 위치와 요약을 체크포인트로 저장합니다.
+    새로 추가된 줄이 없으면 API를 호출하지 않고 이전 요약을 그대로 반환합니다.
+    """
+    lock = _file_locks.get(meeting_file)
+    if lock is None:
+        lock = asyncio.Lock()
+        _file_locks[meeting_file] = lock
+
+    async with lock, checkpoint_lock_async(meeting_file):
+        checkpoint = await asyncio.to_thread(load_checkpoint, meeting_file)
+        lines, offset = await asyncio.to_thread(read_new_lines, meeting_file, checkpoint["offset"])
+        if not lines:
+            return checkpoint["summary"]
+        summary = await map_reduce_summarize(lines, summarize, checkpoint["summary"])
+        await asyncio.to_thread(save_checkpoint, meeting_file, offset, summary)
+        return summary
+
+
+async def summarize_meeting_range(meeting_file, summarize, since=None, last_n=None):
+    """
+    회의 로그의 일부 범위(since 이후 또는 마지막 last_n개)만 요약합니다.
+    색인으로 범위 시작 위치를 바로 찾아 읽으며, 체크포인트는 사용하지도 갱신하지도 않습니다.
+    """
+    records = await asyncio.to_thread(read_range, meeting_file, since, last_n)
+    return await map_reduce_summarize([format_log(record) for record in records], summarize)
@@ -0,0 +1,316 @@
+import os
+import re
+import json
+import time
+import zlib
+import itertools
+import threading
+import numpy as np
+
+from .response_cache import normalize_query
+
+# 해시 n-gram 벡터 차원 수
+QUERY_INDEX_DIM = int(os.getenv("QUERY_INDEX_DIM", "1024"))
+# 이 코사인 유사도 이상인 질문만 같은 질문 후보로 봅니다. (후보는 내용어 비교를 한 번 더 통과해야 합니다)
+QUERY_INDEX_THRESHOLD = float(os.getenv("QUERY_INDEX_THRESHOLD", "0.7"))
+# 인덱스에 보관할 최대 질문 수 (넘으면 압축 시 오래된 것부터 버립니다)
+QUERY_INDEX_MAX_ENTRIES = int(os.getenv("QUERY_INDEX_MAX_ENTRIES", "10000"))
+# vectorize 방식이 바뀌면 올립니다. (저장된 인덱스를 불러올 때 벡터를 다시 만듭니다)
+VECTOR_VERSION = 2
+# 유사도 상위 몇 개까지 내용어 비교를 해 볼지
+QUERY_INDEX_CANDIDATES = 5
+
+# 띄어쓰기/문장부호는 단어 경계로만 씁니다.
+_TOKEN_SPLIT = re.compile(r"[\s\W_]+", re.UNICODE)
+_HANGUL = re.compile(r"[가-힣]+$")
+# 단어 끝에서 떼어 낼 조사와 그 조사가 나타내는 역할. 역할이 다르면 같은 단어라도 질문 속 쓰임이 다릅니다.
+# ('자바보다 파이썬'과 '파이썬보다 자바', '서울에서 부산까지'와 '서울까지 부산에서'는 다른 질문)
+JOSA_ROLES = {
+    "이": "주어", "가": "주어", "은": "주어", "는": "주어",
+    "을": "목적어", "를": "목적어",
+    "의": "의",
+    "도": "", "만": "", "요": "",
+    "에": "에", "에서": "에서", "에게": "에게", "한테": "에게", "께": "에게",
+    "까지": "까지", "부터": "부터", "처럼": "처럼", "보다": "보다",
+    "와": "와", "과": "와", "이랑": "와", "랑": "와",
+    "로": "로", "으로": "로", "이나": "나", "나": "나",
+}
+# 긴 것부터 비교합니다.
+JOSA = sorted(JOSA_ROLES, key=len, reverse=True)
+# 조사가 여러 개 붙었을 때('서울에서는') 단어의 역할로 삼을 순서: 관계 조사 > 의 > 주어/목적어
+_CORE_ROLES = ("의", "주어", "목적어")
+# 있어도 없어도 질문 뜻이 달라지지 않는 말
+FILLER_WORDS = frozenset(["좀", "혹시", "제발", "please", "pls", "the", "a", "an"])
+
+
+def _strip_josa(token):
+    """
+    한글 단어 끝의 조사를 더 뗄 수 없을 때까지 떼고 (어간, 역할)을 돌려줍니다. 어간은 두 글자 이상 남깁니다.
+    ('도커는' -> ('도커', '주어'), '서울에서는' -> ('서울', '에서')) 조사가 없으면 역할은 ''입니다.
+    """
+    if not _HANGUL.match(token):
+        return token, ""
+    roles = []
+    stripped = True
+    while stripped:
+        stripped = False
+        for josa in JOSA:
+            if token.endswith(josa) and len(token) - len(josa) >= 2:
+                token = token[:-len(josa)]
+                roles.append(JOSA_ROLES[josa])
+                stripped = True
+                break
+    relational = [role for role in roles if role and role not in _CORE_ROLES]
+    if relational:
+        return token, relational[-1]
+    return token, next((role for role in _CORE_ROLES if role in roles), "")
+
+
+def tagged_tokens(text):
+    """질문의 (내용어, 역할) 목록. 정규화 후 단어로 나누고 조사는 역할로 바꾸고 군말은 뺍니다."""
+    tokens = (_strip_josa(token) for token in _TOKEN_SPLIT.split(normalize_query(text)) if token)
+    return [(token, role) for token, role in tokens if token not in FILLER_WORDS]
+
+
+def content_tokens(text):
+    """질문의 내용어 목록 (조사를 뗀 어간)."""
+    return [token for token, _ in tagged_tokens(text)]
+
+
+def _compatible(role_a, role_b):
+    # 조사를 생략한 단어('도커 설치')는 어떤 조사가 붙은 단어와도 같은 쓰임으로 봅니다.
+    return role_a == role_b or not role_a or not role_b
+
+
+def same_content(a, b):
+    """
+    두 질문의 내용어가 같은지 봅니다.
+    - 어순이 같으면 조사를 생략하거나 붙인 것만 다른 경우('도커 설치 방법', '도커는 설치 방법')를 같은 것으로 봅니다.
+      조사가 둘 다 있는데 역할이 다르면('영희가'/'영희에게') 다른 질문입니다.
+    - 어순이 다르면 양쪽 모두 조사 없는 단어만 있을 때만 같은 것으로 봅니다. (조사가 있으면 순서를 바꾸면 뜻이 바뀔 수 있음)
+    - 띄어쓰기만 다른 경우('도커설치방법')도 같은 것으로 봅니다.
+    오름차순/내림차순, 2023/2024, 부정어('안', 'not')처럼 한 단어라도 다르면 다른 질문입니다.
+    """
+    tagged_a, tagged_b = tagged_tokens(a), tagged_tokens(b)
+    if len(tagged_a) == len(tagged_b) and all(
+        token_a == token_b and _compatible(role_a, role_b)
+        for (token_a, role_a), (token_b, role_b) in zip(tagged_a, tagged_b)
+    ):
+        return True
+    if any(role for _, role in tagged_a + tagged_b):
+        return False
+    tokens_a, tokens_b = [token for token, _ in tagged_a], [token for token, _ in tagged_b]
+    return sorted(tokens_a) == sorted(tokens_b) or "".join(tokens_a) == "".join(tokens_b)
+
+
+def vectorize(text, dim=QUERY_INDEX_DIM, ngram_sizes=(2, 3)):
+    """
+    질문을 해시된 문자 n-gram 벡터(L2 정규화)로 바꿉니다.
+    조사를 뗀 내용어를 띄어쓰기 없이 이어 n-gram을 뽑으므로 '도커는 설치 방법'과 '도커설치방법'이 거의 같은 벡터가 됩니다.
+    n-gram은 crc32로 dim 차원에 해시하고, 부호 해시로 충돌 영향을 줄입니다.
+    """
+    vector = np.zeros(dim, dtype=np.float32)
+    tokens = content_tokens(text)
+    joined = "".join(tokens)
+    boundaries = set(itertools.accumulate(len(token) for token in tokens[:-1]))
+    grams = []
+    for n in ngram_sizes:
+        for i in range(len(joined) - n + 1):
+            # 단어 경계를 넘는 n-gram은 절반만 반영해 어순이 바뀌어도 크게 달라지지 않게 합니다.
+            crosses = any(i < b < i + n for b in boundaries)
+            grams.append((joined[i:i + n], 0.5 if crosses else 1.0))
+    if not grams and joined:
+        grams.append((joined, 1.0))
+    for gram, weight in grams:
+        h = zlib.crc32(gram.encode("utf-8"))
+        vector[h % dim] += weight if (h >> 31) & 1 else -weight
+    norm = np.linalg.norm(vector)
+    if norm > 0:
+        vector /= norm
+    return vector
+
+
+class QueryIndex:
+    """
+    과거 질문/답변 쌍에 대한 근사 중복 검색 인덱스.
+    - 질문 벡터를 (N, dim) NumPy 행렬에 쌓아 두고 행렬곱 한 번으로 코사인 top-k를 구합니다.
+    - add()로 한 건씩 추가하며, 거의 같은 질문(유사도 0.99 이상이고 내용어가 같은 질문)이 이미 있으면 새 답으로 교체합니다.
+    - compact_every건마다 삭제된 행과 초과분을 정리하고 파일로 저장합니다.
+    """
+
+    def __init__(
+        self,
+        path=None,
+        dim=QUERY_INDEX_DIM,
+        threshold=QUERY_INDEX_THRESHOLD,
+        max_entries=QUERY_INDEX_MAX_ENTRIES,
+        compact_every=200,
+    ):
+        """path: 저장 경로(확장자 제외). None이면 메모리에만 보관합니다."""
+        self.path = path
+        self.dim = dim
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.compact_every = compact_every
+        self._lock = threading.Lock()
+        self._matrix = np.zeros((64, dim), dtype=np.float32)
+        self._alive = np.zeros(64, dtype=bool)
+        self._created = np.zeros(64, dtype=np.float64)
+        self._queries = []
+        self._answers = []
+        self._size = 0
+        self._since_compact = 0
+        self.hits = 0
+        self.misses = 0
+        if path:
+            self.load()
+
+    def __len__(self):
+        return int(self._alive[:self._size].sum())
+
+    def _grow(self, needed):
+        capacity = self._matrix.shape[0]
+        if needed <= capacity:
+            return
+        while capacity < needed:
+            capacity *= 2
+        matrix = np.zeros((capacity, self.dim), dtype=np.float32)
+        matrix[:self._size] = self._matrix[:self._size]
+        alive = np.zeros(capacity, dtype=bool)
+        alive[:self._size] = self._alive[:self._size]
+        created = np.zeros(capacity, dtype=np.float64)
+        created[:self._size] = self._created[:self._size]
+        self._matrix, self._alive, self._created = matrix, alive, created
+
+    def search(self, query, k=1):
+        """코사인 유사도가 높은 순으로 (유사도, 질문, 답변)을 최대 k개 반환합니다."""
+        vector = vectorize(query, self.dim)
+        with self._lock:
+            if self._size == 0:
+                return []
+            scores = self._matrix[:self._size] @ vector
+            scores[~self._alive[:self._size]] = -1.0
+            k = min(k, self._size)
+            top = np.argpartition(-scores, k - 1)[:k]
+            top = top[np.argsort(-scores[top])]
+            return [
+                (float(scores[i]), self._queries[i], self._answers[i])
+                for i in top
+                if scores[i] > -1.0
+            ]
+
+    def lookup(self, query):
+        """
+        임계값 이상으로 비슷하고 내용어도 같은 과거 질문이 있으면 그 답을, 없으면 None을 반환합니다.
+        ('내림차순'/'오름차순'처럼 한 단어만 달라 유사도가 높은 질문은 내용어 비교에서 걸러집니다)
+        """
+        for score, stored, answer in self.search(query, k=QUERY_INDEX_CANDIDATES):
+            if score < self.threshold:
+                break
+            if same_content(query, stored):
+                self.hits += 1
+                return answer
+        self.misses += 1
+        return None
+
+    def add(self, query, answer):
+        vector = vectorize(query, self.dim)
+        with self._lock:
+            if self._size:
+                scores = self._matrix[:self._size] @ vector
+                for i in np.flatnonzero((scores >= 0.99) & self._alive[:self._size]):
+                    if same_content(query, self._queries[i]):
+                        self._alive[i] = False
+            self._grow(self._size + 1)
+            self._matrix[self._size] = vector
+            self._alive[self._size] = True
+            self._created[self._size] = time.time()
+            self._queries.append(query)
+            self._answers.append(answer)
+            self._size += 1
+            self._since_compact += 1
+            should_compact = self._since_compact >= self.compact_every
+        if should_compact:
+            self.compact()
+
+    def remove(self, query):
+        """정확히 같은 질문으로 저장된 항목을 삭제 표시합니다. (compact 때 실제로 지워집니다)"""
+        with self._lock:
+            for i in range(self._size):
+                if self._alive[i] and self._queries[i] == query:
+                    self._alive[i] = False
+
+    def compact(self):
+        """삭제 표시된 행을 지우고, max_entries를 넘으면 오래된 것부터 버린 뒤 저장합니다."""
+        with self._lock:
+            selected = np.flatnonzero(self._alive[:self._size])
+            if len(selected) > self.max_entries:
+                newest = np.argsort(-self._created[selected], kind="stable")[:self.max_entries]
+                selected = np.sort(selected[newest])
+
+            size = len(selected)
+            matrix = np.zeros((max(64, size), self.dim), dtype=np.float32)
+            alive = np.zeros(matrix.shape[0], dtype=bool)
+            created = np.zeros(matrix.shape[0], dtype=np.float64)
+            if size:
+                matrix[:size] = self._matrix[selected]
+                created[:size] = self._created[selected]
+                alive[:size] = True
+            self._queries = [self._queries[i] for i in selected]
+            self._answers = [self._answers[i] for i in selected]
+            self._matrix, self._alive, self._created = matrix, alive, created
+            self._size = size
+            self._since_compact = 0
+        if self.path:
+            self.save()
+
+    def save(self):
+        """벡터는 .npz, 질문/답변은 .json으로 원자적으로 저장합니다. (path가 없으면 아무것도 하지 않습니다)"""
+        if not self.path:
+            return
+        with self._lock:
+            matrix = self._matrix[:self._size].copy()
+            alive = self._alive[:self._size].copy()
+            created = self._created[:self._size].copy()
+            texts = {"dim": self.dim, "version": VECTOR_VERSION, "queries": list(self._queries), "answers": list(self._answers)}
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(self.path + ".npz.tmp", "wb") as f:
+            np.savez(f, matrix=matrix, alive=alive, created=created)
+        with open(self.path + ".json.tmp", "w", encoding="utf-8") as f:
+            json.dump(texts, f, ensure_ascii=False)
+        os.replace(self.path + ".npz.tmp", self.path + ".npz")
+        os.replace(self.path + ".json.tmp", self.path + ".json")
+
+    def load(self):
+        if not (os.path.exists(self.path + ".npz") and os.path.exists(self.path + ".json")):
+            return
+        with open(self.path + ".json", "r", encoding="utf-8") as f:
+            texts = json.load(f)
+        data = np.load(self.path + ".npz")
+        if texts["dim"] != self.dim or len(texts["queries"]) != data["matrix"].shape[0]:
+            print("질문 인덱스 파일이 현재 설정과 맞지 않아 새로 만듭니다.")
+            return
+        size = data["matrix"].shape[0]
+        matrix = data["matrix"]
+        if texts.get("version") != VECTOR_VERSION:
+            # 벡터를 만드는 방식이 바뀌었으면 저장된 질문으로 다시 만듭니다.
+            matrix = np.array([vectorize(query, self.dim) for query in texts["queries"]], dtype=np.float32)
+        with self._lock:
+            self._grow(max(size, 64))
+            self._matrix[:size] = matrix.reshape(size, self.dim)
+            self._alive[:size] = data["alive"]
+            self._created[:size] = data["created"]
+            self._queries = texts["queries"]
+            self._answers = texts["answers"]
+            self._size = size
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
@@ -0,0 +1,163 @@
+import os
+import re
+import json
+import time
+import asyncio
+import sqlite3
+import hashlib
+import threading
+import unicodedata
+from collections import OrderedDict
+
+
+def normalize_query(query):
+    """유니코드 정규화(NFKC), 소문자화, 연속 공백 제거로 같은 질문을 같은 키로 묶습니다."""
+    query = unicodedata.normalize("NFKC", query).strip().lower()
+    return re.sub(r"\s+", " ", query)
+
+
+def make_cache_key(query, model, **params):
+    """정규화한 질문 + 모델 + 파라미터로 캐시 키를 만듭니다."""
+    payload = json.dumps(
+        {"q": normalize_query(query), "model": model, "params": params},
+        ensure_ascii=False,
+        sort_keys=True,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class _DiskTier:
+    """재시작 후에도 남는 SQLite 기반 캐시 계층."""
+
+    def __init__(self, path):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses (key TEXT PRIMARY KEY, value TEXT NOT NULL, created_at REAL NOT NULL)"
+        )
+        self._conn.commit()
+
+    def get(self, key, ttl):
+        with self._lock:
+            row = self._conn.execute("SELECT value, created_at FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            if time.time() - row[1] > ttl:
+                self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                self._conn.commit()
+                return None
+            return row[0], row[1]
+
+    def set(self, key, value, created_at):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (key, value, created_at) VALUES (?, ?, ?)",
+                (key, value, created_at),
+            )
+            self._conn.commit()
+
+
+class ResponseCache:
+    """
+    GPT 응답 캐시.
+    - 메모리 LRU(max_entries) + TTL, 선택적으로 디스크(SQLite) 계층을 둡니다.
+    - 같은 키의 요청이 동시에 여러 개 들어오면 API 호출은 한 번만 하고 결과를 나눠 씁니다(singleflight).
+    """
+
+    def __init__(self, max_entries=1024, ttl=24 * 3600, disk_path=None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._memory = OrderedDict()  # key -> (value, created_at)
+        self._disk = _DiskTier(disk_path) if disk_path else None
+        self._inflight = {}
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.coalesced = 0
+
+    def _remember(self, key, value, created_at):
+        self._memory[key] = (value, created_at)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    async def get(self, key):
+        """메모리 -> 디스크 순서로 찾고, 없거나 만료됐으면 None을 반환합니다."""
+        entry = self._memory.get(key)
+        if entry is not None:
+            if time.time() - entry[1] <= self.ttl:
+                self._memory.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+            del self._memory[key]
+        if self._disk is not None:
+            entry = await asyncio.to_thread(self._disk.get, key, self.ttl)
+            if entry is not None:
+                self._remember(key, *entry)
+                self.hits += 1
+                self.disk_hits += 1
+                return entry[0]
+        return None
+
+    async def set(self, key, value):
+        created_at = time.time()
+        self._remember(key, value, created_at)
+        if self._disk is not None:
+            await asyncio.to_thread(self._disk.set, key, value, created_at)
+
+    async def get_or_compute(self, key, compute):
+        """
+        캐시에 있으면 바로 반환하고, 없으면 compute()를 한 번만 실행해 결과를 저장합니다.
+        compute가 예외를 던지면 캐시하지 않고, 기다리던 다른 요청에도 같은 예외를 전달합니다.
+        """
+        loop = asyncio.get_running_loop()
+        while True:
+            value = await self.get(key)
+            if value is not None:
+                return value
+            future = self._inflight.get(key)
+            if future is None:
+                break
+            self.coalesced += 1
+            try:
+                return await asyncio.shield(future)
+            except asyncio.CancelledError:
+                # 먼저 요청한 쪽이 취소된 경우에만 직접 다시 시도합니다.
+                if future.cancelled():
+                    continue
+                raise
+
+        self.misses += 1
+        future = loop.create_future()
+        self._inflight[key] = future
+        try:
+            value = await compute()
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            future.exception()  # 기다리는 쪽이 없어도 경고가 나지 않도록 확인 처리
+            raise
+        finally:
+            self._inflight.pop(key, None)
+
+        future.set_result(value)
+        await self.set(key, value)
+        return value
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "entries": len(self._memory),
+            "max_entries": self.max_entries,
+        }
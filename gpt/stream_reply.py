@@ -0,0 +1,125 @@
+import os
+import re
+import time
+
+# Discord 메시지 한 개의 최대 글자 수
+DISCORD_MESSAGE_LIMIT = 2000
+# 스트리밍 중 메시지를 수정하는 최소 간격(초). Discord의 메시지 수정 속도 제한(약 5회/5초)보다 느리게 유지합니다.
+STREAM_EDIT_INTERVAL = float(os.getenv("GPT_STREAM_EDIT_INTERVAL", "1.2"))
+# 응답을 기다리는 동안 먼저 보내 둘 메시지
+STREAM_PLACEHOLDER = "답변을 생성하는 중입니다..."
+
+# 문장 경계: 마침표/물음표/느낌표(한글 종결 포함) 뒤의 공백, 또는 줄바꿈
+_SENTENCE_BOUNDARY = re.compile(r"(?<=[.!?。！？…])\s+|\n")
+
+
+def find_split_point(text, limit=DISCORD_MESSAGE_LIMIT):
+    """
+    limit 이내에서 text를 자를 위치를 찾습니다.
+    문장 경계 -> 공백 -> 강제 자르기 순서로 찾으며, 너무 앞에서 자르지 않도록 limit의 절반 이후만 봅니다.
+    """
+    if len(text) <= limit:
+        return len(text)
+    window = text[:limit]
+    split = -1
+    for match in _SENTENCE_BOUNDARY.finditer(window):
+        split = match.end()
+    if split < limit // 2:
+        space = window.rfind(" ")
+        split = space + 1 if space >= limit // 2 else limit
+    return split
+
+
+def split_message(text, limit=DISCORD_MESSAGE_LIMIT):
+    """긴 텍스트를 Discord 메시지 길이 제한에 맞게 문장 경계에서 나눕니다."""
+    chunks = []
+    while len(text) > limit:
+        split = find_split_point(text, limit)
+        chunks.append(text[:split].rstrip())
+        text = text[split:].lstrip()
+    if text:
+        chunks.append(text)
+    return chunks
+
+
+async def send_long_message(destination, text):
+    """destination(ctx 또는 채널)에 긴 텍스트를 여러 메시지로 나눠 보냅니다."""
+    for chunk in split_message(text) or [text]:
+        await destination.send(chunk)
+
+
+class StreamingReply:
+    """
+    스트리밍 응답을 Discord 메시지 하나에 점진적으로 채워 넣습니다.
+    - 자리표시 메시지를 먼저 보내고, 이후 조각을 모아 edit_interval마다 한 번만 수정합니다.
+    - 메시지가 글자 수 제한을 넘으면 문장 경계에서 잘라 다음 메시지로 이어 씁니다.
+    """
+
+    def __init__(self, destination, placeholder=STREAM_PLACEHOLDER, edit_interval=STREAM_EDIT_INTERVAL, limit=DISCORD_MESSAGE_LIMIT):
+        self.destination = destination
+        self.placeholder = placeholder
+        self.edit_interval = edit_interval
+        self.limit = limit
+        self.text = ""  # 지금까지 받은 전체 응답
+        self._message = None  # 현재 채우고 있는 메시지
+        self._current = ""  # 현재 메시지에 들어갈 텍스트
+        self._shown = None  # 현재 메시지에 마지막으로 반영한 텍스트
+        self._last_edit = 0.0
+
+    async def start(self):
+        self._message = await self.destination.send(self.placeholder)
+        self._last_edit = time.monotonic()
+
+    async def feed(self, delta):
+        """새 조각을 추가하고, 수정 간격이 지났으면 메시지에 반영합니다."""
+        self.text += delta
+        self._current += delta
+        if len(self._current) > self.limit:
+            await self._roll_over()
+        if time.monotonic() - self._last_edit >= self.edit_interval:
+            await self._edit()
+
+    async def finish(self, fallback="응답이 비어 있습니다."):
+        """남은 텍스트를 모두 반영합니다."""
+        if not self.text.strip():
+            self._current = fallback
+        await self._edit()
+
+    async def fail(self, text):
+        """
+        스트리밍이 실패하거나 취소됐을 때 자리표시 메시지를 text로 바꿉니다.
+        이미 받은 내용이 있으면 그 뒤에 text를 덧붙이고, 아직 보낸 메시지가 없으면 새로 보냅니다.
+        받은 내용과 text를 합쳐 글자 수 제한을 넘으면 받은 내용의 뒷부분을 잘라 냅니다.
+        """
+        text = text[:self.limit]
+        if self._message is None:
+            await self.destination.send(text)
+            return
+        received = self._current.strip()
+        room = self.limit - len(text) - 2  # 구분용 빈 줄
+        if len(received) > room:
+            received = received[:max(0, room - 1)].rstrip() + "…" if room > 1 else ""
+        content = f"{received}\n\n{text}" if received else text
+        await self._message.edit(content=content)
+        self._shown = content
+
+    async def _edit(self):
+        content = self._current.strip()
+        if not content or content == self._shown:
+            return
+        await self._message.edit(content=content)
+        self._shown = content
+        self._last_edit = time.monotonic()
+
+    async def _roll_over(self):
+        """현재 메시지를 문장 경계에서 마무리하고 나머지를 새 메시지로 넘깁니다."""
+        while len(self._current) > self.limit:
+            split = find_split_point(self._current, self.limit)
+            head, rest = self._current[:split], self._current[split:].lstrip()
+            self._current = head
+            await self._edit()
+            self._current = rest
+            initial = rest[:self.limit].strip()
+            self._message = await self.destination.send(initial or self.placeholder)
+            self._shown = initial or None
+            self._last_edit = time.monotonic()
@@ -0,0 +1,219 @@
+import os
+import re
+import json
+import mmap
+import struct
+from contextlib import ExitStack
+from datetime import datetime, timedelta
+from zoneinfo import ZoneInfo
+
+# 회의 로그 옆에 두는 색인 파일: 메시지마다 (타임스탬프(epoch 초), 줄 시작 바이트 위치) 16바이트
+INDEX_SUFFIX = ".idx"
+INDEX_RECORD = struct.Struct("<dQ")
+# "since 14:00" 같은 시각을 해석할 시간대
+BOT_TIMEZONE = ZoneInfo(os.getenv("BOT_TIMEZONE", "Asia/Seoul"))
+
+
+def index_path(log_path):
+    return log_path + INDEX_SUFFIX
+
+
+def record_timestamp(record):
+    """회의 로그 레코드의 ISO 타임스탬프를 epoch 초로 바꿉니다."""
+    try:
+        return datetime.fromisoformat(record["timestamp"]).timestamp()
+    except (KeyError, TypeError, ValueError):
+        return 0.0
+
+
+def pack_entry(timestamp, offset):
+    return INDEX_RECORD.pack(timestamp, offset)
+
+
+def append_index(log_path, entries):
+    """pack_entry로 만든 색인 항목들을 색인 파일 끝에 추가합니다."""
+    with open(index_path(log_path), "ab") as f:
+        f.write(b"".join(entries))
+
+
+def _read_last_entry(idx_file):
+    size = os.path.getsize(idx_file) if os.path.exists(idx_file) else 0
+    count = size // INDEX_RECORD.size
+    if count == 0:
+        return None, 0
+    with open(idx_file, "rb") as f:
+        f.seek((count - 1) * INDEX_RECORD.size)
+        return INDEX_RECORD.unpack(f.read(INDEX_RECORD.size)), count
+
+
+def _unindexed_lines(log_path, last_entry, end=None):
+    """
+    색인된 마지막 줄(last_entry) 이후의 완성된 로그 줄을 (타임스탬프, 위치)로 돌려줍니다. 파일은 읽기만 합니다.
+    쓰는 중인 마지막 줄(줄바꿈 없음)과 end 바이트 이후는 건너뜁니다.
+    """
+    entries = []
+    with open(log_path, "rb") as f:
+        offset = 0
+        if last_entry is not None:
+            offset = last_entry[1]
+            f.seek(offset)
+            offset += len(f.readline())  # 이미 색인된 줄은 건너뜁니다.
+        for raw in f:
+            if not raw.endswith(b"\n") or (end is not None and offset + len(raw) > end):
+                break
+            if raw.strip():
+                try:
+                    timestamp = record_timestamp(json.loads(raw))
+                except ValueError:
+                    timestamp = 0.0
+                entries.append((timestamp, offset))
+            offset += len(raw)
+    return entries
+
+
+def catch_up_index(log_path):
+    """
+    색인에 없는 로그 줄(색인 도입 전 로그, 또는 로그만 쓰고 색인을 쓰기 전에 종료된 경우)을 색인에 추가합니다.
+    색인 파일은 회의 로그 작성기(save.py)만 씁니다. 작성기 스레드 밖에서 부르면 같은 줄이 두 번 색인될 수 있습니다.
+    """
+    if not os.path.exists(log_path):
+        return
+    idx_file = index_path(log_path)
+    # 쓰다 만 색인 항목이 있으면 잘라냅니다.
+    if os.path.exists(idx_file):
+        extra = os.path.getsize(idx_file) % INDEX_RECORD.size
+        if extra:
+            with open(idx_file, "r+b") as f:
+                f.truncate(os.path.getsize(idx_file) - extra)
+    last, _ = _read_last_entry(idx_file)
+    entries = _unindexed_lines(log_path, last)
+    if entries:
+        append_index(log_path, [pack_entry(timestamp, offset) for timestamp, offset in entries])
+
+
+class _IndexView:
+    """mmap된 색인 파일을 (타임스탬프, 위치) 시퀀스처럼 다룹니다."""
+
+    def __init__(self, buffer):
+        self._buffer = buffer
+        self._count = len(buffer) // INDEX_RECORD.size
+
+    def __len__(self):
+        return self._count
+
+    def __getitem__(self, i):
+        return INDEX_RECORD.unpack_from(self._buffer, i * INDEX_RECORD.size)
+
+    def first_at_or_after(self, timestamp):
+        """timestamp 이후 첫 메시지의 색인 번호 (이진 탐색)."""
+        lo, hi = 0, self._count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self[mid][0] < timestamp:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+
+def _start_offset(log_path, since=None, last_n=None):
+    """
+    범위 조건에 맞는 첫 줄의 바이트 위치와 읽을 끝 위치를 (start, end)로 찾습니다. 해당 메시지가 없으면 None.
+    end는 색인을 연 직후의 로그 크기라, 그 뒤에 작성기가 덧붙인 줄은 이번 읽기에 섞이지 않습니다.
+    색인은 읽기만 하고, 아직 색인되지 않은 끝부분 줄(작성기가 로그를 쓰고 색인을 쓰기 전, 또는 색인 도입 전 로그)은
+    로그에서 직접 읽어 색인 뒤에 이어 붙인 것처럼 다룹니다.
+    """
+    idx_file = index_path(log_path)
+    # 작성기가 쓰는 중인 색인 항목(16바이트 미만 조각)은 _IndexView가 무시합니다.
+    indexed = os.path.exists(idx_file) and os.path.getsize(idx_file) >= INDEX_RECORD.size
+    with ExitStack() as stack:
+        buffer = b""
+        if indexed:
+            f = stack.enter_context(open(idx_file, "rb"))
+            buffer = stack.enter_context(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ))
+        view = _IndexView(buffer)
+        # 작성기는 로그를 쓴 뒤 색인을 쓰므로, 색인을 연 뒤 잰 로그 크기는 색인된 모든 줄을 포함합니다.
+        end = os.path.getsize(log_path)
+        tail = _unindexed_lines(log_path, view[len(view) - 1] if len(view) else None, end)
+        total = len(view) + len(tail)
+        if last_n is not None:
+            position = max(0, total - last_n)
+        else:
+            position = view.first_at_or_after(since)
+            if position == len(view):
+                position += next((i for i, (timestamp, _) in enumerate(tail) if timestamp >= since), len(tail))
+        if position >= total:
+            return None
+        start = view[position][1] if position < len(view) else tail[position - len(view)][1]
+        return start, end
+
+
+def read_range(log_path, since=None, last_n=None):
+    """
+    회의 로그에서 since(epoch 초) 이후 또는 마지막 last_n개 메시지만 읽어 레코드 목록으로 반환합니다.
+    색인으로 시작 위치를 찾은 뒤 로그를 mmap해 그 위치부터만 파싱합니다. (로그와 색인 파일은 읽기만 합니다)
+    """
+    if not os.path.exists(log_path) or os.path.getsize(log_path) == 0:
+        return []
+    span = _start_offset(log_path, since=since, last_n=last_n)
+    if span is None:
+        return []
+    offset, end = span
+
+    records = []
+    with open(log_path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+        position = offset
+        end = min(end, len(buffer))
+        while position < end:
+            newline = buffer.find(b"\n", position, end)
+            if newline == -1:
+                break  # 아직 쓰는 중인 마지막 줄
+            line = buffer[position:newline]
+            position = newline + 1
+            if not line.strip():
+                continue
+            try:
+                records.append(json.loads(line))
+            except ValueError as e:
+                print(f"회의 로그 줄을 건너뜁니다: {e}")
+    return records
+
+
+_UNITS = {
+    "m": 60, "min": 60, "분": 60,
+    "h": 3600, "hour": 3600, "hours": 3600, "시간": 3600,
+    "d": 86400, "day": 86400, "days": 86400, "일": 86400,
+}
+
+
+def parse_range(text, now=None):
+    """
+    /mtcl 범위 인자를 해석합니다.
+    - "last 2h", "last 30m", "최근 2시간" -> {"since": epoch 초}
+    - "since 14:00", "14:00 이후"        -> {"since": 오늘(미래면 어제) 14:00의 epoch 초}
+    - "last 200 messages", "최근 200개"  -> {"last_n": 200}
+    해석할 수 없으면 ValueError를 던집니다.
+    """
+    now = now or datetime.now(BOT_TIMEZONE)
+    text = text.strip().lower()
+
+    match = re.fullmatch(r"(?:last|최근)\s*(\d+)\s*(?:messages?|msgs?|개)", text)
+    if match:
+        return {"last_n": int(match.group(1))}
+
+    match = re.fullmatch(r"(?:last|최근)\s*(\d+)\s*(m|min|h|hours?|d|days?|분|시간|일)", text)
+    if match:
+        seconds = int(match.group(1)) * _UNITS[match.group(2)]
+        return {"since": (now - timedelta(seconds=seconds)).timestamp()}
+
+    match = re.fullmatch(r"(?:since\s*)?(\d{1,2}):(\d{2})(?:\s*이후)?", text)
+    if match:
+        hour, minute = int(match.group(1)), int(match.group(2))
+        if hour > 23 or minute > 59:
+            raise ValueError(text)
+        start = now.replace(hour=hour, minute=minute, second=0, microsecond=0)
+        if start > now:
+            start -= timedelta(days=1)
+        return {"since": start.timestamp()}
+
+    raise ValueError(text)
@@ -0,0 +1,242 @@
+import os
+import time
+import asyncio
+import threading
+from contextlib import contextmanager
+
+# Prometheus 형식 지표를 내보낼 로컬 HTTP 포트 (0이면 끕니다)
+METRICS_HOST = os.getenv("METRICS_HOST", "127.0.0.1")
+METRICS_PORT = int(os.getenv("METRICS_PORT", "9108"))
+
+# 지연 시간 히스토그램 구간(초)
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+def _format_labels(names, values, extra=None):
+    pairs = list(zip(names, values))
+    if extra:
+        pairs.append(extra)
+    if not pairs:
+        return ""
+    escaped = (str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, v in pairs)
+    return "{" + ",".join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + "}"
+
+
+def _format_value(value):
+    value = float(value)
+    if value.is_integer():
+        return str(int(value))
+    if value in (float("inf"), float("-inf")):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(value)
+
+
+class Metric:
+    """
+    지표 하나. 라벨 값 조합마다 값을 따로 둡니다.
+    값을 바꾸는 연산은 숫자 몇 개를 더하는 정도라서 명령어/메시지마다 불러도 부담이 없습니다.
+    재생 스레드나 to_thread 작업에서도 부를 수 있도록 락으로 보호합니다.
+    """
+    type = None
+
+    def __init__(self, name, help, labels=()):
+        self.name = name
+        self.help = help
+        self.label_names = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+        REGISTRY.append(self)
+
+    def _key(self, labels):
+        return tuple(str(labels.get(name, "")) for name in self.label_names)
+
+    def samples(self):
+        """[(이름 접미사, 라벨 값, 추가 라벨, 값)]"""
+        with self._lock:
+            return [("", key, None, value) for key, value in self._values.items()]
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.type}"]
+        for suffix, key, extra, value in self.samples():
+            lines.append(f"{self.name}{suffix}{_format_labels(self.label_names, key, extra)} {_format_value(value)}")
+        return lines
+
+
+class Counter(Metric):
+    type = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def values(self):
+        with self._lock:
+            return dict(self._values)
+
+
+class Gauge(Metric):
+    """값을 직접 set하거나, callback을 주면 내보낼 때마다 {라벨 값 튜플: 값}을 받아 씁니다."""
+    type = "gauge"
+
+    def __init__(self, name, help, labels=(), callback=None):
+        super().__init__(name, help, labels)
+        self.callback = callback
+
+    def set(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def values(self):
+        if self.callback is not None:
+            return {tuple(str(v) for v in key): value for key, value in self.callback().items()}
+        with self._lock:
+            return dict(self._values)
+
+    def samples(self):
+        return [("", key, None, value) for key, value in self.values().items()]
+
+
+class Histogram(Metric):
+    type = "histogram"
+
+    def __init__(self, name, help, labels=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, help, labels)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            counts, _, _ = entry
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+                    break
+            else:
+                counts[-1] += 1
+            entry[1] += value
+            entry[2] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def summary(self):
+        """{라벨 값 튜플: (횟수, 평균, p95 추정치)}. p95는 해당 구간의 상한으로 추정합니다."""
+        with self._lock:
+            entries = {key: (list(counts), total, count) for key, (counts, total, count) in self._values.items()}
+        result = {}
+        for key, (counts, total, count) in entries.items():
+            target, seen, p95 = count * 0.95, 0, float("inf")
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                seen += bucket_count
+                if seen >= target:
+                    p95 = bound
+                    break
+            result[key] = (count, total / count if count else 0.0, p95)
+        return result
+
+    def samples(self):
+        with self._lock:
+            entries = [(key, list(counts), total, count) for key, (counts, total, count) in self._values.items()]
+        samples = []
+        for key, counts, total, count in entries:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                samples.append(("_bucket", key, ("le", repr(bound)), cumulative))
+            samples.append(("_bucket", key, ("le", "+Inf"), count))
+            samples.append(("_sum", key, None, total))
+            samples.append(("_count", key, None, count))
+        return samples
+
+
+REGISTRY = []
+
+
+def render_metrics():
+    """등록된 모든 지표를 Prometheus 텍스트 형식으로 반환합니다."""
+    lines = []
+    for metric in REGISTRY:
+        try:
+            lines.extend(metric.render())
+        except Exception as e:
+            print(f"지표 {metric.name}를 내보내지 못했습니다: {e}")
+    return "\n".join(lines) + "\n"
+
+
+# ---- 봇 지표 ----
+
+COMMAND_LATENCY = Histogram("bot_command_seconds", "명령어 처리 시간", ["command"])
+COMMAND_ERRORS = Counter("bot_command_errors_total", "오류로 끝난 명령어 수", ["command"])
+MESSAGE_LATENCY = Histogram("bot_message_seconds", "on_message 분기별 처리 시간", ["branch"])
+OPENAI_TOKENS = Counter("openai_tokens_total", "OpenAI 토큰 사용량", ["model", "kind"])
+TTS_SYNTH_LATENCY = Histogram("tts_synthesis_seconds", "TTS 엔진 합성 시간", ["backend"])
+FFMPEG_STARTUP = Histogram("ffmpeg_startup_seconds", "FFmpeg 프로세스 시작 시간", ["use"])
+MEETING_LOG_MESSAGES = Counter("meeting_log_messages_total", "회의 로그에 기록한 메시지 수")
+MEETING_LOG_BYTES = Counter("meeting_log_bytes_total", "회의 로그에 기록한 바이트 수")
+
+
+def record_token_usage(model, usage):
+    """OpenAI 응답의 usage를 기록합니다. (usage가 없으면 무시)"""
+    if usage is None:
+        return
+    OPENAI_TOKENS.inc(usage.prompt_tokens or 0, model=model, kind="prompt")
+    OPENAI_TOKENS.inc(usage.completion_tokens or 0, model=model, kind="completion")
+
+
+# ---- HTTP 엔드포인트 ----
+
+async def _handle_scrape(reader, writer):
+    try:
+        request_line = await asyncio.wait_for(reader.readline(), 5)
+        # 나머지 헤더는 읽고 버립니다.
+        while (await asyncio.wait_for(reader.readline(), 5)) not in (b"\r\n", b"\n", b""):
+            pass
+        parts = request_line.decode("latin-1").split()
+        if len(parts) >= 2 and parts[0] == "GET" and parts[1].split("?")[0] in ("/", "/metrics"):
+            status, body = "200 OK", render_metrics().encode("utf-8")
+        else:
+            status, body = "404 Not Found", b"not found\n"
+        writer.write(
+            f"HTTP/1.1 {status}\r\n"
+            f"Content-Type: text/plain; version=0.0.4; charset=utf-8\r\n"
+            f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode("latin-1") + body
+        )
+        await writer.drain()
+    except (asyncio.TimeoutError, ConnectionError):
+        pass
+    finally:
+        writer.close()
+
+
+_server = None
+
+
+async def start_metrics_server(host=METRICS_HOST, port=METRICS_PORT):
+    """/metrics 엔드포인트를 엽니다. 포트가 0이거나 이미 열려 있으면 아무것도 하지 않습니다."""
+    global _server
+    if port == 0 or _server is not None:
+        return
+    try:
+        _server = await asyncio.start_server(_handle_scrape, host, port)
+    except OSError as e:
+        print(f"지표 엔드포인트를 열지 못했습니다 ({host}:{port}): {e}")
+        return
+    print(f"지표 엔드포인트: http://{host}:{port}/metrics")
+
+
+async def stop_metrics_server():
+    global _server
+    if _server is not None:
+        _server.close()
+        await _server.wait_closed()
+        _server = None
@@ -0,0 +1,357 @@
+import os
+import time
+import asyncio
+from collections import OrderedDict, deque
+
+import yt_dlp
+
+from audio_mixer import FFMPEG_EXECUTABLE, FRAME_BYTES, get_mixer, guild_mixers
+from youtube_module import search_videos, QuotaExceeded
+from settings import guild_settings
+from metrics import FFMPEG_STARTUP
+
+# 음악 레인 음량 (TTS는 1.0)
+MUSIC_VOLUME = float(os.getenv("MUSIC_VOLUME", "0.5"))
+# 스트림 URL은 몇 시간 뒤 만료되므로 해석 결과는 이 시간(초) 동안만 재사용합니다.
+MUSIC_RESOLVE_TTL = float(os.getenv("MUSIC_RESOLVE_TTL", "3600"))
+MUSIC_RESOLVE_CACHE_SIZE = int(os.getenv("MUSIC_RESOLVE_CACHE_SIZE", "256"))
+MUSIC_MAX_QUEUE = int(os.getenv("MUSIC_MAX_QUEUE", "50"))
+# 이 디렉터리 안의 파일은 `/play local:파일명`으로 재생할 수 있습니다. (비어 있으면 사용 안 함)
+MUSIC_LOCAL_DIR = os.getenv("MUSIC_LOCAL_DIR", "")
+
+MUSIC_LANE = "music"
+# FFmpeg 출력에서 한 번에 읽을 양 (1초 분량)
+READ_BYTES = FRAME_BYTES * 50
+
+YTDL_OPTIONS = {
+    "format": "bestaudio/best",
+    "noplaylist": True,
+    "quiet": True,
+    "no_warnings": True,
+    "default_search": "ytsearch",
+    "source_address": "0.0.0.0",
+}
+
+
+class Track:
+    """대기열의 곡 하나. 스트림 주소 해석(resolve)은 재생 전에 미리 시작해 둘 수 있습니다."""
+
+    def __init__(self, query, requested_by):
+        self.query = query
+        self.requested_by = requested_by
+        self.info = None  # {"title", "stream_url", "webpage_url", "headers", "duration", "local"}
+        self._task = None
+        self._resolved_at = None
+
+    @property
+    def title(self):
+        return self.info["title"] if self.info else self.query
+
+    def prefetch(self):
+        # 대기열에서 오래 기다려 스트림 주소가 만료됐을 수 있으면 다시 해석합니다.
+        if self._task is None or (
+            self._resolved_at is not None and time.time() - self._resolved_at > MUSIC_RESOLVE_TTL
+        ):
+            self._resolved_at = None
+            self._task = asyncio.create_task(resolve_track(self.query))
+        return self._task
+
+    async def resolve(self):
+        self.info = await self.prefetch()
+        if self._resolved_at is None:
+            self._resolved_at = time.time()
+        return self.info
+
+    def cancel(self):
+        if self._task is not None:
+            self._task.cancel()
+
+    def cancelled(self):
+        return self._task is not None and self._task.cancelled()
+
+
+_resolve_cache = OrderedDict()  # 정규화한 검색어/URL -> (info, resolved_at)
+
+
+def local_media_path(query):
+    """`local:파일명`을 MUSIC_LOCAL_DIR 안의 실제 경로로 바꿉니다. 디렉터리 밖을 가리키면 ValueError."""
+    if not MUSIC_LOCAL_DIR:
+        raise ValueError("로컬 파일 재생이 설정되어 있지 않습니다. (MUSIC_LOCAL_DIR)")
+    base = os.path.realpath(MUSIC_LOCAL_DIR)
+    path = os.path.realpath(os.path.join(base, query[len("local:"):].strip()))
+    if os.path.commonpath([base, path]) != base or not os.path.isfile(path):
+        raise ValueError("재생할 수 있는 로컬 파일이 아닙니다.")
+    return path
+
+
+def _extract_info(target):
+    with yt_dlp.YoutubeDL(YTDL_OPTIONS) as ydl:
+        info = ydl.extract_info(target, download=False)
+    if "entries" in info:  # 검색어로 찾은 경우 첫 결과
+        entries = [entry for entry in info["entries"] if entry]
+        if not entries:
+            raise ValueError("검색 결과가 없습니다.")
+        info = entries[0]
+    return {
+        "title": info.get("title") or target,
+        "stream_url": info["url"],
+        "webpage_url": info.get("webpage_url") or target,
+        "headers": info.get("http_headers") or {},
+        "duration": info.get("duration"),
+        "local": False,
+    }
+
+
+async def _find_video_url(query):
+    """검색어를 YouTube URL로 바꿉니다. 캐시/할당량을 관리하는 검색을 먼저 쓰고, 안 되면 yt-dlp 검색에 맡깁니다."""
+    if query.startswith(("http://", "https://")):
+        return query
+    try:
+        results = await search_videos(query)
+    except (QuotaExceeded, ValueError):
+        return f"ytsearch1:{query}"
+    if not results:
+        raise ValueError("검색 결과가 없습니다.")
+    return results[0]["url"]
+
+
+async def resolve_track(query):
+    """검색어, URL 또는 `local:파일명`을 재생 정보로 해석합니다. 결과는 MUSIC_RESOLVE_TTL 동안 캐시합니다."""
+    if query.startswith("local:"):
+        path = local_media_path(query)
+        return {
+            "title": os.path.basename(path), "stream_url": path, "webpage_url": None,
+            "headers": {}, "duration": None, "local": True,
+        }
+
+    key = " ".join(query.split()).lower()
+    entry = _resolve_cache.get(key)
+    if entry is not None and time.time() - entry[1] <= MUSIC_RESOLVE_TTL:
+        _resolve_cache.move_to_end(key)
+        return entry[0]
+
+    target = await _find_video_url(query)
+    info = await asyncio.to_thread(_extract_info, target)
+    _resolve_cache[key] = (info, time.time())
+    while len(_resolve_cache) > MUSIC_RESOLVE_CACHE_SIZE:
+        _resolve_cache.popitem(last=False)
+    return info
+
+
+def ffmpeg_stream_args(info):
+    """스트림을 내려받지 않고 바로 48kHz 스테레오 PCM으로 디코딩하는 FFmpeg 인자."""
+    args = [FFMPEG_EXECUTABLE, "-loglevel", "warning", "-nostdin"]
+    if not info["local"]:
+        args += ["-reconnect", "1", "-reconnect_streamed", "1", "-reconnect_delay_max", "5"]
+        if info["headers"]:
+            args += ["-headers", "".join(f"{k}: {v}\r\n" for k, v in info["headers"].items())]
+    args += ["-i", info["stream_url"], "-vn", "-f", "s16le", "-ar", "48000", "-ac", "2", "pipe:1"]
+    return args
+
+
+class MusicPlayer:
+    """
+    길드별 음악 대기열.
+    - 재생 중에 다음 곡의 스트림 주소를 미리 해석해 두고, 지금 곡의 FFmpeg 출력이 끝나는 즉시
+      다음 곡을 믹서 버퍼 뒤에 이어 넣으므로 곡 사이가 거의 끊기지 않습니다.
+    - 오디오는 길드 믹서의 음악 레인으로 들어가며, TTS가 나오는 동안에는 믹서가 음악 음량을 줄입니다.
+    믹서 버퍼 때문에 FFmpeg에서 읽어 넣는 곡(feeding)과 실제로 들리는 곡(playing)이 잠시 다를 수 있습니다.
+    """
+
+    def __init__(self, guild):
+        self.guild = guild
+        self.queue = deque()
+        self.feeding = None
+        self.playing = None
+        self._process = None
+        self._skips = 0  # skip()할 때마다 증가해 이미 읽은 이전 곡 오디오를 버리게 합니다.
+        self._task = None
+
+    def add(self, track):
+        max_queue = guild_settings.limit(self.guild.id, "music_queue", MUSIC_MAX_QUEUE)
+        if len(self.queue) >= max_queue:
+            raise ValueError(f"대기열이 가득 찼습니다. (최대 {max_queue}곡)")
+        self.queue.append(track)
+        if len(self.queue) == 1:
+            track.prefetch()
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run(), name=f"music-player-{self.guild.id}")
+
+    @property
+    def current(self):
+        return self.playing or self.feeding
+
+    def skip(self):
+        """지금 들리는 곡을 건너뜁니다. 건너뛴 곡이 있으면 True."""
+        if self.current is None:
+            return False
+        if self.playing is not None and self.feeding is not None and self.feeding is not self.playing:
+            # 다음 곡을 미리 버퍼에 넣던 중이었다면 그 곡은 처음부터 다시 넣도록 대기열 앞에 되돌립니다.
+            self.queue.appendleft(self.feeding)
+        self.playing = None
+        self._skips += 1
+        self._kill_process()
+        mixer = guild_mixers.get(self.guild.id)
+        if mixer is not None:
+            mixer.clear(MUSIC_LANE)
+        return True
+
+    def stop(self):
+        """대기열을 비우고 재생을 멈춥니다."""
+        self.skip()
+        while self.queue:
+            self.queue.popleft().cancel()
+
+    def _kill_process(self):
+        if self._process is not None and self._process.returncode is None:
+            try:
+                self._process.kill()
+            except ProcessLookupError:
+                pass  # 이미 끝난 프로세스
+
+    async def _run(self):
+        try:
+            while self.queue:
+                track = self.feeding = self.queue.popleft()
+                skips = self._skips
+                try:
+                    await track.resolve()
+                except Exception as e:
+                    print(f"곡 정보를 가져오지 못했습니다 ({track.query}): {e}")
+                    continue
+                if self._skips != skips:
+                    continue  # 주소를 해석하는 동안 /skip된 경우
+                if self.queue:
+                    self.queue[0].prefetch()  # 재생하는 동안 다음 곡 주소를 미리 해석
+                mixer = get_mixer(self.guild)
+                if mixer is None:
+                    break  # 음성 채널 연결이 끊긴 경우
+                mixer.lane(MUSIC_LANE).gain = MUSIC_VOLUME
+                await self._stream(track, mixer, skips)
+        finally:
+            self.feeding = None
+
+    def _started(self, track):
+        self.playing = track
+
+    def _finished(self, track):
+        if self.playing is track:
+            self.playing = None
+
+    async def _stream(self, track, mixer, skips):
+        start = time.perf_counter()
+        self._process = await asyncio.create_subprocess_exec(
+            *ffmpeg_stream_args(track.info),
+            stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.DEVNULL,
+        )
+        FFMPEG_STARTUP.observe(time.perf_counter() - start, use="music")
+        try:
+            pending = b""
+            on_start = lambda: self._started(track)
+            while True:
+                chunk = await self._process.stdout.read(READ_BYTES)
+                if not chunk or self._skips != skips:
+                    break
+                pending += chunk
+                usable = len(pending) - len(pending) % FRAME_BYTES
+                if usable:
+                    if not await mixer.feed(MUSIC_LANE, pending[:usable], on_start=on_start):
+                        return  # /skip 또는 믹서 종료
+                    on_start = None
+                pending = pending[usable:]
+            if self._skips == skips:
+                # 곡 끝 표시: 마지막 프레임까지 재생되면 playing을 비웁니다.
+                await mixer.feed(MUSIC_LANE, pending, on_start=on_start, on_end=lambda: self._finished(track))
+        finally:
+            if self._process.stdout.at_eof():
+                await self._process.wait()
+            self._kill_process()
+            await self._process.wait()
+            self._process = None
+
+
+# 길드별 음악 플레이어
+music_players = {}
+
+
+def get_music_player(guild):
+    player = music_players.get(guild.id)
+    if player is None:
+        player = MusicPlayer(guild)
+        music_players[guild.id] = player
+    return player
+
+
+def stop_music(guild):
+    player = music_players.pop(guild.id, None)
+    if player is not None:
+        player.stop()
+
+
+async def play_music(ctx, query):
+    """검색어/URL/`local:파일명`을 대기열에 추가합니다. 봇이 /vc로 음성 채널에 들어와 있어야 합니다."""
+    if not query:
+        await ctx.send("재생할 곡의 검색어나 URL을 입력해주세요.")
+        return
+    if ctx.voice_client is None:
+        await ctx.send("먼저 /vc로 봇을 음성 채널에 불러주세요.")
+        return
+    if FFMPEG_EXECUTABLE is None:
+        await ctx.send("FFmpeg 실행 파일을 찾을 수 없습니다. 시스템에 FFmpeg가 설치되어 있는지 확인해주세요.")
+        return
+
+    track = Track(query, str(ctx.author))
+    player = get_music_player(ctx.guild)
+    try:
+        if query.startswith("local:"):
+            local_media_path(query)
+        player.add(track)
+    except ValueError as e:
+        await ctx.send(str(e))
+        return
+
+    # 검색어/URL을 곡 제목으로 해석한 뒤에 알려야 /queue, 재생 중 표시와 같은 제목이 됩니다.
+    message = await ctx.send(f"곡을 찾는 중입니다: **{query}**")
+    try:
+        await track.resolve()
+    except asyncio.CancelledError:
+        if not track.cancelled():
+            raise
+        await message.edit(content=f"대기열이 비워져 추가하지 않았습니다: **{query}**")
+        return
+    except Exception as e:
+        if track in player.queue:
+            player.queue.remove(track)
+        await message.edit(content=f"곡 정보를 가져오지 못했습니다: **{query}** ({e})")
+        return
+    if track is player.current:
+        await message.edit(content=f"재생합니다: **{track.title}**")
+    elif track in player.queue:
+        position = list(player.queue).index(track) + 1
+        await message.edit(content=f"대기열 {position}번째에 추가했습니다: **{track.title}**")
+    else:
+        await message.edit(content=f"대기열에 추가했습니다: **{track.title}**")
+
+
+async def skip_music(ctx):
+    player = music_players.get(ctx.guild.id)
+    if player is not None and player.skip():
+        await ctx.send("지금 곡을 건너뛰었습니다.")
+    else:
+        await ctx.send("현재 재생 중인 곡이 없습니다.")
+
+
+async def show_music_queue(ctx):
+    player = music_players.get(ctx.guild.id)
+    if player is None or (player.current is None and not player.queue):
+        await ctx.send("대기열이 비어 있습니다.")
+        return
+    lines = []
+    upcoming = list(player.queue)
+    if player.current is not None:
+        lines.append(f"▶ **{player.current.title}** ({player.current.requested_by})")
+        if player.feeding is not None and player.feeding is not player.current:
+            upcoming.insert(0, player.feeding)
+    for i, track in enumerate(upcoming, 1):
+        lines.append(f"{i}. {track.title} ({track.requested_by})")
+    await ctx.send("**음악 대기열**\n" + "\n".join(lines))
@@ -1,13 +1,175 @@
+import os
 import json
+import time
+import asyncio
+
+from meeting_index import append_index, pack_entry, record_timestamp, index_path, catch_up_index
+from metrics import MEETING_LOG_MESSAGES, MEETING_LOG_BYTES
+
+# 회의 로그 저장 위치: json_data/meetings/{guild_id}/{channel_id}.ndjson
+MEETING_LOG_DIR = "json_data/meetings"
+# 이만큼 메시지가 모이거나 MEETING_FLUSH_INTERVAL초가 지나면 한 번에 기록합니다.
+MEETING_FLUSH_SIZE = int(os.getenv("MEETING_FLUSH_SIZE", "50"))
+MEETING_FLUSH_INTERVAL = float(os.getenv("MEETING_FLUSH_INTERVAL", "1.0"))
+# fsync 정책: "batch"(기록할 때마다), "interval"(MEETING_FSYNC_INTERVAL초마다), "never"(OS에 맡김)
+MEETING_FSYNC = os.getenv("MEETING_FSYNC", "interval")
+MEETING_FSYNC_INTERVAL = float(os.getenv("MEETING_FSYNC_INTERVAL", "5.0"))
+# 기록 대기열 최대 길이 (가득 차면 save_conversation_data_json이 잠시 기다립니다)
+MEETING_QUEUE_SIZE = int(os.getenv("MEETING_QUEUE_SIZE", "10000"))
+
+
+def meeting_log_path(guild_id, channel_id):
+    """길드/채널별 회의 로그 파일 경로를 반환합니다."""
+    return os.path.join(MEETING_LOG_DIR, str(guild_id), f"{channel_id}.ndjson")
+
+
+class MeetingLogWriter:
+    """
+    회의 채널 메시지를 백그라운드 태스크에서 모아서 기록하는 작성기.
+    - on_message는 큐에 넣기만 하고 바로 돌아갑니다.
+    - 메시지 수(flush_size) 또는 시간(flush_interval) 기준으로 모아서 길드/채널별 파일에 한 번에 씁니다.
+    - 파일 쓰기는 별도 스레드에서 실행해 이벤트 루프를 막지 않습니다.
+    """
+
+    def __init__(self, flush_size=MEETING_FLUSH_SIZE, flush_interval=MEETING_FLUSH_INTERVAL,
+                 fsync=MEETING_FSYNC, fsync_interval=MEETING_FSYNC_INTERVAL, queue_size=MEETING_QUEUE_SIZE):
+        self.flush_size = flush_size
+        self.flush_interval = flush_interval
+        self.fsync = fsync
+        self.fsync_interval = fsync_interval
+        self.queue_size = queue_size
+        self._queue = None
+        self._task = None
+        self._last_fsync = 0.0
+        # 이번 실행에서 색인을 맞춘 로그 경로. 색인 파일은 이 작성기만 씁니다. (meeting_index.read_range는 읽기만 함)
+        self._indexed = set()
+        self.written = 0
+
+    def start(self):
+        """현재 이벤트 루프에서 기록 태스크를 시작합니다. 이미 실행 중이면 아무것도 하지 않습니다."""
+        if self._task is None or self._task.done():
+            self._queue = asyncio.Queue(maxsize=self.queue_size)
+            self._task = asyncio.create_task(self._run(), name="meeting-log-writer")
+
+    async def write(self, guild_id, channel_id, record):
+        self.start()
+        await self._queue.put((meeting_log_path(guild_id, channel_id), record))
+
+    async def flush(self):
+        """지금까지 넣은 메시지가 모두 파일에 기록될 때까지 기다립니다."""
+        if self._task is None or self._task.done():
+            return
+        done = asyncio.get_running_loop().create_future()
+        await self._queue.put((None, done))
+        await done
+
+    async def clear(self, guild_id, channel_id):
+        """채널의 회의 로그와 요약 체크포인트를 삭제합니다."""
+        await self.flush()
+        path = meeting_log_path(guild_id, channel_id)
+        await asyncio.to_thread(_remove_log_files, path)
+        self._indexed.discard(path)
+
+    async def close(self):
+        """남은 메시지를 모두 기록하고 태스크를 종료합니다. (봇 종료 시 호출)"""
+        if self._task is None or self._task.done():
+            return
+        await self.flush()
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch, waiters = [], []
+            item = await self._queue.get()
+            deadline = loop.time() + self.flush_interval
+            while True:
+                path, payload = item
+                if path is None:
+                    waiters.append(payload)
+                    break  # flush 요청은 모인 것을 바로 기록합니다.
+                batch.append(item)
+                if len(batch) >= self.flush_size:
+                    break
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(self._queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+
+            if batch:
+                try:
+                    await asyncio.to_thread(self._write_batch, batch)
+                    self.written += len(batch)
+                except Exception as e:
+                    print(f"회의 로그 기록 중 오류 발생: {e}")
+            for waiter in waiters:
+                if not waiter.done():
+                    waiter.set_result(None)
+
+    def _write_batch(self, batch):
+        by_path = {}
+        for path, record in batch:
+            by_path.setdefault(path, []).append(record)
+
+        now = time.monotonic()
+        do_fsync = self.fsync == "batch" or (
+            self.fsync == "interval" and now - self._last_fsync >= self.fsync_interval
+        )
+        for path, records in by_path.items():
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            if path not in self._indexed:
+                # 색인 없이 쌓인 기존 로그나, 로그만 쓰고 색인을 쓰기 전에 종료된 줄을 먼저 색인합니다.
+                catch_up_index(path)
+                self._indexed.add(path)
+            with open(path, "ab") as f:
+                # 줄마다 시작 위치를 색인(meeting_index.py)에 남겨 범위 요약 때 바로 찾아갈 수 있게 합니다.
+                offset = f.tell()
+                lines, entries = [], []
+                for record in records:
+                    line = (json.dumps(record, ensure_ascii=False) + "\n").encode("utf-8")
+                    entries.append(pack_entry(record_timestamp(record), offset))
+                    lines.append(line)
+                    offset += len(line)
+                f.write(b"".join(lines))
+                f.flush()
+                if do_fsync:
+                    os.fsync(f.fileno())
+            append_index(path, entries)
+            MEETING_LOG_MESSAGES.inc(len(records))
+            MEETING_LOG_BYTES.inc(sum(len(line) for line in lines))
+        if do_fsync:
+            self._last_fsync = now
+
+
+def _remove_log_files(path):
+    # 색인과 요약 체크포인트(gpt/meeting_summary.py)도 함께 지웁니다.
+    for target in (path, index_path(path), path + ".summary.json"):
+        if os.path.exists(target):
+            os.remove(target)
+
+
+# 봇 전체에서 공유하는 회의 로그 작성기
+meeting_log_writer = MeetingLogWriter()
 
 
 async def save_conversation_data_json(message):
-    """회의 채널의 메시지를 JSON 형식으로 저장하는 함수 (NDJSON 형식)"""
+    """회의 채널의 메시지를 길드/채널별 NDJSON 파일에 저장하도록 작성기에 넘깁니다."""
     message_data = {
         "timestamp": message.created_at.isoformat(),
         "author": str(message.author),
         "content": message.content
     }
-    with open("json_data/meeting_data.json", "a", encoding="utf-8") as f:
-        json.dump(message_data, f, ensure_ascii=False)
-        f.write("\n")  # 각 메시지를 새로운 줄에 기록
\ No newline at end of file
+    await meeting_log_writer.write(message.guild.id, message.channel.id, message_data)
+
+
+async def clear_meeting_log(guild_id, channel_id):
+    """채널의 회의 로그를 초기화합니다."""
+    await meeting_log_writer.clear(guild_id, channel_id)
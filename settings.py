@@ -0,0 +1,177 @@
+import os
+import json
+import asyncio
+import threading
+
+SETTINGS_FILE = 'json_data/guild_settings.json'
+# 설정이 바뀐 뒤 이 시간(초) 동안 더 바뀌지 않으면 한 번에 파일로 저장합니다.
+SETTINGS_SAVE_DELAY = float(os.getenv("SETTINGS_SAVE_DELAY", "2.0"))
+
+# 봇 기능별 채널. 설정되지 않은 서버는 예전처럼 이 이름의 채널을 찾아 등록합니다.
+FEATURE_CHANNEL_NAMES = {
+    "tts": "tts",
+    "meeting": "회의",
+    "chatgpt": "chatgpt",
+}
+# /setlimit으로 바꿀 수 있는 길드별 제한 값과 허용 범위
+LIMITS = {
+    "tts_queue": (1, 100),
+    "music_queue": (1, 200),
+}
+# 이전 버전에서 쓰던 설정 파일 (처음 실행할 때 한 번 옮겨옵니다)
+LEGACY_LANGUAGES_FILE = 'json_data/guild_languages.json'
+LEGACY_BACKENDS_FILE = 'json_data/guild_tts_backends.json'
+
+
+def _load_json(path):
+    if not os.path.exists(path):
+        return {}
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+class GuildSettings:
+    """
+    길드별 설정 저장소.
+    - 모든 설정은 메모리에 두고 읽으므로 메시지마다 파일을 읽지 않습니다.
+    - 바뀐 설정은 save_delay초 동안 모았다가 임시 파일에 쓴 뒤 교체(os.replace)하는 방식으로 한 번에 저장합니다.
+    - 채널 ID -> (길드 ID, 기능) 표를 유지해 on_message에서 채널 이름 비교 없이 바로 찾습니다.
+
+    길드 설정 형식: {"channels": {기능: 채널 ID}, "tts_language": str, "tts_backend": str, "limits": {이름: 값}}
+    """
+
+    def __init__(self, path=SETTINGS_FILE, save_delay=SETTINGS_SAVE_DELAY):
+        self.path = path
+        self.save_delay = save_delay
+        self._lock = threading.Lock()
+        self._save_handle = None
+        self.dirty = False
+        if os.path.exists(path):
+            self._guilds = _load_json(path)
+        else:
+            self._guilds = self._migrate_legacy()
+        self._routes = {}
+        self._rebuild_routes()
+
+    def _migrate_legacy(self):
+        guilds = {}
+        for guild_id, language in _load_json(LEGACY_LANGUAGES_FILE).items():
+            guilds.setdefault(guild_id, {})["tts_language"] = language
+        for guild_id, backend in _load_json(LEGACY_BACKENDS_FILE).items():
+            guilds.setdefault(guild_id, {})["tts_backend"] = backend
+        if guilds:
+            self._write(guilds)
+        return guilds
+
+    def _rebuild_routes(self):
+        self._routes = {
+            int(channel_id): (int(guild_id), feature)
+            for guild_id, config in self._guilds.items()
+            for feature, channel_id in config.get("channels", {}).items()
+            if channel_id is not None
+        }
+
+    # ---- 조회 ----
+
+    def get(self, guild_id, key, default=None):
+        return self._guilds.get(str(guild_id), {}).get(key, default)
+
+    def limit(self, guild_id, name, default):
+        return self._guilds.get(str(guild_id), {}).get("limits", {}).get(name, default)
+
+    def route(self, channel_id):
+        """채널에 연결된 기능 이름을 반환합니다. 없으면 None."""
+        entry = self._routes.get(channel_id)
+        return entry[1] if entry else None
+
+    def channel_id(self, guild_id, feature):
+        return self._guilds.get(str(guild_id), {}).get("channels", {}).get(feature)
+
+    def channels(self, guild_id):
+        return dict(self._guilds.get(str(guild_id), {}).get("channels", {}))
+
+    # ---- 변경 ----
+
+    def set(self, guild_id, **values):
+        self._guilds.setdefault(str(guild_id), {}).update(values)
+        self._changed()
+
+    def set_limit(self, guild_id, name, value):
+        self._guilds.setdefault(str(guild_id), {}).setdefault("limits", {})[name] = value
+        self._changed()
+
+    def set_channel(self, guild_id, feature, channel_id):
+        """기능 채널을 지정합니다. channel_id가 None이면 해제합니다. (해제한 기능은 이름으로 다시 찾지 않습니다)"""
+        channels = self._guilds.setdefault(str(guild_id), {}).setdefault("channels", {})
+        if channel_id is None:
+            channels[feature] = None
+        else:
+            # 한 채널은 한 기능에만 연결합니다.
+            for other, other_id in list(channels.items()):
+                if other_id == channel_id and other != feature:
+                    del channels[other]
+            channels[feature] = channel_id
+        self._rebuild_routes()
+        self._changed()
+
+    def replace_channel(self, old_channel_id, new_channel_id):
+        """채널을 복제해 새로 만든 경우(/clearChat 등) 기능 연결을 새 채널로 옮깁니다."""
+        entry = self._routes.get(old_channel_id)
+        if entry is not None:
+            self.set_channel(entry[0], entry[1], new_channel_id)
+
+    def discover_channels(self, guild):
+        """기능 채널이 지정되지 않은 서버에서 예전 이름('tts', '회의', 'chatgpt')의 채널을 찾아 등록합니다."""
+        configured = self.channels(guild.id)
+        for feature, name in FEATURE_CHANNEL_NAMES.items():
+            if feature in configured:
+                continue
+            channel = next(
+                (c for c in guild.text_channels if c.name == name and c.id not in self._routes), None
+            )
+            if channel is not None:
+                self.set_channel(guild.id, feature, channel.id)
+
+    # ---- 저장 ----
+
+    def _changed(self):
+        self.dirty = True
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            self.save()  # 이벤트 루프 밖(스크립트 등)에서는 바로 저장합니다.
+            return
+        if self._save_handle is not None:
+            self._save_handle.cancel()
+        self._save_handle = loop.call_later(self.save_delay, lambda: loop.create_task(self.flush()))
+
+    def _write(self, guilds):
+        with self._lock:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            with open(self.path + ".tmp", 'w', encoding='utf-8') as f:
+                json.dump(guilds, f, ensure_ascii=False, indent=4)
+            os.replace(self.path + ".tmp", self.path)
+
+    def save(self):
+        if not self.dirty:
+            return
+        self.dirty = False
+        self._write(json.loads(json.dumps(self._guilds)))
+
+    async def flush(self):
+        """대기 중인 저장을 지금 합니다. (봇 종료 시 호출)"""
+        if self._save_handle is not None:
+            self._save_handle.cancel()
+            self._save_handle = None
+        if not self.dirty:
+            return
+        self.dirty = False
+        # 이벤트 루프에서 복사본을 만든 뒤 파일 쓰기만 스레드에서 합니다.
+        snapshot = json.loads(json.dumps(self._guilds))
+        await asyncio.to_thread(self._write, snapshot)
+
+
+# 봇 전체에서 공유하는 길드 설정
+guild_settings = GuildSettings()
@@ -0,0 +1,237 @@
+import os
+import sys
+import time
+import pstats
+import asyncio
+import cProfile
+import weakref
+import threading
+import traceback
+from io import StringIO
+from collections import Counter
+
+# 이벤트 루프 멈춤 감지 (기본 꺼짐). 켜면 asyncio 콜백 실행 시간을 재고, 오래 걸리는 동안 루프 스레드의 스택을 채집합니다.
+STALL_DETECTOR = os.getenv("STALL_DETECTOR", "0") == "1"
+# 콜백 하나가 이 시간(초) 이상 루프를 잡고 있으면 멈춤으로 기록합니다.
+STALL_THRESHOLD = float(os.getenv("STALL_THRESHOLD", "0.1"))
+# 멈춤 보고서를 파일로 쓰는 간격(초)
+STALL_REPORT_INTERVAL = float(os.getenv("STALL_REPORT_INTERVAL", "300"))
+PROFILE_DIR = "json_data/profiles"
+STALL_REPORT_FILE = os.path.join(PROFILE_DIR, "stall_report.txt")
+
+# 스택에서 보여줄 최대 프레임 수
+STACK_DEPTH = 12
+
+
+def _format_stack(frame, depth=STACK_DEPTH):
+    """프레임의 호출 스택을 안쪽 depth개만 ('파일:줄 함수', ...) 튜플로 만듭니다. 이벤트 루프 자체의 프레임은 뺍니다."""
+    summary = traceback.extract_stack(frame)
+    for i in range(len(summary) - 1, -1, -1):
+        if summary[i].name == "_run" and summary[i].filename.endswith(os.path.join("asyncio", "events.py")):
+            summary = summary[i + 1:]
+            break
+    summary = summary[-depth:]
+    return tuple(f"{os.path.relpath(entry.filename)}:{entry.lineno} {entry.name}" for entry in summary)
+
+
+def sample_stacks(thread_id, seconds, interval=0.005):
+    """
+    thread_id 스레드의 스택을 interval초마다 seconds초 동안 채집해 {스택: 횟수}를 반환합니다.
+    (별도 스레드에서 호출합니다. flamegraph.pl 등에 넣을 수 있는 collapsed 형식으로 저장할 수 있습니다)
+    """
+    stacks = Counter()
+    deadline = time.monotonic() + seconds
+    while time.monotonic() < deadline:
+        frame = sys._current_frames().get(thread_id)
+        if frame is not None:
+            stacks[_format_stack(frame, depth=64)] += 1
+        time.sleep(interval)
+    return stacks
+
+
+class StallDetector:
+    """
+    이벤트 루프 멈춤 감지기.
+    - asyncio Handle._run을 감싸 콜백마다 실행 시간을 재고, threshold 이상이면 멈춤으로 기록합니다.
+    - 감시 스레드가 콜백이 threshold를 넘겨 실행 중인 동안 루프 스레드의 스택을 채집해 어디서 막혔는지 남깁니다.
+    - 멈춤은 그 콜백을 실행한 태스크의 라벨(명령어 이름, on_message 분기 등)로 묶습니다.
+      라벨이 없으면 태스크 이름(discord.py 이벤트 태스크는 'discord.py: on_message' 등)을 씁니다.
+    """
+
+    def __init__(self, threshold=STALL_THRESHOLD, report_interval=STALL_REPORT_INTERVAL, report_file=STALL_REPORT_FILE):
+        self.threshold = threshold
+        self.sample_interval = max(0.01, threshold / 2)
+        self.report_interval = report_interval
+        self.report_file = report_file
+        self.stalls = {}  # 라벨 -> {"count", "total", "max", "stacks": Counter}
+        self.installed = False
+        self.loop = None
+        self.thread_id = None
+        self._labels = weakref.WeakKeyDictionary()  # 태스크 -> 라벨
+        self._running_since = None  # 지금 실행 중인 콜백의 시작 시각
+        self._samples = []  # (콜백 시작 시각, 스택)
+        self._original_run = None
+        self._stop = threading.Event()
+        self._report_task = None
+
+    # ---- 라벨 ----
+
+    def label_task(self, label):
+        """현재 태스크에 라벨을 붙입니다. 설치되지 않았어도 부담 없이 부를 수 있습니다."""
+        task = asyncio.current_task()
+        if task is not None:
+            self._labels[task] = label
+
+    def _label(self, handle):
+        callback = handle._callback
+        task = getattr(callback, "__self__", None)
+        if isinstance(task, asyncio.Task):
+            label = self._labels.get(task)
+            if label is not None:
+                return label
+            return f"{task.get_name()} ({getattr(task.get_coro(), '__qualname__', '?')})"
+        return getattr(callback, "__qualname__", repr(callback))
+
+    # ---- 설치 ----
+
+    def install(self, loop):
+        if self.installed:
+            return
+        self.loop = loop
+        self.thread_id = threading.get_ident()
+        self._original_run = original_run = asyncio.events.Handle._run
+        detector = self
+
+        def _run(handle):
+            if handle._loop is not detector.loop:
+                return original_run(handle)
+            start = time.perf_counter()
+            detector._running_since = start
+            try:
+                return original_run(handle)
+            finally:
+                detector._running_since = None
+                duration = time.perf_counter() - start
+                if duration >= detector.threshold:
+                    detector._record(handle, start, duration)
+
+        asyncio.events.Handle._run = _run
+        self.installed = True
+        self._stop.clear()
+        threading.Thread(target=self._watch, name="stall-watchdog", daemon=True).start()
+        self._report_task = loop.create_task(self._report_loop())
+        print(f"이벤트 루프 멈춤 감지를 켰습니다. (기준 {self.threshold * 1000:.0f}ms, 보고서 {self.report_file})")
+
+    async def uninstall(self):
+        """감지를 끄고 마지막 보고서를 씁니다."""
+        if not self.installed:
+            return
+        asyncio.events.Handle._run = self._original_run
+        self.installed = False
+        self._stop.set()
+        if self._report_task is not None:
+            self._report_task.cancel()
+        await asyncio.to_thread(self.write_report)
+
+    def _watch(self):
+        """감시 스레드: 콜백이 threshold를 넘겨 실행 중이면 루프 스레드의 스택을 채집합니다."""
+        while not self._stop.wait(self.sample_interval):
+            since = self._running_since
+            if since is None or time.perf_counter() - since < self.threshold:
+                continue
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is not None:
+                self._samples.append((since, _format_stack(frame)))
+
+    def _record(self, handle, start, duration):
+        samples = [stack for since, stack in self._samples if since == start]
+        self._samples.clear()
+        if not samples:
+            # 채집 전에 끝난 짧은 멈춤은 태스크가 다음으로 멈춘 위치라도 남깁니다.
+            task = getattr(handle._callback, "__self__", None)
+            if isinstance(task, asyncio.Task) and not task.done():
+                frames = task.get_stack(limit=1)
+                if frames:
+                    samples = [_format_stack(frames[0]) + ("(멈춤이 끝난 뒤 위치)",)]
+        label = self._label(handle)
+        entry = self.stalls.setdefault(label, {"count": 0, "total": 0.0, "max": 0.0, "stacks": Counter()})
+        entry["count"] += 1
+        entry["total"] += duration
+        entry["max"] = max(entry["max"], duration)
+        entry["stacks"].update(samples)
+
+    # ---- 보고서 ----
+
+    def format_report(self, limit=10):
+        if not self.stalls:
+            return f"{self.threshold * 1000:.0f}ms 이상 이벤트 루프를 멈춘 콜백이 없습니다."
+        lines = [f"이벤트 루프 멈춤 ({self.threshold * 1000:.0f}ms 이상), 합계 시간 순"]
+        ranked = sorted(self.stalls.items(), key=lambda item: item[1]["total"], reverse=True)
+        for label, entry in ranked[:limit]:
+            lines.append(
+                f"- {label}: {entry['count']}회, 합계 {entry['total']:.2f}s, 최대 {entry['max'] * 1000:.0f}ms"
+            )
+            for stack, count in entry["stacks"].most_common(1):
+                lines.append(f"    가장 많이 채집된 스택 ({count}회):")
+                lines.extend(f"      {frame}" for frame in stack)
+        return "\n".join(lines)
+
+    def write_report(self):
+        os.makedirs(os.path.dirname(self.report_file), exist_ok=True)
+        with open(self.report_file + ".tmp", "w", encoding="utf-8") as f:
+            f.write(time.strftime("%Y-%m-%d %H:%M:%S") + "\n" + self.format_report(limit=50) + "\n")
+        os.replace(self.report_file + ".tmp", self.report_file)
+
+    async def _report_loop(self):
+        while True:
+            await asyncio.sleep(self.report_interval)
+            try:
+                await asyncio.to_thread(self.write_report)
+            except Exception as e:
+                print(f"멈춤 보고서를 쓰지 못했습니다: {e}")
+
+
+# ---- 실행 중인 봇 프로파일링 ----
+
+async def dump_cprofile(seconds, directory=PROFILE_DIR, top=15):
+    """
+    이벤트 루프 스레드를 seconds초 동안 cProfile로 측정해 .prof 파일로 저장합니다.
+    (파일 경로, 누적 시간 상위 top개 함수 요약)을 반환합니다.
+    """
+    profile = cProfile.Profile()
+    profile.enable()
+    try:
+        await asyncio.sleep(seconds)
+    finally:
+        profile.disable()
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f"cprofile-{time.strftime('%Y%m%d-%H%M%S')}.prof")
+    profile.dump_stats(path)
+    stream = StringIO()
+    pstats.Stats(profile, stream=stream).sort_stats("cumulative").print_stats(top)
+    return path, stream.getvalue()
+
+
+async def dump_sampling_profile(seconds, directory=PROFILE_DIR, interval=0.005, top=5):
+    """
+    이벤트 루프 스레드의 스택을 seconds초 동안 채집해 collapsed 형식(flamegraph용) 파일로 저장합니다.
+    (파일 경로, 가장 많이 채집된 스택 상위 top개 요약)을 반환합니다.
+    """
+    stacks = await asyncio.to_thread(sample_stacks, threading.get_ident(), seconds, interval)
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f"sample-{time.strftime('%Y%m%d-%H%M%S')}.folded")
+    with open(path, "w", encoding="utf-8") as f:
+        for stack, count in stacks.items():
+            f.write(";".join(stack) + f" {count}\n")
+    total = sum(stacks.values()) or 1
+    # 루프가 할 일 없이 이벤트를 기다리던(selector.select) 표본은 따로 셉니다.
+    idle = sum(count for stack, count in stacks.items() if stack and stack[-1].endswith(" select"))
+    lines = [f"대기(idle) {idle / total:.0%}"]
+    busy = Counter({stack: count for stack, count in stacks.items() if not (stack and stack[-1].endswith(" select"))})
+    for stack, count in busy.most_common(top):
+        lines.append(f"{count / total:.0%} ({count}회) {stack[-1] if stack else '?'}")
+    return path, "\n".join(lines)
+
+
+# 봇 전체에서 공유하는 멈춤 감지기 (STALL_DETECTOR=1일 때 설치합니다)
+stall_detector = StallDetector()
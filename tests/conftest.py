@@ -0,0 +1,10 @@
+import os
+import sys
+import tempfile
+
+# 저장소 루트의 모듈(gpt, fine_tuning 등)을 불러올 수 있게 합니다.
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# gpt.gpt_batch를 불러올 때 만드는 대화 기록 DB와 Celery 설정이 작업 디렉터리나 Redis를 건드리지 않게 합니다.
+os.environ.setdefault("CONVERSATIONS_DB", os.path.join(tempfile.mkdtemp(), "conversations.db"))
+os.environ.setdefault("CELERY_EAGER", "1")
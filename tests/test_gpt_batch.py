@@ -0,0 +1,99 @@
+import os
+import json
+
+import pytest
+
+from gpt import gpt_batch, meeting_summary
+from gpt.gpt_batch import LocalBatchClient, apply_batch_results, build_batch_requests, run_bulk_summaries
+from gpt.meeting_summary import MAP_PROMPT, REDUCE_PROMPT, SINGLE_PROMPT, load_checkpoint, save_checkpoint
+
+
+@pytest.fixture(autouse=True)
+def fake_tokens(monkeypatch):
+    # tiktoken 없이도 구간이 나뉘도록 "길게"가 들어간 줄만 크게 셉니다.
+    monkeypatch.setattr(meeting_summary, "count_tokens", lambda text: 1000 if "길게" in text else 10)
+
+
+def fake_complete(prompt):
+    """프롬프트 종류와 마지막 줄의 내용으로 결과를 만들어 어느 요청의 답인지 알 수 있게 합니다."""
+    for prefix, tag in ((SINGLE_PROMPT, "단일"), (MAP_PROMPT, "부분"), (REDUCE_PROMPT, "합침")):
+        if prompt.startswith(prefix):
+            body = prompt[len(prefix):]
+            break
+    else:
+        raise AssertionError(prompt)
+    if "실패" in body:
+        raise RuntimeError("요청 실패")
+    if tag == "합침":
+        return "합침[" + " | ".join(body.splitlines()) + "]"
+    return f"{tag}:{body.splitlines()[-1].rsplit(': ', 1)[-1]}"
+
+
+def write_log(root, guild_id, channel_id, contents):
+    path = root / guild_id / f"{channel_id}.ndjson"
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "a", encoding="utf-8") as f:
+        for i, content in enumerate(contents):
+            f.write(json.dumps({"timestamp": 1000 + i, "author": "user", "content": content}, ensure_ascii=False) + "\n")
+    return str(path)
+
+
+def run(tmp_path):
+    client = LocalBatchClient(fake_complete, directory=str(tmp_path / "batch"))
+    return run_bulk_summaries(client, complete=fake_complete, state_file=str(tmp_path / "batch" / "state.json"),
+                              poll_interval=0, log_root=str(tmp_path / "meetings"))
+
+
+def test_results_map_back_to_their_logs(tmp_path):
+    root = tmp_path / "meetings"
+    short = write_log(root, "1", "10", ["안녕하세요", "회의 시작"])
+    long = write_log(root, "1", "20", ["길게 하나", "길게 둘", "길게 셋"])
+    resumed = write_log(root, "2", "30", ["지난 회의"])
+    save_checkpoint(resumed, os.path.getsize(resumed), "이전 요약")
+    write_log(root, "2", "30", ["이어서 회의"])
+
+    summaries = run(tmp_path)
+
+    assert summaries == {
+        ("1", "10"): "단일:회의 시작",
+        # 구간 결과는 custom_id의 구간 번호 순서대로 합칩니다.
+        ("1", "20"): "합침[부분:길게 둘 | 부분:길게 셋]",
+        # 이전 요약이 있으면 단일 요약 대신 이전 요약 뒤에 이어 합칩니다.
+        ("2", "30"): "합침[이전 요약 | 부분:이어서 회의]",
+    }
+    for key, path in ((("1", "10"), short), (("1", "20"), long), (("2", "30"), resumed)):
+        assert load_checkpoint(path) == {"offset": os.path.getsize(path), "summary": summaries[key]}
+    assert not os.path.exists(tmp_path / "batch" / "state.json")
+    assert run(tmp_path) == {}  # 새 대화가 없으면 배치를 만들지 않습니다.
+
+
+def test_failed_chunk_leaves_checkpoint_for_next_run(tmp_path):
+    root = tmp_path / "meetings"
+    ok = write_log(root, "1", "10", ["정상 회의"])
+    broken = write_log(root, "1", "20", ["길게 하나", "길게 실패", "길게 셋"])
+
+    summaries = run(tmp_path)
+
+    assert summaries == {("1", "10"): "단일:정상 회의"}
+    assert load_checkpoint(ok)["offset"] == os.path.getsize(ok)
+    assert load_checkpoint(broken) == {"offset": 0, "summary": None}
+
+
+def test_out_of_order_results_and_moved_checkpoints(tmp_path):
+    root = tmp_path / "meetings"
+    first = write_log(root, "1", "10", ["길게 가", "길게 나", "길게 다", "길게 라"])
+    moved = write_log(root, "1", "20", ["다른 회의"])
+    input_file = str(tmp_path / "input.jsonl")
+    logs = build_batch_requests(input_file, gpt_batch.scan_meeting_logs(str(root)))
+
+    client = LocalBatchClient(fake_complete, directory=str(tmp_path))
+    output_file = client.status(client.submit(input_file, "run"))[1]
+    results = list(client.iter_results(output_file))
+    # 그 사이 /mtcl이 먼저 요약해 체크포인트가 움직인 로그는 덮어쓰지 않습니다.
+    save_checkpoint(moved, os.path.getsize(moved), "/mtcl 요약")
+
+    summaries = apply_batch_results(reversed(results), logs, complete=fake_complete)
+
+    assert summaries == {("1", "10"): "합침[부분:길게 나 | 부분:길게 라]"}
+    assert load_checkpoint(moved)["summary"] == "/mtcl 요약"
+    assert load_checkpoint(first)["offset"] == os.path.getsize(first)
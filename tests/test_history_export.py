@@ -0,0 +1,74 @@
+import json
+import asyncio
+
+from fine_tuning.history_export import FakeHistoryProvider, Checkpoint, export_history, _last_written_id
+
+
+def make_records(channel_id, count, authors=(1, 2)):
+    return [
+        {
+            "message_id": i,
+            "channel_id": channel_id,
+            "author_id": authors[i % len(authors)],
+            "author_name": f"user{authors[i % len(authors)]}",
+            "content": f"메시지 {i}",
+            "created_at": "2026-01-01T00:00:00+00:00",
+        }
+        for i in range(1, count + 1)
+    ]
+
+
+def written_ids(path):
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line)["message_id"] for line in f]
+
+
+def test_export_resumes_after_failure(tmp_path):
+    channels = {10: make_records(10, 250)}
+
+    failing = FakeHistoryProvider(channels, fail_after=120)
+    counts = asyncio.run(export_history(failing, [10], output_dir=str(tmp_path), batch_size=50))
+    assert counts == {10: None}
+    # 마지막 배치(101~120)는 쓰기 전에 끊겼으므로 체크포인트까지의 100개만 남습니다.
+    assert written_ids(tmp_path / "10.jsonl") == list(range(1, 101))
+    assert Checkpoint(str(tmp_path / "checkpoint.json")).get(10) == 100
+
+    counts = asyncio.run(export_history(FakeHistoryProvider(channels), [10], output_dir=str(tmp_path), batch_size=50))
+    assert counts == {10: 150}
+    assert written_ids(tmp_path / "10.jsonl") == list(range(1, 251))
+
+
+def test_export_skips_lines_written_after_the_checkpoint(tmp_path):
+    channels = {10: make_records(10, 120)}
+    asyncio.run(export_history(FakeHistoryProvider(channels), [10], output_dir=str(tmp_path), batch_size=50))
+    # 파일에는 120까지 썼지만 체크포인트는 100에서 멈춘 상황 (체크포인트 저장 직전에 종료)
+    Checkpoint(str(tmp_path / "checkpoint.json")).update(10, 100)
+    assert _last_written_id(str(tmp_path / "10.jsonl")) == 120
+
+    channels[10] = make_records(10, 200)
+    provider = FakeHistoryProvider(channels)
+    counts = asyncio.run(export_history(provider, [10], output_dir=str(tmp_path), batch_size=50))
+    assert counts == {10: 80}
+    assert provider.fetched == 80
+    assert written_ids(tmp_path / "10.jsonl") == list(range(1, 201))
+
+
+def test_last_written_id_ignores_partial_line(tmp_path):
+    path = tmp_path / "10.jsonl"
+    path.write_text(
+        "".join(json.dumps(record) + "\n" for record in make_records(10, 3)) + '{"message_id": 4, "cont',
+        encoding="utf-8",
+    )
+    assert _last_written_id(str(path)) == 3
+    assert _last_written_id(str(tmp_path / "missing.jsonl")) is None
+
+
+def test_export_filters_target_user_and_records_progress(tmp_path):
+    channels = {10: make_records(10, 10), 20: make_records(20, 6)}
+    counts = asyncio.run(export_history(
+        FakeHistoryProvider(channels), [10, 20, 30], output_dir=str(tmp_path), target_user_id=1, batch_size=4,
+    ))
+    assert counts == {10: 5, 20: 3, 30: None}  # 30은 없는 채널
+    assert written_ids(tmp_path / "10.jsonl") == [2, 4, 6, 8, 10]
+    # 걸러진 메시지도 받은 것으로 기록해 다시 받지 않습니다.
+    assert Checkpoint(str(tmp_path / "checkpoint.json")).get(20) == 6
@@ -0,0 +1,102 @@
+import asyncio
+
+from celery import states
+
+from gpt import meeting_jobs
+from gpt.meeting_jobs import MeetingJobQueue, job_key
+
+
+class FakeResult:
+    def __init__(self, task_id, text):
+        self.id = task_id
+        self.state = states.PENDING
+        self.result = text
+
+
+class FakeTask:
+    """apply_async에 넘어온 task_id를 기록하고, finish()를 부르기 전까지 대기 상태로 둡니다."""
+
+    def __init__(self):
+        self.results = []
+
+    def apply_async(self, args, task_id):
+        result = FakeResult(task_id, f"요약 {len(self.results) + 1}")
+        self.results.append(result)
+        return result
+
+    def finish(self):
+        for result in self.results:
+            result.state = states.SUCCESS
+
+
+class FakeChannel:
+    pass
+
+
+def test_job_key_depends_on_range(tmp_path):
+    log = tmp_path / "meeting.ndjson"
+    log.write_text("{}\n", encoding="utf-8")
+    assert job_key(str(log), since=1020) == job_key(str(log), since=1070)  # 같은 분
+    assert job_key(str(log), since=1020) != job_key(str(log), since=1100)
+    assert job_key(str(log), last_n=5) != job_key(str(log), last_n=6)
+    before = job_key(str(log), last_n=5)
+    log.write_text("{}\n{}\n", encoding="utf-8")  # 로그가 늘어나면 다른 범위
+    assert job_key(str(log), last_n=5) != before
+
+
+def test_same_range_is_deduped_but_resubmits_get_fresh_task_ids(tmp_path, monkeypatch):
+    sent = []
+
+    async def fake_send(destination, text):
+        sent.append(text)
+
+    monkeypatch.setattr(meeting_jobs, "send_long_message", fake_send)
+    log = tmp_path / "meeting.ndjson"
+    log.write_text("{}\n", encoding="utf-8")
+
+    async def scenario():
+        task = FakeTask()
+        queue = MeetingJobQueue(task=task, poll_interval=0.01)
+        first, created_first = await queue.submit(FakeChannel(), 1, str(log), last_n=5)
+        second, created_second = await queue.submit(FakeChannel(), 2, str(log), last_n=5)
+        assert (created_first, created_second) == (True, False)
+        assert second is first
+        assert [result.id for result in task.results] == [first.id]
+
+        task.finish()
+        await first.watcher
+        assert queue.active == {}
+
+        # 끝난 뒤 같은 범위를 다시 요청하면 결과 저장소의 예전 작업을 재사용하지 않도록 새 작업 ID로 보냅니다.
+        third, created_third = await queue.submit(FakeChannel(), 1, str(log), last_n=5)
+        assert created_third
+        assert third.key == first.key
+        assert third.id != first.id
+        assert [result.id for result in task.results] == [first.id, third.id]
+        task.finish()
+        await third.watcher
+        return first, third
+
+    first, third = asyncio.run(scenario())
+    assert sent == [
+        f"<@1> 회의 요약 (`{first.id}`)\n요약 1",
+        f"<@1> 회의 요약 (`{third.id}`)\n요약 2",
+    ]
+
+
+def test_failed_submit_is_not_left_active(tmp_path):
+    class BrokenTask:
+        def apply_async(self, args, task_id):
+            raise ConnectionError("브로커에 연결할 수 없습니다.")
+
+    async def scenario():
+        queue = MeetingJobQueue(task=BrokenTask())
+        try:
+            await queue.submit(FakeChannel(), 1, str(tmp_path / "meeting.ndjson"), last_n=5)
+        except ConnectionError:
+            pass
+        else:
+            raise AssertionError("예외가 전달되지 않았습니다.")
+        return queue.active
+
+    assert asyncio.run(scenario()) == {}
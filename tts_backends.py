@@ -0,0 +1,170 @@
+import io
+import os
+import abc
+import time
+import shutil
+import asyncio
+import subprocess
+
+from gtts import gTTS, lang as gtts_lang
+
+from metrics import TTS_SYNTH_LATENCY
+
+# 길드가 따로 고르지 않았을 때 쓸 TTS 엔진
+DEFAULT_TTS_BACKEND = os.getenv("TTS_BACKEND", "gtts")
+# 엔진 하나가 이 시간(초) 안에 합성하지 못하면 다음 엔진으로 넘어갑니다.
+TTS_LATENCY_SLO = float(os.getenv("TTS_LATENCY_SLO", "3.0"))
+# 오류/지연이 난 엔진은 이 시간(초) 동안 건너뜁니다.
+TTS_BACKEND_COOLDOWN = float(os.getenv("TTS_BACKEND_COOLDOWN", "30"))
+
+
+class TTSBackend(abc.ABC):
+    """
+    TTS 엔진 인터페이스. languages와 synthesize를 구현하지 않은 엔진은 만들 때 TypeError가 납니다.
+    synthesize는 블로킹 함수이므로 이벤트 루프에서는 asyncio.to_thread로 호출합니다.
+    반환하는 오디오는 FFmpeg가 읽을 수 있는 형식(MP3, WAV 등)의 바이트입니다.
+    """
+
+    name = None
+    label = None
+
+    def available(self):
+        return True
+
+    @abc.abstractmethod
+    def languages(self):
+        """지원하는 {언어 코드: 이름}."""
+
+    def voice(self, language):
+        """언어 코드(gTTS 기준)를 이 엔진의 언어/음성 이름으로 바꿉니다."""
+        return language
+
+    def supports(self, language):
+        """language(gTTS 기준 코드)로 합성할 수 있는지. languages()를 부르므로 블로킹일 수 있습니다."""
+        return self.voice(language) in self.languages()
+
+    @abc.abstractmethod
+    def synthesize(self, text, language):
+        """text를 language로 합성한 오디오 바이트."""
+
+
+class GTTSBackend(TTSBackend):
+    """Google TTS (네트워크 필요, MP3)."""
+
+    name = "gtts"
+    label = "Google TTS"
+
+    def languages(self):
+        return gtts_lang.tts_langs()
+
+    def synthesize(self, text, language):
+        buffer = io.BytesIO()
+        gTTS(text=text, lang=language).write_to_fp(buffer)
+        return buffer.getvalue()
+
+
+class EspeakBackend(TTSBackend):
+    """espeak-ng를 하위 프로세스로 실행하는 로컬 오프라인 엔진 (WAV)."""
+
+    name = "espeak"
+    label = "eSpeak NG (오프라인)"
+    # gTTS 언어 코드 중 espeak-ng 음성 이름이 다른 것
+    VOICE_ALIASES = {"zh-CN": "cmn", "zh-TW": "yue", "zh": "cmn", "en-us": "en-us", "pt-br": "pt-br"}
+
+    def __init__(self, executable=None):
+        self.executable = executable or os.getenv("ESPEAK_PATH") or shutil.which("espeak-ng") or shutil.which("espeak")
+        self._languages = None
+
+    def available(self):
+        return self.executable is not None
+
+    def languages(self):
+        """`espeak-ng --voices` 출력에서 언어 목록을 읽습니다. (한 번만 실행)"""
+        if self._languages is None:
+            self._languages = {}
+            if self.available():
+                output = subprocess.run(
+                    [self.executable, "--voices"], capture_output=True, text=True, check=True,
+                ).stdout
+                for line in output.splitlines()[1:]:
+                    columns = line.split()
+                    if len(columns) >= 4:
+                        self._languages.setdefault(columns[1], columns[3])
+        return self._languages
+
+    def voice(self, language):
+        return self.VOICE_ALIASES.get(language, language)
+
+    def synthesize(self, text, language):
+        voice = self.voice(language)
+        result = subprocess.run(
+            [self.executable, "-v", voice, "--stdout", text],
+            capture_output=True, check=True, timeout=TTS_LATENCY_SLO * 4,
+        )
+        return result.stdout
+
+
+TTS_BACKENDS = {backend.name: backend for backend in (GTTSBackend(), EspeakBackend())}
+
+
+class BackendHealth:
+    """엔진별 최근 지연 시간과, 오류/SLO 초과로 잠시 건너뛸 시각을 기록합니다."""
+
+    def __init__(self, cooldown=TTS_BACKEND_COOLDOWN):
+        self.cooldown = cooldown
+        self.skip_until = {}
+        self.last_latency = {}
+        self.failures = {}
+
+    def usable(self, name):
+        return time.monotonic() >= self.skip_until.get(name, 0.0)
+
+    def succeeded(self, name, seconds):
+        self.last_latency[name] = seconds
+        self.skip_until.pop(name, None)
+
+    def failed(self, name):
+        self.failures[name] = self.failures.get(name, 0) + 1
+        self.skip_until[name] = time.monotonic() + self.cooldown
+
+
+backend_health = BackendHealth()
+
+
+def backend_order(preferred):
+    """preferred 엔진을 먼저, 나머지 사용 가능한 엔진을 그 뒤에 둔 시도 순서."""
+    names = [preferred] if preferred in TTS_BACKENDS else []
+    names += [name for name in TTS_BACKENDS if name not in names]
+    return [name for name in names if TTS_BACKENDS[name].available()]
+
+
+async def synthesize_with_fallback(text, language, preferred=DEFAULT_TTS_BACKEND, slo=TTS_LATENCY_SLO):
+    """
+    preferred 엔진으로 합성하고, 오류가 나거나 slo초 안에 끝나지 않으면 다음 엔진으로 넘어갑니다.
+    (엔진 이름, 오디오 바이트)를 반환합니다. 모든 엔진이 실패하면 마지막 오류를 다시 던집니다.
+    최근에 실패한 엔진은 cooldown 동안 뒤로 미루되, 남은 엔진이 없으면 그래도 시도합니다.
+    """
+    order = backend_order(preferred)
+    order = [name for name in order if backend_health.usable(name)] + [
+        name for name in order if not backend_health.usable(name)
+    ]
+    last_error = RuntimeError("사용 가능한 TTS 엔진이 없습니다.")
+    for name in order:
+        backend = TTS_BACKENDS[name]
+        # espeak는 처음 한 번 하위 프로세스로 음성 목록을 읽으므로 스레드에서 호출합니다.
+        if not await asyncio.to_thread(backend.supports, language):
+            continue
+        start = time.perf_counter()
+        try:
+            # 시간 초과 시 스레드는 끝까지 돌지만 결과는 버리고 다음 엔진으로 넘어갑니다.
+            data = await asyncio.wait_for(asyncio.to_thread(backend.synthesize, text, language), slo)
+        except Exception as e:
+            print(f"TTS 엔진 {name} 실패, 다음 엔진으로 전환합니다: {e!r}")
+            backend_health.failed(name)
+            last_error = e
+            continue
+        elapsed = time.perf_counter() - start
+        backend_health.succeeded(name, elapsed)
+        TTS_SYNTH_LATENCY.observe(elapsed, backend=name)
+        return name, data
+    raise last_error
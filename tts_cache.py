@@ -0,0 +1,135 @@
+import os
+import re
+import hashlib
+import threading
+import unicodedata
+from collections import OrderedDict
+
+# 디스크 캐시 위치와 크기 제한
+TTS_CACHE_DIR = os.getenv("TTS_CACHE_DIR", "json_data/tts_cache")
+TTS_DISK_CACHE_BYTES = int(os.getenv("TTS_DISK_CACHE_BYTES", str(200 * 1024 * 1024)))
+# 메모리 캐시 크기 제한과, 메모리에 올릴 짧은 클립의 최대 크기
+TTS_MEMORY_CACHE_BYTES = int(os.getenv("TTS_MEMORY_CACHE_BYTES", str(16 * 1024 * 1024)))
+TTS_MEMORY_CLIP_BYTES = int(os.getenv("TTS_MEMORY_CLIP_BYTES", str(64 * 1024)))
+
+
+def normalize_tts_text(text):
+    """같은 소리가 나는 텍스트를 같은 키로 묶기 위해 유니코드 정규화와 공백 정리를 합니다."""
+    text = unicodedata.normalize("NFKC", text).strip()
+    return re.sub(r"\s+", " ", text)
+
+
+def tts_cache_key(language, text):
+    return hashlib.sha256(f"{language}\0{normalize_tts_text(text)}".encode("utf-8")).hexdigest()
+
+
+class TTSCache:
+    """
+    (언어, 정규화된 텍스트)를 키로 하는 TTS 오디오 캐시.
+    - 메모리 계층: 짧은 클립(memory_clip_bytes 이하)만 보관하며 총 바이트 기준 LRU로 내보냅니다.
+    - 디스크 계층: 모든 클립을 파일로 보관하며 총 바이트 기준 LRU로 지웁니다.
+    디스크 작업이 있으므로 이벤트 루프에서는 asyncio.to_thread로 호출합니다.
+    """
+
+    def __init__(self, directory=TTS_CACHE_DIR, disk_bytes=TTS_DISK_CACHE_BYTES,
+                 memory_bytes=TTS_MEMORY_CACHE_BYTES, memory_clip_bytes=TTS_MEMORY_CLIP_BYTES):
+        self.directory = directory
+        self.disk_limit = disk_bytes
+        self.memory_limit = memory_bytes
+        self.memory_clip_bytes = memory_clip_bytes
+        self._lock = threading.Lock()
+        self._memory = OrderedDict()  # key -> bytes
+        self._memory_bytes = 0
+        self._disk = OrderedDict()  # key -> 파일 크기
+        self._disk_bytes = 0
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self._load_disk_index()
+
+    def _path(self, key):
+        return os.path.join(self.directory, key + ".audio")
+
+    def _load_disk_index(self):
+        """기존 캐시 파일을 수정 시각 순(오래된 것 먼저)으로 읽어 LRU 순서를 복원합니다."""
+        if not os.path.isdir(self.directory):
+            return
+        entries = []
+        for name in os.listdir(self.directory):
+            if not name.endswith(".audio"):
+                continue
+            stat = os.stat(os.path.join(self.directory, name))
+            entries.append((stat.st_mtime, name[:-len(".audio")], stat.st_size))
+        for _, key, size in sorted(entries):
+            self._disk[key] = size
+            self._disk_bytes += size
+
+    def _remember_memory(self, key, data):
+        if len(data) > self.memory_clip_bytes:
+            return
+        if key in self._memory:
+            self._memory.move_to_end(key)
+            return
+        self._memory[key] = data
+        self._memory_bytes += len(data)
+        while self._memory_bytes > self.memory_limit:
+            _, evicted = self._memory.popitem(last=False)
+            self._memory_bytes -= len(evicted)
+
+    def get(self, language, text):
+        key = tts_cache_key(language, text)
+        with self._lock:
+            data = self._memory.get(key)
+            if data is not None:
+                self._memory.move_to_end(key)
+                self.memory_hits += 1
+                return data
+            if key in self._disk:
+                try:
+                    with open(self._path(key), "rb") as f:
+                        data = f.read()
+                    os.utime(self._path(key))  # 다음 실행에서도 LRU 순서가 유지되도록 갱신
+                except OSError:
+                    self._disk_bytes -= self._disk.pop(key)
+                    data = None
+                if data is not None:
+                    self._disk.move_to_end(key)
+                    self._remember_memory(key, data)
+                    self.disk_hits += 1
+                    return data
+            self.misses += 1
+            return None
+
+    def put(self, language, text, data):
+        key = tts_cache_key(language, text)
+        with self._lock:
+            self._remember_memory(key, data)
+            if key in self._disk:
+                return
+            os.makedirs(self.directory, exist_ok=True)
+            path = self._path(key)
+            with open(path + ".tmp", "wb") as f:
+                f.write(data)
+            os.replace(path + ".tmp", path)
+            self._disk[key] = len(data)
+            self._disk_bytes += len(data)
+            while self._disk_bytes > self.disk_limit and self._disk:
+                evicted, size = self._disk.popitem(last=False)
+                self._disk_bytes -= size
+                try:
+                    os.remove(self._path(evicted))
+                except OSError:
+                    pass
+
+    def stats(self):
+        lookups = self.memory_hits + self.disk_hits + self.misses
+        return {
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_rate": (self.memory_hits + self.disk_hits) / lookups if lookups else 0.0,
+            "memory_bytes": self._memory_bytes,
+            "memory_entries": len(self._memory),
+            "disk_bytes": self._disk_bytes,
+            "disk_entries": len(self._disk),
+        }
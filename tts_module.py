@@ -1,121 +1,344 @@
-import json
+import re
 import os
+import statistics
 import asyncio
-from gtts import gTTS, lang as gtts_lang
-import platform
-import discord
+from collections import deque
 
-LANGUAGES_FILE = 'json_data/guild_languages.json'
+from tts_cache import TTSCache
+from audio_mixer import FFMPEG_EXECUTABLE, decode_to_pcm, get_mixer, guild_mixers
+from tts_backends import TTS_BACKENDS, DEFAULT_TTS_BACKEND, synthesize_with_fallback
+from settings import guild_settings
+from metrics import Gauge
 
-# 서버별 TTS 언어 설정을 저장/불러오기
-if os.path.exists(LANGUAGES_FILE):
-    with open(LANGUAGES_FILE, 'r', encoding='utf-8') as f:
-        guild_languages = json.load(f)
-else:
-    guild_languages = {}
+# 길드별 TTS 재생 워커 설정
+# - TTS_LOOKAHEAD: 재생 중에 미리 합성해 둘 다음 메시지 수
+# - TTS_MAX_QUEUE: 길드별 대기 메시지 최대 개수
+# - TTS_QUEUE_POLICY: 대기열이 가득 찼을 때 정책 (drop_oldest, drop_new, merge)
+# - TTS_MERGE_WINDOW / TTS_MERGE_MAX_CHARS: 같은 사용자가 연달아 보낸 메시지를 하나로 합치는 시간(초)과 최대 길이
+TTS_LOOKAHEAD = int(os.getenv("TTS_LOOKAHEAD", "2"))
+TTS_MAX_QUEUE = int(os.getenv("TTS_MAX_QUEUE", "20"))
+TTS_QUEUE_POLICY = os.getenv("TTS_QUEUE_POLICY", "drop_oldest")
+TTS_MERGE_WINDOW = float(os.getenv("TTS_MERGE_WINDOW", "1.5"))
+TTS_MERGE_MAX_CHARS = int(os.getenv("TTS_MERGE_MAX_CHARS", "200"))
+# 이 시간(초) 동안 읽을 메시지가 없으면 워커를 종료합니다.
+TTS_IDLE_TIMEOUT = float(os.getenv("TTS_IDLE_TIMEOUT", "60"))
+# 긴 메시지를 문장/구 단위로 나눠 합성할 때 한 단위의 최대 글자 수와, 길드별 동시 합성 수
+TTS_UNIT_MAX_CHARS = int(os.getenv("TTS_UNIT_MAX_CHARS", "80"))
+TTS_SYNTH_CONCURRENCY = int(os.getenv("TTS_SYNTH_CONCURRENCY", "2"))
 
-# 각 길드별 TTS 메시지 큐를 저장하는 전역 변수
-tts_queues = {}
-# 각 길드별로 큐 처리가 진행 중인지 여부를 나타내는 플래그
-tts_processing = {}
+# 문장 끝: 마침표/물음표/느낌표/말줄임표(전각 포함)와 줄바꿈
+_SENTENCE_END = re.compile(r"(?<=[.!?。！？…~])\s+|\n+")
+# 구 경계: 쉼표, 세미콜론, 콜론 (전각 포함)
+_CLAUSE_END = re.compile(r"(?<=[,;:，、；：])\s+")
 
-async def set_tts_language(ctx, lang_code):
+# 각 길드별 TTS 워커
+tts_workers = {}
+TTS_QUEUE_DEPTH = Gauge(
+    "tts_queue_depth", "길드별 TTS 대기열 길이", ["guild"],
+    callback=lambda: {(guild_id,): len(worker.pending) for guild_id, worker in list(tts_workers.items())},
+)
+
+# 합성한 오디오를 (언어, 텍스트) 기준으로 재사용하는 캐시
+tts_cache = TTSCache()
+
+async def set_tts_language(ctx, lang_code, backend_name=None):
     """
     TTS 언어 설정 함수.
     - ctx: 명령어가 실행된 컨텍스트
     - lang_code: 사용자가 설정할 언어 코드
+    - backend_name: TTS 엔진 이름 (gtts, espeak). 생략하면 길드의 현재 엔진을 유지합니다.
     """
-    supported_langs = gtts_lang.tts_langs()
-    if lang_code not in supported_langs:
+    guild_id = ctx.guild.id
+    if backend_name is None:
+        backend_name = guild_settings.get(guild_id, "tts_backend", DEFAULT_TTS_BACKEND)
+    backend = TTS_BACKENDS.get(backend_name)
+    if backend is None or not backend.available():
+        available_backends = ', '.join(name for name, b in TTS_BACKENDS.items() if b.available())
+        await ctx.send(f"사용할 수 없는 TTS 엔진입니다. 사용 가능한 엔진: {available_backends}")
+        return
+
+    supported_langs = await asyncio.to_thread(backend.languages)
+    if backend.voice(lang_code) not in supported_langs:
         available_langs = ', '.join([f"{code} ({name})" for code, name in supported_langs.items()])
         await ctx.send(f"지원되지 않는 언어 코드입니다. 사용 가능한 언어 코드는 다음과 같습니다:\n{available_langs}")
         return
 
-    guild_languages[str(ctx.guild.id)] = lang_code
-    with open(LANGUAGES_FILE, 'w', encoding='utf-8') as f:
-        json.dump(guild_languages, f, ensure_ascii=False, indent=4)
-    language_name = supported_langs[lang_code]
-    await ctx.send(f"TTS 언어가 {language_name}({lang_code})으로 설정되었습니다.")
+    guild_settings.set(guild_id, tts_language=lang_code, tts_backend=backend_name)
+    language_name = supported_langs[backend.voice(lang_code)]
+    await ctx.send(f"TTS 언어가 {language_name}({lang_code})으로 설정되었습니다. (엔진: {backend.label})")
+
+def guild_tts_settings(guild_id):
+    """길드의 (TTS 언어, TTS 엔진)."""
+    return (
+        guild_settings.get(guild_id, "tts_language", 'ko'),
+        guild_settings.get(guild_id, "tts_backend", DEFAULT_TTS_BACKEND),
+    )
 
-async def generate_tts_audio(message):
+def _cache_namespace(backend_name, language):
+    # gTTS 오디오는 엔진 구분 없이 언어만으로 저장해 온 기존 캐시를 그대로 씁니다.
+    return language if backend_name == "gtts" else f"{backend_name}:{language}"
+
+async def get_tts_audio(text, language, backend_name=DEFAULT_TTS_BACKEND):
     """
-    주어진 메시지에 대해 TTS 오디오 파일을 생성하고, 파일 경로를 반환합니다.
-    파일 이름은 고유하게 message.id를 사용합니다.
+    캐시에 있으면 캐시된 오디오를, 없으면 합성한 뒤 캐시에 저장하고 반환합니다.
+    선택한 엔진이 실패하거나 느리면 다른 엔진으로 합성하고, 그 엔진 기준으로 캐시에 저장합니다.
     """
-    guild_id = str(message.guild.id)
-    language = guild_languages.get(guild_id, 'ko')
-    # 고유 파일명 생성 (메시지 ID 사용)
-    filename = f"tts_audio_{guild_id}_{message.id}.mp3"
-    try:
-        tts = gTTS(text=message.content, lang=language)
-        # gTTS 저장 작업을 별도의 스레드에서 실행하여 블로킹을 피함
-        await asyncio.to_thread(tts.save, filename)
-        return filename
-    except Exception as e:
-        print(f"TTS 파일 생성 오류: {e}")
-        return None
-
-async def process_tts_queue(guild, voice_client):
+    data = await asyncio.to_thread(tts_cache.get, _cache_namespace(backend_name, language), text)
+    if data is None:
+        used, data = await synthesize_with_fallback(text, language, backend_name)
+        await asyncio.to_thread(tts_cache.put, _cache_namespace(used, language), text, data)
+    return data
+
+def split_tts_text(text, max_chars=TTS_UNIT_MAX_CHARS):
     """
-    해당 길드의 TTS 큐에 쌓인 메시지들을 순차적으로 재생합니다.
-    동시에 하나의 프로세싱만 진행되도록 보장합니다.
+    TTS 텍스트를 문장 단위로 나눕니다. max_chars를 넘는 문장은 쉼표 등 구 경계에서,
+    그래도 길면 공백에서 나눕니다. 짧은 조각은 max_chars 안에서 앞 조각과 이어 붙여
+    합성 요청 수가 불필요하게 늘지 않게 합니다.
     """
-    guild_id = str(guild.id)
-    if tts_processing.get(guild_id, False):
-        return
-    tts_processing[guild_id] = True
-    queue = tts_queues.get(guild_id)
-    while not queue.empty():
-        message, audio_future = await queue.get()
-        # 기다려서 오디오 파일 생성 완료
-        filename = await audio_future
-        if not filename:
-            await message.channel.send("TTS 오디오 파일 생성에 실패했습니다.")
-            queue.task_done()
+    units = []
+    for sentence in _SENTENCE_END.split(text.strip()):
+        sentence = sentence.strip()
+        if not sentence:
             continue
+        if len(sentence) <= max_chars:
+            units.append(sentence)
+            continue
+        for clause in _CLAUSE_END.split(sentence):
+            units.extend(_split_by_space(clause.strip(), max_chars))
+    return _pack_units(units, max_chars)
+
+def _split_by_space(text, max_chars):
+    pieces, current = [], ""
+    for word in text.split():
+        while len(word) > max_chars:  # 공백 없이 너무 긴 단어는 글자 수로 자릅니다.
+            if current:
+                pieces.append(current)
+                current = ""
+            pieces.append(word[:max_chars])
+            word = word[max_chars:]
+        if current and len(current) + 1 + len(word) > max_chars:
+            pieces.append(current)
+            current = word
+        else:
+            current = f"{current} {word}" if current else word
+    if current:
+        pieces.append(current)
+    return pieces
 
-        ffmpeg_executable = {
-            "Darwin": "/opt/homebrew/bin/ffmpeg",
-            "Windows": r"C:\ffmpeg\bin\ffmpeg.exe"
-        }.get(platform.system())
+def _pack_units(units, max_chars):
+    packed = []
+    for unit in units:
+        if packed and len(packed[-1]) + 1 + len(unit) <= max_chars // 2:
+            packed[-1] = f"{packed[-1]} {unit}"
+        else:
+            packed.append(unit)
+    return packed
 
-        if not ffmpeg_executable or not os.path.exists(ffmpeg_executable):
-            await message.channel.send("FFmpeg 실행 파일을 찾을 수 없습니다. 시스템에 FFmpeg가 설치되어 있는지 확인해주세요.")
-            queue.task_done()
-            continue
+class TTSLatency:
+    """최근 발화들의 첫 소리까지 걸린 시간(TTFA, 메시지 수신 -> 첫 단위 재생 시작)을 모읍니다."""
 
-        play_complete = asyncio.Event()
+    def __init__(self, size=500):
+        self.samples = deque(maxlen=size)  # (글자 수, 초)
 
-        def after_playing(error):
-            if error:
-                print(f"오디오 재생 중 오류 발생: {error}")
-            play_complete.set()
+    def record(self, chars, seconds):
+        self.samples.append((chars, seconds))
 
-        try:
-            # 재생 전에 음성 클라이언트의 현재 재생 상태를 확인하지 않고,
-            # 순차 재생을 위해 queue에서 하나씩 처리합니다.
-            source = discord.FFmpegPCMAudio(filename, executable=ffmpeg_executable)
-            voice_client.play(source, after=after_playing)
-            await play_complete.wait()
-        except Exception as e:
-            await message.channel.send("오디오 재생 중 오류가 발생했습니다.")
-            print(f"오디오 재생 오류: {e}")
-
-        # 재생 후 파일 삭제
-        if os.path.exists(filename):
+    def stats(self, long_chars=TTS_UNIT_MAX_CHARS):
+        def summary(values):
+            if not values:
+                return None
+            values = sorted(values)
+            return {
+                "count": len(values),
+                "p50": statistics.median(values),
+                "p95": values[min(len(values) - 1, int(len(values) * 0.95))],
+            }
+        return {
+            "all": summary([s for _, s in self.samples]),
+            "short": summary([s for c, s in self.samples if c <= long_chars]),
+            "long": summary([s for c, s in self.samples if c > long_chars]),
+        }
+
+# 봇 전체의 TTFA 측정값 (/ttscache에서 확인)
+tts_latency = TTSLatency()
+
+class TTSItem:
+    """재생을 기다리는 발화 하나 (같은 사용자의 연속 메시지는 하나로 합쳐집니다)."""
+
+    def __init__(self, message, language, backend_name=DEFAULT_TTS_BACKEND):
+        self.author_id = message.author.id
+        self.channel = message.channel
+        self.text = message.content
+        self.language = language
+        self.backend_name = backend_name
+        self.created = self.updated = asyncio.get_running_loop().time()
+        self.tasks = None  # 문장 단위 합성 태스크 목록 (시작 전이면 None)
+
+    def start_synthesis(self, semaphore):
+        """문장 단위로 나눠 순서대로 합성 태스크를 만듭니다. 동시 합성 수는 semaphore로 제한합니다."""
+        if self.tasks is None:
+            self.tasks = [
+                asyncio.create_task(self._synthesize(unit, semaphore))
+                for unit in split_tts_text(self.text)
+            ]
+
+    async def _synthesize(self, unit, semaphore):
+        """합성한 오디오를 바로 PCM으로 디코딩해 두어, 재생할 때는 믹서에 넣기만 하면 되게 합니다."""
+        async with semaphore:
             try:
-                os.remove(filename)
-                print(f"오디오 파일 삭제 완료: {filename}")
+                audio = await get_tts_audio(unit, self.language, self.backend_name)
+                return await decode_to_pcm(audio)
             except Exception as e:
-                print(f"오디오 파일 삭제 중 오류 발생: {e}")
-        queue.task_done()
-    tts_processing[guild_id] = False
+                print(f"TTS 파일 생성 오류: {e}")
+                return None
+
+    def cancel(self):
+        for task in self.tasks or ():
+            task.cancel()
+
+class GuildTTSWorker:
+    """
+    길드 하나의 TTS를 담당하는 장기 실행 워커.
+    - 메시지는 대기열에 넣기만 하고, 재생은 이 워커의 태스크 하나가 순서대로 합니다.
+    - 재생 중에는 다음 lookahead개의 메시지만 미리 합성해 동시에 합성하는 양을 제한합니다.
+    - 대기열이 max_queue(길드 설정 tts_queue가 있으면 그 값)를 넘으면 policy에 따라 오래된 것을 버리거나, 새 것을 버리거나, 합칩니다.
+    """
+
+    def __init__(self, guild, lookahead=TTS_LOOKAHEAD, max_queue=TTS_MAX_QUEUE, policy=TTS_QUEUE_POLICY):
+        self.guild = guild
+        self.lookahead = lookahead
+        self.max_queue = max_queue
+        self.policy = policy
+        self.pending = deque()
+        self.current = None
+        self.dropped = 0
+        self._synth_semaphore = asyncio.Semaphore(TTS_SYNTH_CONCURRENCY)
+        self._wakeup = asyncio.Event()
+        self._task = None
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run(), name=f"tts-worker-{self.guild.id}")
+
+    def enqueue(self, message, language, backend_name=DEFAULT_TTS_BACKEND):
+        """메시지를 대기열에 추가합니다. 합치거나 버린 경우에도 바로 반환합니다."""
+        now = asyncio.get_running_loop().time()
+        last = self.pending[-1] if self.pending else None
+        # 같은 사용자가 짧은 간격으로 보낸 메시지는 아직 합성 전이면 하나의 발화로 합칩니다.
+        if (last is not None and last.tasks is None and last.author_id == message.author.id
+                and now - last.updated <= TTS_MERGE_WINDOW
+                and len(last.text) + len(message.content) < TTS_MERGE_MAX_CHARS):
+            last.text = f"{last.text} {message.content}"
+            last.updated = now
+        elif len(self.pending) >= guild_settings.limit(self.guild.id, "tts_queue", self.max_queue):
+            self._apply_overflow_policy(message, language, backend_name)
+        else:
+            self.pending.append(TTSItem(message, language, backend_name))
+        self.start()
+        self._wakeup.set()
+
+    def _apply_overflow_policy(self, message, language, backend_name):
+        self.dropped += 1
+        if self.policy == "drop_new":
+            return
+        last = self.pending[-1]
+        if self.policy == "merge" and last.tasks is None:
+            last.text = f"{last.text} {message.content}"
+            return
+        # drop_oldest: 가장 오래된 대기 메시지를 버리고 새 메시지를 넣습니다.
+        self.pending.popleft().cancel()
+        self.pending.append(TTSItem(message, language, backend_name))
+
+    def stop(self):
+        """재생 중인 TTS와 대기/합성 중인 메시지를 모두 취소합니다. 취소한 것이 있으면 True."""
+        stopped = bool(self.pending) or self.current is not None
+        while self.pending:
+            self.pending.popleft().cancel()
+        if self.current is not None:
+            self.current.cancel()
+        mixer = guild_mixers.get(self.guild.id)
+        if mixer is not None and mixer.clear("tts"):
+            stopped = True
+        return stopped
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        try:
+            while True:
+                if not self.pending:
+                    self._wakeup.clear()
+                    try:
+                        await asyncio.wait_for(self._wakeup.wait(), TTS_IDLE_TIMEOUT)
+                    except asyncio.TimeoutError:
+                        return  # 한동안 읽을 메시지가 없으면 워커를 정리합니다.
+                    continue
+
+                # 지금 재생할 메시지와 다음 lookahead개만 합성을 시작합니다.
+                for item in list(self.pending)[:self.lookahead + 1]:
+                    item.start_synthesis(self._synth_semaphore)
+                item = self.current = self.pending.popleft()
+                try:
+                    await self._play_item(loop, item)
+                finally:
+                    self.current = None
+        finally:
+            if tts_workers.get(self.guild.id) is self:
+                del tts_workers[self.guild.id]
+
+    async def _play_item(self, loop, item):
+        """
+        문장 단위 PCM을 순서대로 길드 믹서의 TTS 레인에 넣습니다.
+        첫 단위가 준비되는 대로 재생이 시작되고, 뒤 단위와 다음 메시지는 끊김 없이 이어서 재생됩니다.
+        믹서 버퍼가 가득 차면 여기서 기다리므로 미리 넣어 두는 양도 제한됩니다.
+        """
+        if FFMPEG_EXECUTABLE is None:
+            item.cancel()
+            await item.channel.send("FFmpeg 실행 파일을 찾을 수 없습니다. 시스템에 FFmpeg가 설치되어 있는지 확인해주세요.")
+            return
+        failed = False
+        first = True
+        for task in item.tasks:
+            await asyncio.wait({task})
+            if task.cancelled():
+                return  # /stop으로 합성이 취소된 경우
+            pcm = task.result()
+            if not pcm:
+                failed = True
+                continue
+            mixer = get_mixer(self.guild)
+            if mixer is None:
+                item.cancel()
+                return  # 음성 채널 연결이 끊긴 경우
+            on_start = None
+            if first:
+                # 실제로 첫 프레임이 재생될 때 첫 소리까지 걸린 시간을 기록합니다.
+                on_start = lambda: tts_latency.record(len(item.text), loop.time() - item.created)
+                first = False
+            if not await mixer.feed("tts", pcm, on_start=on_start):
+                return  # /stop 또는 믹서 종료
+        if failed:
+            await item.channel.send("TTS 오디오 파일 생성에 실패했습니다.")
+
+def get_tts_worker(guild):
+    worker = tts_workers.get(guild.id)
+    if worker is None:
+        worker = GuildTTSWorker(guild)
+        tts_workers[guild.id] = worker
+    return worker
+
+def stop_tts(guild):
+    """길드의 TTS 재생과 대기 중인 합성을 모두 취소합니다. 취소한 것이 있으면 True."""
+    worker = tts_workers.get(guild.id)
+    if worker is not None:
+        return worker.stop()
+    mixer = guild_mixers.get(guild.id)
+    return mixer is not None and mixer.clear("tts")
 
 async def handle_tts(message):
     """
     TTS 요청 처리 함수.
-    사용자가 TTS 채널에 입력한 메시지를 해당 길드의 큐에 추가하고,
-    큐에 쌓인 메시지를 순차적으로 재생합니다.
+    사용자가 TTS 채널에 입력한 메시지를 해당 길드의 TTS 워커 대기열에 넣고 바로 반환합니다.
+    재생은 길드별 워커가 순서대로 처리합니다.
     """
     voice_client = message.guild.voice_client
     if voice_client is None:
@@ -123,7 +346,6 @@ async def handle_tts(message):
             voice_channel = message.author.voice.channel
             try:
                 await voice_channel.connect()
-                voice_client = message.guild.voice_client
             except Exception as e:
                 print(f"음성 채널 연결 오류: {e}")
                 await message.channel.send("음성 채널에 연결하는 중 오류가 발생했습니다.")
@@ -132,14 +354,5 @@ async def handle_tts(message):
             await message.channel.send("먼저 음성 채널에 접속해주세요.")
             return
 
-    guild_id = str(message.guild.id)
-    if guild_id not in tts_queues:
-        tts_queues[guild_id] = asyncio.Queue()
-
-    # TTS 파일 생성 작업을 즉시 시작 (병렬 실행)
-    audio_future = asyncio.create_task(generate_tts_audio(message))
-    await tts_queues[guild_id].put((message, audio_future))
-
-    # 처리 중이 아니라면 큐 처리를 시작
-    if not tts_processing.get(guild_id, False):
-        await process_tts_queue(message.guild, voice_client)
+    language, backend_name = guild_tts_settings(message.guild.id)
+    get_tts_worker(message.guild).enqueue(message, language, backend_name)
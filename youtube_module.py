@@ -1,37 +1,305 @@
 import os
+import re
+import json
+import time
+import asyncio
+import threading
+import unicodedata
+from collections import OrderedDict
+from datetime import datetime
+from zoneinfo import ZoneInfo
+
 from googleapiclient.discovery import build
 from googleapiclient.errors import HttpError
 from dotenv import load_dotenv
+
+from metrics import Gauge
 load_dotenv()
 YOUTUBE_API_KEY = os.getenv('youtube_key')
 
-if not YOUTUBE_API_KEY:
-    raise ValueError("YouTube API key가 설정되지 않았습니다. .env 파일을 확인하세요.")
+# 검색 결과 캐시: 같은 검색어는 YOUTUBE_CACHE_TTL초 동안 API를 다시 부르지 않습니다.
+YOUTUBE_CACHE_SIZE = int(os.getenv("YOUTUBE_CACHE_SIZE", "512"))
+YOUTUBE_CACHE_TTL = float(os.getenv("YOUTUBE_CACHE_TTL", str(6 * 3600)))
+# 한 번 검색할 때 받아 둘 결과 수 (search.list는 결과 수와 상관없이 100 유닛이므로 넉넉히 받아 /ylist에도 씁니다)
+YOUTUBE_SEARCH_RESULTS = int(os.getenv("YOUTUBE_SEARCH_RESULTS", "25"))
+YOUTUBE_PAGE_SIZE = 5
+# 일일 할당량과, 남은 할당량이 이만큼 이하가 되면 새 검색 대신 캐시(만료된 것 포함)만 쓰는 기준
+YOUTUBE_DAILY_QUOTA = int(os.getenv("YOUTUBE_DAILY_QUOTA", "10000"))
+YOUTUBE_QUOTA_RESERVE = int(os.getenv("YOUTUBE_QUOTA_RESERVE", "1000"))
+SEARCH_COST = 100
+QUOTA_FILE = 'json_data/youtube_quota.json'
+# 할당량 사용량을 모았다가 파일에 쓰는 지연 시간(초)
+QUOTA_SAVE_DELAY = float(os.getenv("YOUTUBE_QUOTA_SAVE_DELAY", "5"))
+# YouTube API 할당량은 태평양 시간 자정에 초기화됩니다.
+QUOTA_TIMEZONE = ZoneInfo("America/Los_Angeles")
 
-youtube = build('youtube', 'v3', developerKey=YOUTUBE_API_KEY)
 
-async def search_youtube(ctx, query):
+class QuotaExceeded(Exception):
+    """남은 할당량이 예약분 이하라 새 검색을 하지 않은 경우."""
+
+
+def normalize_query(query):
+    """유니코드 정규화(NFKC), 소문자화, 연속 공백 제거로 같은 검색어를 같은 키로 묶습니다."""
+    query = unicodedata.normalize("NFKC", query).strip().lower()
+    return re.sub(r"\s+", " ", query)
+
+
+class QuotaTracker:
+    """
+    오늘(태평양 시간 기준) 사용한 YouTube API 할당량을 파일에 기록합니다.
+    사용량은 메모리에서 바로 갱신하고, 파일은 save_delay초 동안 모았다가 스레드에서 씁니다. (settings.GuildSettings와 같은 방식)
+    """
+
+    def __init__(self, path=QUOTA_FILE, daily_limit=YOUTUBE_DAILY_QUOTA, reserve=YOUTUBE_QUOTA_RESERVE,
+                 save_delay=QUOTA_SAVE_DELAY):
+        self.path = path
+        self.daily_limit = daily_limit
+        self.reserve = reserve
+        self.save_delay = save_delay
+        self._lock = threading.Lock()
+        self._save_handle = None
+        self.dirty = False
+        self._day = None
+        self._used = 0
+        if os.path.exists(path):
+            with open(path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            self._day, self._used = data.get("day"), data.get("used", 0)
+
+    @staticmethod
+    def _today():
+        return datetime.now(QUOTA_TIMEZONE).date().isoformat()
+
+    def used(self):
+        if self._day != self._today():
+            self._day, self._used = self._today(), 0
+        return self._used
+
+    def remaining(self):
+        return max(0, self.daily_limit - self.used())
+
+    def can_spend(self, cost):
+        return self.remaining() - cost >= self.reserve
+
+    def spend(self, cost):
+        self._used = self.used() + cost
+        self._changed()
+
+    def refund(self, cost):
+        """spend로 먼저 잡아 둔 할당량을 API 호출이 실패했을 때 돌려놓습니다."""
+        self._used = max(0, self.used() - cost)
+        self._changed()
+
+    def _changed(self):
+        self.dirty = True
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            self.save()  # 이벤트 루프 밖(스크립트 등)에서는 바로 저장합니다.
+            return
+        if self._save_handle is None:
+            # 검색이 이어져도 첫 사용 후 save_delay초 안에는 저장되도록 미루지 않습니다.
+            self._save_handle = loop.call_later(self.save_delay, lambda: loop.create_task(self.flush()))
+
+    def _write(self, data):
+        with self._lock:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            with open(self.path + ".tmp", 'w', encoding='utf-8') as f:
+                json.dump(data, f)
+            os.replace(self.path + ".tmp", self.path)
+
+    def save(self):
+        if not self.dirty:
+            return
+        self.dirty = False
+        self._write({"day": self._day, "used": self._used})
+
+    async def flush(self):
+        """대기 중인 저장을 지금 합니다. (봇 종료 시 호출)"""
+        if self._save_handle is not None:
+            self._save_handle.cancel()
+            self._save_handle = None
+        if not self.dirty:
+            return
+        self.dirty = False
+        await asyncio.to_thread(self._write, {"day": self._day, "used": self._used})
+
+
+class SearchCache:
+    """검색어별 결과를 담는 TTL + LRU 캐시. 할당량이 부족할 때를 위해 만료된 결과도 LRU에서 밀려날 때까지 남겨 둡니다."""
+
+    def __init__(self, max_entries=YOUTUBE_CACHE_SIZE, ttl=YOUTUBE_CACHE_TTL):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()  # key -> (results, created_at)
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+
+    def get(self, key, allow_stale=False):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        results, created_at = entry
+        if time.time() - created_at > self.ttl and not allow_stale:
+            return None
+        self._entries.move_to_end(key)
+        return results
+
+    def __len__(self):
+        return len(self._entries)
+
+    def put(self, key, results):
+        self._entries[key] = (results, time.time())
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+
+# googleapiclient(httplib2)는 스레드 안전하지 않으므로 작업 스레드마다 클라이언트를 따로 만듭니다.
+_clients = threading.local()
+
+
+def get_youtube_client():
+    """YouTube API 클라이언트를 처음 쓸 때 만듭니다. API 키가 없으면 ValueError를 던집니다."""
+    client = getattr(_clients, "youtube", None)
+    if client is None:
+        if not YOUTUBE_API_KEY:
+            raise ValueError("YouTube API key가 설정되지 않았습니다. .env 파일을 확인하세요.")
+        client = build('youtube', 'v3', developerKey=YOUTUBE_API_KEY, cache_discovery=False)
+        _clients.youtube = client
+    return client
+
+
+def _search_blocking(query, max_results):
+    response = get_youtube_client().search().list(
+        q=query,
+        part='id,snippet',
+        maxResults=max_results,
+        type='video'
+    ).execute()
+    results = []
+    for item in response.get('items', []):
+        video_id = item['id']['videoId']
+        results.append({
+            "id": video_id,
+            "title": item['snippet']['title'],
+            "channel": item['snippet'].get('channelTitle', ''),
+            "url": f"https://www.youtube.com/watch?v={video_id}",
+        })
+    return results
+
+
+search_cache = SearchCache()
+quota_tracker = QuotaTracker()
+YOUTUBE_QUOTA_USED = Gauge(
+    "youtube_quota_used_units", "오늘(태평양 시간) 사용한 YouTube API 할당량",
+    callback=lambda: {(): quota_tracker.used()},
+)
+_inflight = {}
+
+
+async def search_videos(query, max_results=YOUTUBE_SEARCH_RESULTS):
+    """
+    검색 결과 목록({"id", "title", "channel", "url"})을 반환합니다.
+    캐시 -> (할당량이 충분하면) API 순서로 찾고, 할당량이 부족하면 만료된 캐시라도 돌려줍니다.
+    그것도 없으면 QuotaExceeded를 던집니다. API 호출은 별도 스레드에서 실행해 이벤트 루프를 막지 않습니다.
+    """
+    key = (normalize_query(query), max_results)
+    results = search_cache.get(key)
+    if results is not None:
+        search_cache.hits += 1
+        return results
+
+    if not quota_tracker.can_spend(SEARCH_COST):
+        results = search_cache.get(key, allow_stale=True)
+        if results is None:
+            raise QuotaExceeded()
+        search_cache.stale_hits += 1
+        return results
+
+    # 같은 검색어가 동시에 들어오면 API는 한 번만 호출합니다.
+    task = _inflight.get(key)
+    if task is None:
+        search_cache.misses += 1
+        # 동시에 들어온 다른 검색어도 남은 할당량을 보도록 호출 전에 잡아 두고, 호출이 실패하면 돌려놓습니다.
+        # (API 키가 없거나 요청이 오류로 끝난 경우까지 할당량을 깎으면 쓰지도 않은 할당량 때문에 검색이 막힙니다)
+        quota_tracker.spend(SEARCH_COST)
+        task = asyncio.ensure_future(asyncio.to_thread(_search_blocking, query, max_results))
+        _inflight[key] = task
+        task.add_done_callback(lambda _: _inflight.pop(key, None))
+        task.add_done_callback(_refund_failed_search)
+    results = await asyncio.shield(task)
+    search_cache.put(key, results)
+    return results
+
+
+def _refund_failed_search(task):
+    if not task.cancelled() and task.exception() is not None:
+        quota_tracker.refund(SEARCH_COST)
+
+
+async def _search_or_report(ctx, query):
+    """검색하고, 실패하면 사용자에게 알린 뒤 None을 반환합니다."""
     if not query:
         await ctx.send("검색할 유튜브 제목을 입력해주세요.")
-        return
+        return None
     try:
-        search_response = youtube.search().list(
-            q=query,
-            part='id,snippet',
-            maxResults=1,
-            type='video'
-        ).execute()
-
-        items = search_response.get('items', [])
-        if not items:
-            await ctx.send("검색 결과가 없습니다.")
-            return
-
-        video = items[0]
-        video_id = video['id']['videoId']
-        video_title = video['snippet']['title']
-        video_url = f"https://www.youtube.com/watch?v={video_id}"
-        await ctx.send(f"**{video_title}**\n{video_url}")
+        return await search_videos(query)
+    except QuotaExceeded:
+        await ctx.send("오늘 유튜브 검색 할당량을 거의 다 써서 새로운 검색은 잠시 쉬어갑니다. 이전에 검색한 적 있는 검색어만 찾을 수 있어요.")
+    except ValueError as e:
+        await ctx.send(str(e))
     except HttpError as e:
         await ctx.send(f"유튜브 검색 중 오류가 발생했습니다.")
         print(f"An HTTP error {e.resp.status} occurred:\n{e.content}")
+    return None
+
+
+async def search_youtube(ctx, query):
+    items = await _search_or_report(ctx, query)
+    if items is None:
+        return
+    if not items:
+        await ctx.send("검색 결과가 없습니다.")
+        return
+
+    video = items[0]
+    await ctx.send(f"**{video['title']}**\n{video['url']}")
+
+
+def split_page(query):
+    """
+    '/ylist 2 검색어'의 페이지 번호를 떼어 (페이지, 검색어)를 반환합니다.
+    첫 단어가 숫자이고 뒤에 검색어가 있으며 페이지 범위 안일 때만 페이지로 봅니다. ('2024 노래', '10cm'는 검색어 그대로)
+    """
+    if not query:
+        return 1, query
+    first, _, rest = query.strip().partition(" ")
+    max_pages = (YOUTUBE_SEARCH_RESULTS + YOUTUBE_PAGE_SIZE - 1) // YOUTUBE_PAGE_SIZE
+    if first.isdecimal() and rest.strip() and 1 <= int(first) <= max_pages:
+        return int(first), rest.strip()
+    return 1, query
+
+
+async def search_youtube_list(ctx, query):
+    """검색 결과 상위 목록을 YOUTUBE_PAGE_SIZE개씩 페이지로 나눠 보여줍니다. (검색어 앞에 페이지 번호를 붙일 수 있습니다)"""
+    page, query = split_page(query)
+    items = await _search_or_report(ctx, query)
+    if items is None:
+        return
+    if not items:
+        await ctx.send("검색 결과가 없습니다.")
+        return
+
+    pages = (len(items) + YOUTUBE_PAGE_SIZE - 1) // YOUTUBE_PAGE_SIZE
+    page = min(max(page, 1), pages)
+    start = (page - 1) * YOUTUBE_PAGE_SIZE
+    lines = [
+        f"{start + i + 1}. **{video['title']}** - {video['channel']}\n<{video['url']}>"
+        for i, video in enumerate(items[start:start + YOUTUBE_PAGE_SIZE])
+    ]
+    await ctx.send(f"**'{query}' 검색 결과** ({page}/{pages} 페이지)\n" + "\n".join(lines))
+